@@ -0,0 +1,96 @@
+"""
+Startup time benchmark.
+
+Measures the cold-start cost of the API process in fresh interpreters:
+settings import, application import and app creation. Also reports which
+heavy optional modules ended up imported, so regressions in lazy loading
+are easy to spot.
+
+Usage:
+    python scripts/benchmark_startup.py [--runs N] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).parent.parent
+
+# Modules that should only be imported when actually needed
+LAZY_MODULES = ["openai", "aiosqlite", "asyncpg", "aiomysql"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import src.core.settings
+t1 = time.perf_counter()
+import src.main
+t2 = time.perf_counter()
+src.main.create_app()
+t3 = time.perf_counter()
+print(json.dumps({
+    "settings_import_ms": (t1 - t0) * 1000,
+    "app_import_ms": (t2 - t0) * 1000,
+    "create_app_ms": (t3 - t2) * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def run_once(extra_args=None) -> subprocess.CompletedProcess:
+    """Run the child script in a fresh interpreter."""
+    return subprocess.run(
+        [sys.executable, "-W", "ignore"] + (extra_args or []) + ["-c", CHILD_SCRIPT],
+        cwd=API_DIR,
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def print_importtime(top: int = 15):
+    """Print the most expensive imports by cumulative time."""
+    stderr = run_once(["-X", "importtime"]).stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), name.strip()))
+
+    print(f"\nTop {top} imports by cumulative time:")
+    for cumulative_us, name in sorted(entries, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API cold-start time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters")
+    parser.add_argument("--importtime", action="store_true", help="Show slowest imports")
+    args = parser.parse_args()
+
+    samples = [json.loads(run_once().stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+
+    print(f"Startup benchmark ({args.runs} runs, median / min / max)")
+    print("=" * 50)
+    for key, label in [
+        ("settings_import_ms", "Settings import"),
+        ("app_import_ms", "App import (incl. create_app)"),
+        ("create_app_ms", "create_app()"),
+    ]:
+        values = [sample[key] for sample in samples]
+        print(f"{label:32} {statistics.median(values):8.1f} {min(values):8.1f} {max(values):8.1f} ms")
+
+    loaded = samples[-1]["loaded"]
+    print(f"\nLazy modules imported at startup: {', '.join(loaded) if loaded else 'none'}")
+
+    if args.importtime:
+        print_importtime()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Response compression middleware negotiated from Accept-Encoding.
+"""
+import importlib
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Content types worth compressing; everything else (images, Parquet, archives) is passed through
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.apache.arrow.stream"
+)
+
+
+def _optional_module(name: str):
+    """Import an optional compression library, or return None if it is missing."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+class GzipCompressor:
+    """Streaming gzip encoder."""
+
+    def __init__(self, level: int):
+        self._encoder = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so the client can decode it right away."""
+        return self._encoder.compress(data) + self._encoder.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._encoder.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """Streaming brotli encoder (requires the optional brotli package)."""
+
+    def __init__(self, level: int):
+        self._encoder = _optional_module("brotli").Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._encoder.process(data) + self._encoder.flush()
+
+    def finish(self) -> bytes:
+        return self._encoder.finish()
+
+
+class ZstdCompressor:
+    """Streaming zstd encoder (requires the optional zstandard package)."""
+
+    def __init__(self, level: int):
+        zstandard = _optional_module("zstandard")
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._encoder = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._encoder.compress(data) + self._encoder.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._encoder.flush()
+
+
+# Encoding name -> (compressor class, module it needs), in server preference order
+ENCODINGS: Dict[str, Tuple[type, Optional[str]]] = {
+    "zstd": (ZstdCompressor, "zstandard"),
+    "br": (BrotliCompressor, "brotli"),
+    "gzip": (GzipCompressor, None)
+}
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each encoding in an Accept-Encoding header to its q-value."""
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        parts = [part.strip() for part in item.split(";")]
+        name = parts[0].lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+class CompressionMiddleware:
+    """Compresses responses with zstd, brotli or gzip, whichever the client prefers.
+
+    Complete responses smaller than ``minimum_size`` are sent as is.
+    Streaming responses are compressed chunk by chunk and flushed after each
+    chunk, so nothing is buffered and clients can decode as data arrives.
+    Responses that are already encoded, not a compressible content type, or
+    served with range support (file downloads) are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        levels: Optional[Dict[str, int]] = None,
+        encodings: Optional[List[str]] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": 6, "br": 4, "zstd": 3, **(levels or {})}
+
+        # Only offer encodings whose library is installed
+        self.available = [
+            name for name in (encodings or list(ENCODINGS))
+            if name in ENCODINGS and (ENCODINGS[name][1] is None or _optional_module(ENCODINGS[name][1]))
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = self.choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is None or "range" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressedResponder(self, encoding).run(self.app, scope, receive, send)
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        """Pick the encoding with the highest q-value, breaking ties by server preference."""
+        accepted = parse_accept_encoding(accept_encoding)
+        best = None
+        best_quality = 0.0
+        for name in self.available:
+            quality = accepted.get(name, accepted.get("*", 0.0))
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def create_compressor(self, encoding: str):
+        """Create a streaming compressor for an encoding."""
+        return ENCODINGS[encoding][0](self.levels[encoding])
+
+
+class _CompressedResponder:
+    """Wraps ``send`` for one response and compresses its body."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def run(self, app, scope, receive, send):
+        self.send = send
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows whether to compress
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            self.passthrough = not self._should_compress(start, body, more_body)
+            if self.passthrough:
+                await self.send(start)
+                await self.send(message)
+                return
+
+            self.compressor = self.middleware.create_compressor(self.encoding)
+            if more_body:
+                body = self.compressor.compress(body)
+            else:
+                body = self.compressor.compress(body) + self.compressor.finish()
+            start["headers"] = self._encoded_headers(start, None if more_body else len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = self.compressor.compress(body) if body else b""
+        if not more_body:
+            body += self.compressor.finish()
+        if body or not more_body:
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    def _should_compress(self, start, body: bytes, more_body: bool) -> bool:
+        """Decide from the response headers and first chunk whether to compress."""
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in start["headers"]}
+        if "content-encoding" in headers or "content-range" in headers or "accept-ranges" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        if start.get("status", 200) in (204, 304):
+            return False
+        # Small complete bodies cost more to compress than they save
+        return more_body or len(body) >= self.middleware.minimum_size
+
+    def _encoded_headers(self, start, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        """Response headers with Content-Encoding set and Content-Length fixed up."""
+        headers = [
+            (key, value) for key, value in start["headers"]
+            if key.lower() not in (b"content-length", b"vary")
+        ]
+        vary = [value for key, value in start["headers"] if key.lower() == b"vary"]
+        vary_values = [part.strip() for value in vary for part in value.decode("latin-1").split(",") if part.strip()]
+        if "accept-encoding" not in (part.lower() for part in vary_values):
+            vary_values.append("Accept-Encoding")
+
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", ", ".join(vary_values).encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return headers
@@ -0,0 +1,132 @@
+"""
+Opt-in request profiling middleware and profile store.
+"""
+import random
+import secrets
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from ..utils.logging import get_logger, log_event, request_context
+from ..utils.profiling import AllocationProfiler, SamplingProfiler
+from ..utils.exceptions import ResultNotFoundError
+
+logger = get_logger(__name__)
+
+PROFILE_MODES = ("cpu", "memory")
+
+
+class ProfileStore:
+    """Keeps the most recent profiles in memory."""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def add(self, profile: Dict[str, Any]):
+        self._profiles[profile["profile_id"]] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Dict[str, Any]:
+        profile = self._profiles.get(profile_id)
+        if profile is None:
+            raise ResultNotFoundError(f"Profile {profile_id} not found or expired")
+        return profile
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Profile summaries without their stacks, newest first."""
+        return [
+            {key: value for key, value in profile.items() if key != "collapsed"}
+            for profile in reversed(self._profiles.values())
+        ]
+
+
+class ProfilingMiddleware:
+    """Profiles selected requests and stores collapsed stacks for flame graphs.
+
+    A request is profiled when it sends ``X-Profile: cpu`` or
+    ``X-Profile: memory`` together with a valid ``X-Admin-Token``, or when it
+    is picked at ``sample_rate`` (CPU mode). Only requests to ``paths`` are
+    considered and only one profile runs at a time. CPU profiles sample the
+    event loop thread, so they cover query processing, the database adapter
+    and response serialization; memory profiles use tracemalloc. The profile
+    ID is returned in the ``X-Profile-Id`` response header.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        admin_token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval_ms: float = 5,
+        paths: Sequence[str] = ("/query", "/query/paged")
+    ):
+        self.app = app
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_ms / 1000
+        self.paths = set(paths)
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        mode, trigger = self._requested_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_urlsafe(8)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        profiler = AllocationProfiler() if mode == "memory" else SamplingProfiler(self.interval_seconds)
+        self._active = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            try:
+                profiler.stop()
+            finally:
+                self._active = False
+            self._store(profile_id, mode, trigger, scope, profiler)
+
+    def _requested_mode(self, scope):
+        """Profiling mode and trigger for a request, or (None, None)."""
+        headers = {key.lower(): value for key, value in scope["headers"]}
+        requested = headers.get(b"x-profile", b"").decode("latin-1").strip().lower()
+        if requested:
+            token = headers.get(b"x-admin-token", b"").decode("latin-1")
+            if requested in PROFILE_MODES and self.admin_token and secrets.compare_digest(token, self.admin_token):
+                return requested, "header"
+            return None, None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "cpu", "sampled"
+        return None, None
+
+    def _store(self, profile_id: str, mode: str, trigger: str, scope, profiler):
+        context = request_context()
+        profile = {
+            "profile_id": profile_id,
+            "mode": mode,
+            "trigger": trigger,
+            "method": scope["method"],
+            "path": scope["path"],
+            "request_id": context["request_id"] if context else None,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "duration_ms": profiler.duration_ms,
+            **profiler.summary(),
+            "collapsed": profiler.collapsed()
+        }
+        self.store.add(profile)
+        log_event(logger, "profile", profile_id=profile_id, mode=mode, trigger=trigger, duration_ms=profiler.duration_ms)
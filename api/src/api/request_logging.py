@@ -0,0 +1,78 @@
+"""
+Per-request logging context and access log middleware.
+"""
+import logging
+import re
+import secrets
+import time
+from ..utils.logging import get_logger, log_event, start_request
+
+logger = get_logger(__name__)
+
+# Client-supplied request IDs are kept only if they look like an ID
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestLoggingMiddleware:
+    """Gives each request an ID and logs one structured record when it finishes.
+
+    The ID is taken from the ``X-Request-ID`` header when present and valid,
+    generated otherwise, and returned in the response headers. Every record
+    logged while the request runs carries it. The access record includes the
+    stage timings, SQL fingerprint and row count that services attached to the
+    request context. Successful requests are a sampled, high-volume event;
+    errors and slow requests are always logged.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 1000):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key.lower() == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = secrets.token_hex(8)
+
+        context = start_request(request_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 2)
+            fields = {key: value for key, value in context.items() if key != "request_id"}
+            if status >= 500:
+                level = logging.ERROR
+            elif duration_ms >= self.slow_request_ms:
+                level = logging.WARNING
+            else:
+                level = logging.INFO
+            log_event(
+                logger,
+                "request",
+                level=level,
+                sampled=True,
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=duration_ms,
+                **fields
+            )
@@ -2,37 +2,124 @@
 API routes for the Natural Language to SQL application.
 """
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+import secrets
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from ..models.query_models import (
     QueryRequest, 
     QueryResponse, 
+    PagedQueryRequest,
+    ResultPage,
+    ExportRequest,
+    ExportJob,
     DatabaseInfo, 
     SchemaResponse, 
-    HealthResponse
+    HealthResponse,
+    ReadinessResponse
 )
 from ..services.query_service import QueryService
 from ..database.manager import DatabaseManager
 from ..services.llm_service import LLMService
+from ..services.warmup_service import WarmupService
+from ..services.health_service import HealthService
+from ..services.result_service import ResultService
+from ..services.result_refiner import ResultRefiner
+from ..services.session_store import SessionStore
+from ..services.summary_store import SummaryStore
+from ..services.export_service import ExportService
+from ..services.slow_query_log import SlowQueryLog
+from ..services.index_advisor import IndexAdvisor
+from .profiling import ProfileStore
+from ..database.arrow import ARROW_STREAM_MEDIA_TYPE, arrow_available
 from ..core.settings import settings
+from ..utils.exceptions import InvalidCursorError, ResultNotFoundError, UnsupportedDatabaseError
 
 # Create router
 router = APIRouter()
 
 # Dependency injection
-def get_database_manager() -> DatabaseManager:
-    """Get database manager instance."""
-    return DatabaseManager(settings.database.url)
+def get_database_manager(request: Request) -> DatabaseManager:
+    """Get the shared database manager instance."""
+    return request.app.state.db_manager
 
-def get_llm_service() -> LLMService:
-    """Get LLM service instance."""
-    return LLMService()
+def get_llm_service(request: Request) -> LLMService:
+    """Get the shared LLM service instance."""
+    return request.app.state.llm_service
+
+def get_warmup_service(request: Request) -> WarmupService:
+    """Get the warm-up service instance."""
+    return request.app.state.warmup_service
+
+def get_health_service(request: Request) -> HealthService:
+    """Get the background health service instance."""
+    return request.app.state.health_service
+
+def get_result_service(request: Request) -> ResultService:
+    """Get the shared paginated result service instance."""
+    return request.app.state.result_service
+
+def get_session_store(request: Request) -> SessionStore:
+    """Get the shared conversation session store."""
+    return request.app.state.session_store
+
+def get_result_refiner(request: Request) -> ResultRefiner:
+    """Get the shared follow-up result refiner."""
+    return request.app.state.result_refiner
+
+def get_summary_store(request: Request) -> Optional[SummaryStore]:
+    """Get the shared aggregate summary store, if summaries are enabled."""
+    return request.app.state.summary_store
+
+def get_export_service(request: Request) -> ExportService:
+    """Get the shared export job service instance."""
+    return request.app.state.export_service
+
+def get_slow_query_log(request: Request) -> SlowQueryLog:
+    """Get the shared slow-query log."""
+    return request.app.state.slow_query_log
+
+def get_index_advisor(request: Request) -> IndexAdvisor:
+    """Get the shared index advisor."""
+    return request.app.state.index_advisor
+
+def get_profile_store(request: Request) -> ProfileStore:
+    """Get the shared request profile store."""
+    return request.app.state.profile_store
 
 def get_query_service(
     db_manager: DatabaseManager = Depends(get_database_manager),
-    llm_service: LLMService = Depends(get_llm_service)
+    llm_service: LLMService = Depends(get_llm_service),
+    result_service: ResultService = Depends(get_result_service),
+    slow_query_log: SlowQueryLog = Depends(get_slow_query_log),
+    session_store: SessionStore = Depends(get_session_store),
+    result_refiner: ResultRefiner = Depends(get_result_refiner),
+    index_advisor: IndexAdvisor = Depends(get_index_advisor),
+    summary_store: Optional[SummaryStore] = Depends(get_summary_store)
 ) -> QueryService:
     """Get query service instance."""
-    return QueryService(db_manager, llm_service)
+    return QueryService(
+        db_manager,
+        llm_service,
+        result_service,
+        slow_query_log,
+        repair_attempts=settings.llm.repair_attempts,
+        repair_deadline_seconds=settings.llm.repair_deadline_seconds,
+        session_store=session_store,
+        result_refiner=result_refiner,
+        history_turns=settings.sessions.history_turns,
+        max_rows=settings.api.max_query_results,
+        index_advisor=index_advisor,
+        summary_store=summary_store
+    )
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the configured admin token."""
+    expected = settings.api.admin_token
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 
 @router.get("/", summary="Root endpoint")
@@ -46,9 +133,19 @@ async def root():
         "environment": settings.environment,
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "query": "/query", 
+            "paged_query": "/query/paged",
+            "results": "/results/{result_id}",
+            "sessions": "/sessions",
+            "exports": "/exports",
             "schema": "/schema",
             "database_info": "/database-info",
+            "cache_stats": "/cache/stats",
+            "slow_queries": "/admin/slow-queries",
+            "index_advice": "/admin/index-advice",
+            "profiles": "/admin/profiles",
             "docs": "/docs"
         }
     }
@@ -57,6 +154,8 @@ async def root():
 @router.post("/query", response_model=QueryResponse, summary="Execute natural language query")
 async def execute_query(
     request: QueryRequest,
+    http_request: Request,
+    format: Optional[str] = Query(None, description="Set to 'arrow' for an Arrow IPC stream response"),
     query_service: QueryService = Depends(get_query_service)
 ):
     """
@@ -64,13 +163,185 @@ async def execute_query(
     
     - **question**: Natural language question to convert to SQL
     - **schema**: Optional database schema override
+    - **session_id**: Session from a previous response, for follow-up questions
+    - **start_session**: Start a session (returned as `session_id`) when no session_id is given
+    
+    The SQL returns at most MAX_QUERY_RESULTS rows; `limit_applied` is set
+    when that limit was added and may have cut the results short.
+    
+    Send `Accept: application/vnd.apache.arrow.stream` or `?format=arrow` to
+    receive the results as an Arrow IPC stream instead of JSON. The SQL is
+    in the schema metadata and the `X-SQL-Query-Source` header.
     """
+    wants_arrow = format == "arrow" or ARROW_STREAM_MEDIA_TYPE in http_request.headers.get("accept", "")
+    if wants_arrow and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow responses require the optional pyarrow package")
+    
     try:
+        if wants_arrow:
+            generation, stream = await query_service.process_query_arrow(request)
+            headers = {
+                "X-SQL-Query-Source": generation["source"],
+                "X-Repair-Attempts": str(generation["repair_attempts"])
+            }
+            if generation["session_id"] is not None:
+                headers["X-Session-Id"] = generation["session_id"]
+            if generation.get("limit_applied"):
+                headers["X-Limit-Applied"] = "true"
+            if generation["prompt_tokens"] is not None:
+                headers["X-Prompt-Tokens"] = str(generation["prompt_tokens"])
+            return StreamingResponse(stream, media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
         return await query_service.process_query(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query/paged", response_model=ResultPage, summary="Execute natural language query with paginated results")
+async def execute_paged_query(
+    request: PagedQueryRequest,
+    query_service: QueryService = Depends(get_query_service)
+):
+    """
+    Execute a natural language query and return the first page of results.
+    
+    The SQL is kept server-side; pass `next_cursor` to `/results/{result_id}`
+    for the following pages.
+    
+    - **question**: Natural language question to convert to SQL
+    - **schema**: Optional database schema override
+    - **session_id**: Session from a previous response, for follow-up questions
+    - **start_session**: Start a session (returned as `session_id`) when no session_id is given
+    - **page_size**: Rows per page
+    """
+    try:
+        return await query_service.process_paged_query(request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/results/{result_id}", response_model=ResultPage, summary="Get a page of a query result")
+async def get_result_page(
+    result_id: str,
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page; omit for the first page"),
+    page_size: Optional[int] = Query(None, ge=1, description="Rows per page"),
+    query_service: QueryService = Depends(get_query_service)
+):
+    """
+    Get a page of a result created by `/query/paged`.
+    """
+    try:
+        return await query_service.get_result_page(result_id, cursor, page_size)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/results/{result_id}", summary="Release a query result")
+async def release_result(
+    result_id: str,
+    result_service: ResultService = Depends(get_result_service)
+):
+    """
+    Release a result handle before it expires.
+    """
+    if not result_service.release(result_id):
+        raise HTTPException(status_code=404, detail=f"Result {result_id} not found or expired")
+    return {"released": result_id}
+
+
+@router.post("/sessions", status_code=201, summary="Start a conversation session")
+async def create_session(session_store: SessionStore = Depends(get_session_store)):
+    """
+    Start a conversation. Pass the returned `session_id` with each question;
+    a query with `start_session` set instead starts one and returns its ID.
+    """
+    return {"session_id": session_store.create(), "expires_in_seconds": session_store.ttl_seconds}
+
+
+@router.delete("/sessions/{session_id}", summary="End a conversation session")
+async def delete_session(
+    session_id: str,
+    session_store: SessionStore = Depends(get_session_store)
+):
+    """
+    Forget a conversation's history and cached result.
+    """
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found or expired")
+    return {"deleted": session_id}
+
+
+@router.post("/exports", response_model=ExportJob, status_code=202, summary="Start an export job")
+async def create_export(
+    request: ExportRequest,
+    export_service: ExportService = Depends(get_export_service)
+):
+    """
+    Export the results of a question or SQL query to a file in the background.
+    
+    - **question** or **sql_query**: What to export
+    - **format**: csv, jsonl or parquet
+    
+    Poll `/exports/{job_id}` until the status is `completed`, then download
+    from `/exports/{job_id}/download` (range requests are supported).
+    """
+    try:
+        return await export_service.submit(request.format, request.sql_query, request.question)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/exports/{job_id}", response_model=ExportJob, summary="Get export job status")
+async def get_export(
+    job_id: str,
+    export_service: ExportService = Depends(get_export_service)
+):
+    """
+    Get the status and progress of an export job.
+    """
+    try:
+        return export_service.public(export_service.get(job_id))
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/exports/{job_id}/download", summary="Download an export file")
+async def download_export(
+    job_id: str,
+    export_service: ExportService = Depends(get_export_service)
+):
+    """
+    Download a completed export. Supports HTTP range requests for resuming.
+    """
+    try:
+        info = export_service.download_info(job_id)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if info is None:
+        raise HTTPException(status_code=409, detail=f"Export {job_id} is not completed")
+    
+    path, media_type, filename = info
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+
+@router.delete("/exports/{job_id}", summary="Cancel or delete an export job")
+async def delete_export(
+    job_id: str,
+    export_service: ExportService = Depends(get_export_service)
+):
+    """
+    Cancel a running export, or delete a finished one and its file.
+    """
+    try:
+        await export_service.delete(job_id)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"deleted": job_id}
+
+
 @router.get("/schema", response_model=SchemaResponse, summary="Get database schema")
 async def get_schema(query_service: QueryService = Depends(get_query_service)):
     """
@@ -107,21 +378,115 @@ async def get_database_info(query_service: QueryService = Depends(get_query_serv
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cache/stats", summary="Get SQL cache statistics")
+async def get_cache_stats(
+    llm_service: LLMService = Depends(get_llm_service),
+    session_store: SessionStore = Depends(get_session_store),
+    result_refiner: ResultRefiner = Depends(get_result_refiner),
+    summary_store: Optional[SummaryStore] = Depends(get_summary_store)
+):
+    """
+    Get hit rates and sizes of the exact and similarity SQL caches, how
+    many follow-ups were answered from a session's previous result, and
+    how many queries were answered from aggregate summaries.
+    """
+    return {
+        **await llm_service.get_cache_stats(),
+        "sessions": {**session_store.stats(), **result_refiner.stats()},
+        "summaries": summary_store.stats() if summary_store is not None else None
+    }
+
+
+@router.get("/admin/slow-queries", summary="Get the slow-query log", dependencies=[Depends(require_admin)])
+async def get_slow_queries(
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of entries, newest first"),
+    slow_query_log: SlowQueryLog = Depends(get_slow_query_log)
+):
+    """
+    List recent requests whose SQL generation or execution was slow, with
+    stage timings and, for slow executions, the captured query plan.
+    """
+    return {
+        "stats": slow_query_log.stats(),
+        "entries": slow_query_log.entries(limit)
+    }
+
+
+@router.delete("/admin/slow-queries", summary="Clear the slow-query log", dependencies=[Depends(require_admin)])
+async def clear_slow_queries(slow_query_log: SlowQueryLog = Depends(get_slow_query_log)):
+    """
+    Remove all entries from the in-memory slow-query log.
+    """
+    return {"cleared": slow_query_log.clear()}
+
+
+@router.get("/admin/index-advice", summary="Get index recommendations", dependencies=[Depends(require_admin)])
+async def get_index_advice(index_advisor: IndexAdvisor = Depends(get_index_advisor)):
+    """
+    Recommend indexes for the columns that recurring generated queries
+    filter and join on, ranked by the cost EXPLAIN estimates they save.
+    Each recommendation has its CREATE INDEX statement and the plans of
+    the affected queries with and without it. SQLite and PostgreSQL only.
+    """
+    try:
+        recommendations = await index_advisor.recommend()
+    except UnsupportedDatabaseError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "stats": index_advisor.stats(),
+        "recommendations": recommendations,
+        "applied": index_advisor.applied
+    }
+
+
+@router.get("/admin/profiles", summary="List request profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(profile_store: ProfileStore = Depends(get_profile_store)):
+    """
+    List stored request profiles, newest first, without their stacks.
+    """
+    return {"profiles": profile_store.list()}
+
+
+@router.get("/admin/profiles/{profile_id}", summary="Get a request profile", dependencies=[Depends(require_admin)])
+async def get_profile(
+    profile_id: str,
+    format: Optional[str] = Query(None, description="Set to 'json' for the profile with its metadata"),
+    profile_store: ProfileStore = Depends(get_profile_store)
+):
+    """
+    Get a profile as collapsed stacks (one `frame;frame;frame weight` line per
+    stack), ready for flamegraph.pl or speedscope. CPU profiles are weighted
+    by samples, memory profiles by bytes allocated.
+    """
+    try:
+        profile = profile_store.get(profile_id)
+    except ResultNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if format == "json":
+        return profile
+    return PlainTextResponse(profile["collapsed"])
+
+
 @router.get("/health", response_model=HealthResponse, summary="Health check")
-async def health_check(query_service: QueryService = Depends(get_query_service)):
+async def health_check(
+    db_manager: DatabaseManager = Depends(get_database_manager),
+    health_service: HealthService = Depends(get_health_service)
+):
     """
-    Check the health status of the API and database connection.
+    Report the cached health status of the API and database connection.
+    
+    The database state is refreshed in the background, so this performs no I/O.
     """
     try:
-        connection_status = await query_service.test_database_connection()
-        db_info = query_service.get_database_info()
-        
         return HealthResponse(
-            status="healthy" if connection_status else "unhealthy",
-            database="connected" if connection_status else "disconnected",
-            database_type=db_info["database_type"],
+            status="healthy" if health_service.healthy else "unhealthy",
+            database=health_service.database_status,
+            database_type=db_manager.get_sql_dialect(),
             version=settings.api.version,
-            timestamp=datetime.utcnow().isoformat() + "Z"
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            last_checked=health_service.last_checked
         )
     except Exception as e:
         return HealthResponse(
@@ -130,4 +495,38 @@ async def health_check(query_service: QueryService = Depends(get_query_service))
             database_type="unknown",
             version=settings.api.version,
             timestamp=datetime.utcnow().isoformat() + "Z"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/health/live", summary="Liveness probe")
+async def liveness():
+    """
+    Report that the process is up. Performs no I/O.
+    """
+    return {
+        "status": "alive",
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+@router.get("/health/ready", response_model=ReadinessResponse, summary="Readiness probe")
+async def readiness(
+    response: Response,
+    warmup_service: WarmupService = Depends(get_warmup_service),
+    health_service: HealthService = Depends(get_health_service)
+):
+    """
+    Report whether this instance should receive traffic: warm-up has finished
+    and the cached database check is healthy. Returns 503 otherwise.
+    """
+    ready = warmup_service.ready and health_service.healthy
+    if not ready:
+        response.status_code = 503
+    
+    return ReadinessResponse(
+        status="ready" if ready else "not_ready",
+        ready=ready,
+        warmup=warmup_service.get_status(),
+        database=health_service.get_state(),
+        timestamp=datetime.utcnow().isoformat() + "Z"
+    )
@@ -1,12 +1,23 @@
 """
 Core application components.
 """
-from .settings import settings, AppSettings, DatabaseSettings, LLMSettings, APISettings
+from .settings import settings, AppSettings, DatabaseSettings, LLMSettings, APISettings, WarmupSettings, HealthSettings, ResultSettings, SessionSettings, SummarySettings, ExportSettings, CompressionSettings, LoggingSettings, SlowQuerySettings, IndexAdvisorSettings, ProfilingSettings
 
 __all__ = [
     "settings",
     "AppSettings", 
     "DatabaseSettings",
     "LLMSettings",
-    "APISettings"
+    "APISettings",
+    "WarmupSettings",
+    "HealthSettings",
+    "ResultSettings",
+    "SessionSettings",
+    "SummarySettings",
+    "ExportSettings",
+    "CompressionSettings",
+    "LoggingSettings",
+    "SlowQuerySettings",
+    "IndexAdvisorSettings",
+    "ProfilingSettings"
 ]
\ No newline at end of file
@@ -1,14 +1,13 @@
 """
 Core application settings and configuration management.
 """
-import os
-from typing import Dict, Any, List
-from pydantic import Field
+from typing import List, Optional, Union
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Load .env file from config directory
+# Load .env file from config directory (the only place it is read)
 config_dir = Path(__file__).parent.parent.parent / "config"
 env_file = config_dir / ".env"
 load_dotenv(env_file)
@@ -17,10 +16,24 @@ load_dotenv(env_file)
 class DatabaseSettings(BaseSettings):
     """Database configuration settings."""
     
-    url: str = Field(default="sqlite:///northwind.db", env="DATABASE_URL")
-    max_connections: int = Field(default=10, env="DB_MAX_CONNECTIONS")
-    connection_timeout: int = Field(default=30, env="DB_CONNECTION_TIMEOUT")
-    query_timeout: int = Field(default=30, env="DB_QUERY_TIMEOUT")
+    url: str = Field(default="sqlite:///northwind.db", validation_alias="DATABASE_URL")
+    replica_urls: Union[List[str], str] = Field(default=[], validation_alias="DATABASE_REPLICA_URLS")
+    max_replica_lag_seconds: Optional[float] = Field(default=None, validation_alias="DB_REPLICA_MAX_LAG_SECONDS")
+    replica_backoff_seconds: float = Field(default=1.0, validation_alias="DB_REPLICA_BACKOFF_SECONDS")
+    min_connections: int = Field(default=1, validation_alias="DB_MIN_CONNECTIONS")
+    max_connections: int = Field(default=10, validation_alias="DB_MAX_CONNECTIONS")
+    connection_timeout: int = Field(default=30, validation_alias="DB_CONNECTION_TIMEOUT")
+    query_timeout: int = Field(default=30, validation_alias="DB_QUERY_TIMEOUT")
+    schema_ttl_seconds: int = Field(default=300, validation_alias="DB_SCHEMA_TTL_SECONDS")
+    statement_cache_size: int = Field(default=256, validation_alias="DB_STATEMENT_CACHE_SIZE")
+    
+    @field_validator("replica_urls", mode="before")
+    @classmethod
+    def _split_replica_urls(cls, value):
+        """Accept DATABASE_REPLICA_URLS as a comma-separated list."""
+        if isinstance(value, str):
+            return [url.strip() for url in value.split(",") if url.strip()]
+        return value
     
     class Config:
         env_prefix = "DATABASE_"
@@ -29,11 +42,29 @@ class DatabaseSettings(BaseSettings):
 class LLMSettings(BaseSettings):
     """Large Language Model configuration settings."""
     
-    openai_api_key: str = Field(..., env="OPENAI_API_KEY")
-    primary_model: str = Field(default="gpt-4", env="LLM_PRIMARY_MODEL")
-    fallback_model: str = Field(default="gpt-3.5-turbo", env="LLM_FALLBACK_MODEL")
-    temperature: float = Field(default=0.0, env="LLM_TEMPERATURE")
-    max_tokens: int = Field(default=300, env="LLM_MAX_TOKENS")
+    openai_api_key: Optional[str] = Field(default=None, validation_alias="OPENAI_API_KEY")
+    primary_model: str = Field(default="gpt-4", validation_alias="LLM_PRIMARY_MODEL")
+    fallback_model: str = Field(default="gpt-3.5-turbo", validation_alias="LLM_FALLBACK_MODEL")
+    temperature: float = Field(default=0.0, validation_alias="LLM_TEMPERATURE")
+    max_tokens: int = Field(default=300, validation_alias="LLM_MAX_TOKENS")
+    cache_size: int = Field(default=256, validation_alias="LLM_CACHE_SIZE")
+    # "memory" (per process) or "sqlite" (shared file for all workers on a host)
+    cache_backend: str = Field(default="memory", validation_alias="LLM_CACHE_BACKEND")
+    cache_path: str = Field(default="sql_cache.db", validation_alias="LLM_CACHE_PATH")
+    similarity_threshold: float = Field(default=0.8, validation_alias="LLM_SIMILARITY_THRESHOLD")
+    similarity_cache_size: int = Field(default=1000, validation_alias="LLM_SIMILARITY_CACHE_SIZE")
+    few_shot_k: int = Field(default=3, validation_alias="LLM_FEW_SHOT_K")
+    few_shot_token_budget: int = Field(default=400, validation_alias="LLM_FEW_SHOT_TOKEN_BUDGET")
+    examples_max: int = Field(default=5000, validation_alias="LLM_EXAMPLES_MAX")
+    examples_path: Optional[str] = Field(default=None, validation_alias="LLM_EXAMPLES_PATH")
+    prompt_token_budget: int = Field(default=6000, validation_alias="LLM_PROMPT_TOKEN_BUDGET")
+    tokenizer: str = Field(default="approx", validation_alias="LLM_TOKENIZER")
+    column_stats_enabled: bool = Field(default=True, validation_alias="LLM_COLUMN_STATS_ENABLED")
+    column_stats_sample_rows: int = Field(default=1000, validation_alias="LLM_COLUMN_STATS_SAMPLE_ROWS")
+    column_stats_max_values: int = Field(default=8, validation_alias="LLM_COLUMN_STATS_MAX_VALUES")
+    column_stats_ttl_seconds: int = Field(default=3600, validation_alias="LLM_COLUMN_STATS_TTL_SECONDS")
+    repair_attempts: int = Field(default=2, validation_alias="LLM_REPAIR_ATTEMPTS")
+    repair_deadline_seconds: float = Field(default=20.0, validation_alias="LLM_REPAIR_DEADLINE_SECONDS")
     
     class Config:
         env_prefix = "LLM_"
@@ -55,12 +86,12 @@ class APISettings(BaseSettings):
     - Oracle (enterprise)
     """
     
-    host: str = Field(default="0.0.0.0", env="API_HOST")
-    port: int = Field(default=8000, env="API_PORT")
-    debug: bool = Field(default=False, env="API_DEBUG")
+    host: str = Field(default="0.0.0.0", validation_alias="API_HOST")
+    port: int = Field(default=8000, validation_alias="API_PORT")
+    debug: bool = Field(default=False, validation_alias="API_DEBUG")
     
     # CORS settings - Updated for production
-    cors_origins: List[str] = Field(
+    cors_origins: Union[List[str], str] = Field(
         default=[
             "http://localhost:3000",
             "https://nlsql-chat.vercel.app",
@@ -69,26 +100,195 @@ class APISettings(BaseSettings):
             "https://*.onrender.com",
             "*"  # Remove this in production for security
         ],
-        env="CORS_ORIGINS"
+        validation_alias="CORS_ORIGINS"
     )
     
-    # Query settings
-    max_query_results: int = Field(default=1000, env="MAX_QUERY_RESULTS")
+    # Query settings; generated SQL is limited to this many rows (0 disables)
+    max_query_results: int = Field(default=1000, validation_alias="MAX_QUERY_RESULTS")
+    
+    # Token required in the X-Admin-Token header by /admin endpoints; unset disables them
+    admin_token: Optional[str] = Field(default=None, validation_alias="ADMIN_TOKEN")
+    
+    @field_validator("cors_origins", mode="before")
+    @classmethod
+    def _split_cors_origins(cls, value):
+        """Accept CORS_ORIGINS as a comma-separated list."""
+        if isinstance(value, str):
+            return [origin.strip() for origin in value.split(",") if origin.strip()]
+        return value
     
     class Config:
         env_prefix = "API_"
 
 
+class WarmupSettings(BaseSettings):
+    """Startup warm-up configuration settings."""
+    
+    enabled: bool = Field(default=True, validation_alias="WARMUP_ENABLED")
+    # Frequent questions to pre-generate SQL for, separated by "|"
+    questions: Union[List[str], str] = Field(default=[], validation_alias="WARMUP_QUESTIONS")
+    timeout_seconds: int = Field(default=60, validation_alias="WARMUP_TIMEOUT_SECONDS")
+    
+    @field_validator("questions", mode="before")
+    @classmethod
+    def _split_questions(cls, value):
+        """Accept WARMUP_QUESTIONS as a "|"-separated list."""
+        if isinstance(value, str):
+            return [question.strip() for question in value.split("|") if question.strip()]
+        return value
+    
+    class Config:
+        env_prefix = "WARMUP_"
+
+
+class HealthSettings(BaseSettings):
+    """Background health check configuration settings."""
+    
+    interval_seconds: int = Field(default=10, validation_alias="HEALTH_CHECK_INTERVAL_SECONDS")
+    stale_after_seconds: int = Field(default=30, validation_alias="HEALTH_STALE_AFTER_SECONDS")
+    
+    class Config:
+        env_prefix = "HEALTH_"
+
+
+class ResultSettings(BaseSettings):
+    """Paginated result handle configuration settings."""
+    
+    ttl_seconds: int = Field(default=600, validation_alias="RESULTS_TTL_SECONDS")
+    max_handles: int = Field(default=1000, validation_alias="RESULTS_MAX_HANDLES")
+    page_size: int = Field(default=100, validation_alias="RESULTS_PAGE_SIZE")
+    max_page_size: int = Field(default=1000, validation_alias="RESULTS_MAX_PAGE_SIZE")
+    
+    class Config:
+        env_prefix = "RESULTS_"
+
+
+class SessionSettings(BaseSettings):
+    """Conversation session configuration settings."""
+    
+    ttl_seconds: int = Field(default=1800, validation_alias="SESSION_TTL_SECONDS")
+    max_sessions: int = Field(default=1000, validation_alias="SESSION_MAX_SESSIONS")
+    max_turns: int = Field(default=5, validation_alias="SESSION_MAX_TURNS")
+    history_turns: int = Field(default=3, validation_alias="SESSION_HISTORY_TURNS")
+    max_result_rows: int = Field(default=1000, validation_alias="SESSION_MAX_RESULT_ROWS")
+    max_cached_rows: int = Field(default=100000, validation_alias="SESSION_MAX_CACHED_ROWS")
+    
+    class Config:
+        env_prefix = "SESSION_"
+
+
+class SummarySettings(BaseSettings):
+    """Precomputed aggregate summary configuration settings."""
+    
+    enabled: bool = Field(default=True, validation_alias="SUMMARY_ENABLED")
+    min_executions: int = Field(default=3, validation_alias="SUMMARY_MIN_EXECUTIONS")
+    max_summaries: int = Field(default=50, validation_alias="SUMMARY_MAX_SUMMARIES")
+    max_rows: int = Field(default=1000, validation_alias="SUMMARY_MAX_ROWS")
+    refresh_seconds: float = Field(default=300, validation_alias="SUMMARY_REFRESH_SECONDS")
+    check_interval_seconds: float = Field(default=30, validation_alias="SUMMARY_CHECK_SECONDS")
+    
+    class Config:
+        env_prefix = "SUMMARY_"
+
+
+class ExportSettings(BaseSettings):
+    """Background export job configuration settings."""
+    
+    directory: str = Field(default="exports", validation_alias="EXPORT_DIR")
+    ttl_seconds: int = Field(default=3600, validation_alias="EXPORT_TTL_SECONDS")
+    max_concurrent_jobs: int = Field(default=2, validation_alias="EXPORT_MAX_CONCURRENT_JOBS")
+    batch_size: int = Field(default=1000, validation_alias="EXPORT_BATCH_SIZE")
+    
+    class Config:
+        env_prefix = "EXPORT_"
+
+
+class CompressionSettings(BaseSettings):
+    """Response compression configuration settings."""
+    
+    enabled: bool = Field(default=True, validation_alias="COMPRESSION_ENABLED")
+    minimum_size: int = Field(default=1024, validation_alias="COMPRESSION_MIN_SIZE")
+    gzip_level: int = Field(default=6, validation_alias="COMPRESSION_GZIP_LEVEL")
+    brotli_quality: int = Field(default=4, validation_alias="COMPRESSION_BROTLI_QUALITY")
+    zstd_level: int = Field(default=3, validation_alias="COMPRESSION_ZSTD_LEVEL")
+    
+    class Config:
+        env_prefix = "COMPRESSION_"
+
+
+class SlowQuerySettings(BaseSettings):
+    """Slow-query log configuration settings."""
+    
+    generation_threshold_ms: int = Field(default=2000, validation_alias="SLOW_QUERY_GENERATION_MS")
+    execution_threshold_ms: int = Field(default=500, validation_alias="SLOW_QUERY_EXECUTION_MS")
+    max_entries: int = Field(default=200, validation_alias="SLOW_QUERY_LOG_SIZE")
+    file_path: Optional[str] = Field(default=None, validation_alias="SLOW_QUERY_LOG_FILE")
+    capture_plans: bool = Field(default=True, validation_alias="SLOW_QUERY_CAPTURE_PLANS")
+    
+    class Config:
+        env_prefix = "SLOW_QUERY_"
+
+
+class IndexAdvisorSettings(BaseSettings):
+    """Index advisor configuration settings."""
+    
+    max_queries: int = Field(default=500, validation_alias="INDEX_ADVISOR_MAX_QUERIES")
+    min_executions: int = Field(default=2, validation_alias="INDEX_ADVISOR_MIN_EXECUTIONS")
+    max_candidates: int = Field(default=10, validation_alias="INDEX_ADVISOR_MAX_CANDIDATES")
+    # Create recommended indexes in the background; only honoured for SQLite in development
+    auto_apply: bool = Field(default=False, validation_alias="INDEX_ADVISOR_AUTO_APPLY")
+    # Without hypopg, build PostgreSQL candidates in a rolled back transaction; blocks writes while building
+    build_indexes: bool = Field(default=False, validation_alias="INDEX_ADVISOR_BUILD_INDEXES")
+    interval_seconds: float = Field(default=3600, validation_alias="INDEX_ADVISOR_INTERVAL_SECONDS")
+    
+    class Config:
+        env_prefix = "INDEX_ADVISOR_"
+
+
+class ProfilingSettings(BaseSettings):
+    """Request profiling configuration settings."""
+    
+    sample_rate: float = Field(default=0.0, validation_alias="PROFILE_SAMPLE_RATE")
+    interval_ms: float = Field(default=5, validation_alias="PROFILE_INTERVAL_MS")
+    max_profiles: int = Field(default=20, validation_alias="PROFILE_MAX_STORED")
+    
+    class Config:
+        env_prefix = "PROFILE_"
+
+
+class LoggingSettings(BaseSettings):
+    """Structured logging configuration settings."""
+    
+    format: str = Field(default="json", validation_alias="LOG_FORMAT")
+    sample_rate: float = Field(default=1.0, validation_alias="LOG_SAMPLE_RATE")
+    queue_size: int = Field(default=10000, validation_alias="LOG_QUEUE_SIZE")
+    slow_request_ms: int = Field(default=1000, validation_alias="LOG_SLOW_REQUEST_MS")
+    
+    class Config:
+        env_prefix = "LOG_"
+
+
 class AppSettings(BaseSettings):
     """Main application settings."""
     
-    environment: str = Field(default="development", env="ENVIRONMENT")
-    log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    environment: str = Field(default="development", validation_alias="ENVIRONMENT")
+    log_level: str = Field(default="INFO", validation_alias="LOG_LEVEL")
     
     # Component settings - initialized lazily
     _database: DatabaseSettings = None
     _llm: LLMSettings = None
     _api: APISettings = None
+    _warmup: WarmupSettings = None
+    _health: HealthSettings = None
+    _results: ResultSettings = None
+    _sessions: SessionSettings = None
+    _summaries: SummarySettings = None
+    _exports: ExportSettings = None
+    _compression: CompressionSettings = None
+    _logging: LoggingSettings = None
+    _slow_queries: SlowQuerySettings = None
+    _index_advisor: IndexAdvisorSettings = None
+    _profiling: ProfilingSettings = None
     
     @property
     def database(self) -> DatabaseSettings:
@@ -108,6 +308,72 @@ class AppSettings(BaseSettings):
             self._api = APISettings()
         return self._api
     
+    @property
+    def warmup(self) -> WarmupSettings:
+        if self._warmup is None:
+            self._warmup = WarmupSettings()
+        return self._warmup
+    
+    @property
+    def health(self) -> HealthSettings:
+        if self._health is None:
+            self._health = HealthSettings()
+        return self._health
+    
+    @property
+    def results(self) -> ResultSettings:
+        if self._results is None:
+            self._results = ResultSettings()
+        return self._results
+    
+    @property
+    def sessions(self) -> SessionSettings:
+        if self._sessions is None:
+            self._sessions = SessionSettings()
+        return self._sessions
+    
+    @property
+    def summaries(self) -> SummarySettings:
+        if self._summaries is None:
+            self._summaries = SummarySettings()
+        return self._summaries
+    
+    @property
+    def exports(self) -> ExportSettings:
+        if self._exports is None:
+            self._exports = ExportSettings()
+        return self._exports
+    
+    @property
+    def compression(self) -> CompressionSettings:
+        if self._compression is None:
+            self._compression = CompressionSettings()
+        return self._compression
+    
+    @property
+    def logging(self) -> LoggingSettings:
+        if self._logging is None:
+            self._logging = LoggingSettings()
+        return self._logging
+    
+    @property
+    def slow_queries(self) -> SlowQuerySettings:
+        if self._slow_queries is None:
+            self._slow_queries = SlowQuerySettings()
+        return self._slow_queries
+    
+    @property
+    def index_advisor(self) -> IndexAdvisorSettings:
+        if self._index_advisor is None:
+            self._index_advisor = IndexAdvisorSettings()
+        return self._index_advisor
+    
+    @property
+    def profiling(self) -> ProfilingSettings:
+        if self._profiling is None:
+            self._profiling = ProfilingSettings()
+        return self._profiling
+    
     @property
     def is_development(self) -> bool:
         """Check if running in development mode."""
@@ -1,18 +1,110 @@
 """
 Database adapters for different database types.
 """
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, AsyncIterator, List, Sequence, Tuple, Optional
 from urllib.parse import urlparse
+from collections import OrderedDict
 import asyncio
+import hashlib
+import importlib
+import json
+import re
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from .arrow import RecordBatchBuilder
+from .pool import ConnectionPool
+from ..utils.logging import get_logger
+from ..utils.sql import tokenize_sql
+
+logger = get_logger(__name__)
+
+
+def _sample_column_statistics(column: str, values: List[Any], max_values: int) -> Dict[str, Any]:
+    """Statistics of one column from a sample of its values."""
+    present = [value for value in values if value is not None]
+    counts: Dict[Any, int] = {}
+    for value in present:
+        if isinstance(value, (str, int, float, Decimal)):
+            counts[value] = counts.get(value, 0) + 1
+    
+    stats: Dict[str, Any] = {
+        "column": column,
+        "null_fraction": round(1 - len(present) / len(values), 3) if values else None,
+        "distinct": len(counts) if counts else None,
+        "rows": len(present),
+        "values": [],
+        "min": None,
+        "max": None,
+        "sampled": True
+    }
+    if present and all(isinstance(value, str) for value in present):
+        if max(len(value) for value in present) <= 64:
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            stats["values"] = [value for value, _ in ranked[:max_values]]
+    elif present:
+        try:
+            stats["min"], stats["max"] = min(present), max(present)
+        except TypeError:
+            pass
+    return stats
+
+
+def _describe_plan_node(node: Dict[str, Any], depth: int = 0) -> List[str]:
+    """Indented one-line-per-node text of a PostgreSQL JSON plan."""
+    line = node["Node Type"]
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    lines = ["  " * depth + f"{line} (cost={node['Total Cost']})"]
+    for child in node.get("Plans", []):
+        lines.extend(_describe_plan_node(child, depth + 1))
+    return lines
 
 
 class DatabaseAdapter(ABC):
     """Abstract base class for database adapters."""
     
-    def __init__(self, connection_string: str):
+    # Driver module imported on first use, so only configured dialects pay for it
+    driver_name: Optional[str] = None
+    
+    # DB-API parameter style of the driver and the identifier quote character
+    paramstyle: str = "qmark"
+    identifier_quote: str = '"'
+    
+    # Statement prefix returning the execution plan of a query
+    explain_prefix: str = "EXPLAIN "
+    
+    # Whether a column's values may have different types (as in SQLite)
+    dynamic_typing: bool = False
+    
+    @classmethod
+    def load_driver(cls):
+        """Import and return the driver module for this adapter."""
+        if cls.driver_name is None:
+            raise NotImplementedError(f"{cls.__name__} has no driver configured")
+        return importlib.import_module(cls.driver_name)
+    
+    def __init__(
+        self,
+        connection_string: str,
+        min_connections: int = 1,
+        max_connections: int = 10,
+        connection_timeout: Optional[float] = 30,
+        statement_cache_size: int = 256,
+        query_timeout: Optional[float] = None
+    ):
         self.connection_string = connection_string
-        self.connection = None
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.connection_timeout = connection_timeout
+        # Prepared statements kept per connection by adapters that prepare them
+        self.statement_cache_size = statement_cache_size
+        # Server-side time limit for interactive queries, in seconds, where the adapter supports one
+        self.query_timeout = query_timeout
+        self.pool: Optional[ConnectionPool] = None
+        self._pool_lock = asyncio.Lock()
         self.db_type = self._detect_db_type(connection_string)
     
     def _detect_db_type(self, connection_string: str) -> str:
@@ -33,30 +125,238 @@ class DatabaseAdapter(ABC):
         else:
             raise ValueError(f"Unsupported database type: {scheme}")
     
-    @abstractmethod
     async def connect(self):
-        """Establish database connection."""
+        """Open the connection pool with its minimum number of connections."""
+        async with self._pool_lock:
+            if self.pool is None:
+                pool = ConnectionPool(
+                    self._open_connection,
+                    self._close_connection,
+                    min_size=self.min_connections,
+                    max_size=self.max_connections,
+                    acquire_timeout=self.connection_timeout,
+                    reusable=self._reusable_after_error
+                )
+                await pool.open()
+                # Publish the pool only after the hook, so no request sees it half-initialized
+                try:
+                    await self._on_connect(pool)
+                except BaseException:
+                    await pool.close()
+                    raise
+                self.pool = pool
+    
+    async def _on_connect(self, pool: ConnectionPool):
+        """Hook run once after the pool has been opened, before it is used."""
         pass
     
-    @abstractmethod
     async def disconnect(self):
-        """Close database connection."""
+        """Close the connection pool."""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a pooled connection, opening the pool on first use."""
+        if self.pool is None:
+            await self.connect()
+        async with self.pool.acquire() as connection:
+            yield connection
+    
+    async def ping_pool(self) -> Dict[str, int]:
+        """Run SELECT 1 on every idle pooled connection."""
+        if self.pool is None:
+            await self.connect()
+        return await self.pool.ping(self._ping)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics."""
+        if self.pool is None:
+            return {"min_size": self.min_connections, "max_size": self.max_connections, "size": 0}
+        return self.pool.stats()
+    
+    @abstractmethod
+    async def _open_connection(self):
+        """Open a single driver connection for the pool."""
+        pass
+    
+    @abstractmethod
+    async def _close_connection(self, connection):
+        """Close a single driver connection."""
         pass
     
     @abstractmethod
-    async def execute_query(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    async def _ping(self, connection) -> bool:
+        """Run SELECT 1 on a driver connection."""
+        pass
+    
+    @abstractmethod
+    async def execute_query(self, query: str, params: Optional[Sequence[Any]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
         """Execute SELECT query and return results with column names."""
         pass
     
     @abstractmethod
+    def stream_query(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Yield (columns, rows) batches from a server-side cursor.
+        
+        At least one batch is yielded, so the columns of an empty result are
+        still reported. Close the iterator to release the connection early.
+        """
+        pass
+    
+    async def stream_record_batches(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 10000,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Any]:
+        """Yield Arrow record batches built column-wise from the cursor batches."""
+        builder = None
+        batches = self.stream_query(query, params, batch_size)
+        try:
+            async for columns, rows in batches:
+                if builder is None:
+                    builder = RecordBatchBuilder(columns, metadata, widen_integers=self.dynamic_typing)
+                yield builder.build(rows)
+        finally:
+            await batches.aclose()
+    
+    async def explain(self, query: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+        """Get the execution plan of a query, one line per plan row."""
+        rows, columns = await self.execute_query(self.explain_prefix + query, params)
+        if len(columns) == 1:
+            return [str(row[columns[0]]) for row in rows]
+        return [", ".join(f"{column}={row[column]}" for column in columns) for row in rows]
+    
+    async def list_indexes(self, table: str) -> List[List[str]]:
+        """Column lists of a table's indexes, leading column first."""
+        raise NotImplementedError(f"Index introspection is not supported for {self.get_sql_dialect()}")
+    
+    async def plan_with_index(
+        self,
+        queries: Sequence[str],
+        index: Optional[Tuple[str, Sequence[str]]] = None,
+        build: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Plans of queries as if a (table, columns) index existed.
+        
+        Returns the plan lines and the planner's total cost of each query,
+        or None where the planner reports no cost. The index is set up once
+        for all the queries and only exists inside a transaction that is
+        rolled back. Without ``build``, databases that can only plan with
+        an index by actually building it raise NotImplementedError.
+        """
+        raise NotImplementedError(f"Index planning is not supported for {self.get_sql_dialect()}")
+    
+    async def hypothetical_indexes(self) -> bool:
+        """Whether indexes can be planned with without building them."""
+        return False
+    
+    async def create_index(self, name: str, table: str, columns: Sequence[str]):
+        """Create an index if no index of that name exists."""
+        async with self.acquire() as connection:
+            await connection.execute(self._index_sql(table, columns, name, if_not_exists=True))
+    
+    def _index_sql(self, table: str, columns: Sequence[str], name: str, if_not_exists: bool = False) -> str:
+        """CREATE INDEX statement for the columns of a table."""
+        column_list = ", ".join(self.quote_identifier(column) for column in columns)
+        return (
+            f"CREATE INDEX {'IF NOT EXISTS ' if if_not_exists else ''}{self.quote_identifier(name)} "
+            f"ON {self.quote_identifier(table)} ({column_list})"
+        )
+    
+    def placeholder(self, index: int) -> str:
+        """Bind parameter marker for the 1-based parameter index."""
+        if self.paramstyle == "numeric":
+            return f"${index}"
+        elif self.paramstyle == "format":
+            return "%s"
+        return "?"
+    
+    def quote_identifier(self, name: str) -> str:
+        """Quote a column or table name for this dialect."""
+        quote = self.identifier_quote
+        return f"{quote}{name.replace(quote, quote * 2)}{quote}"
+    
     async def get_schema(self) -> str:
         """Get database schema information."""
+        versions = await self.table_versions()
+        return self.compose_schema(list(versions), await self.read_tables(list(versions)))
+    
+    @abstractmethod
+    async def table_versions(self) -> Dict[str, str]:
+        """Cheap version token per table, in schema order.
+        
+        A token changes whenever the table's columns may have changed, so
+        only tables with a new token need to be read again.
+        """
         pass
     
     @abstractmethod
+    async def read_tables(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Read the schema description block of each given table."""
+        pass
+    
+    async def data_versions(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Version token per table that changes when its rows change.
+        
+        Tables without a known token are left out; adapters that cannot
+        tell return an empty mapping.
+        """
+        return {}
+    
+    def compose_schema(self, tables: Sequence[str], blocks: Dict[str, str]) -> str:
+        """Join table blocks, in the given order, into the schema description."""
+        return f"Database Schema ({self.get_sql_dialect()}):\n\n" + "".join(
+            blocks[table] for table in tables if table in blocks
+        )
+    
+    async def column_statistics(
+        self,
+        table: str,
+        sample_rows: int = 1000,
+        max_values: int = 8
+    ) -> List[Dict[str, Any]]:
+        """Per-column null fraction, distinct count, frequent values and range of a table.
+        
+        Computed from the first ``sample_rows`` rows, so the query cost is
+        bounded whatever the table size. Frequent values are only reported
+        for short text columns and ranges only for other comparable types;
+        ``rows`` is the number of non-NULL values the statistics cover.
+        """
+        rows, columns = await self.execute_query(
+            f"SELECT * FROM {self.quote_identifier(table)} LIMIT {int(sample_rows)}"
+        )
+        return [_sample_column_statistics(column, [row[column] for row in rows], max_values) for column in columns]
+    
     async def test_connection(self) -> bool:
         """Test database connection."""
-        pass
+        try:
+            async with self.acquire() as connection:
+                return await self._ping(connection)
+        except Exception:
+            return False
+    
+    async def replication_lag(self) -> Optional[float]:
+        """Seconds this node lags behind its primary, 0 for a primary, None if unknown."""
+        async with self.acquire() as connection:
+            await self._ping(connection)
+        return None
+    
+    def is_connection_error(self, error: BaseException) -> bool:
+        """Whether an error means the server is unreachable rather than the query failed."""
+        return isinstance(error, (OSError, asyncio.TimeoutError))
+    
+    def _reusable_after_error(self, connection, error: BaseException) -> bool:
+        """Whether a connection can go back to the pool after its block raised."""
+        return False
     
     @abstractmethod
     def get_sql_dialect(self) -> str:
@@ -67,9 +367,34 @@ class DatabaseAdapter(ABC):
 class SQLiteAdapter(DatabaseAdapter):
     """SQLite database adapter."""
     
+    driver_name = "aiosqlite"
+    explain_prefix = "EXPLAIN QUERY PLAN "
+    dynamic_typing = True
+    
     async def connect(self):
-        """Establish SQLite connection."""
-        import aiosqlite
+        """Open the SQLite connection pool."""
+        # Every connection to :memory: is a separate database
+        if self._database_path() == ':memory:':
+            self.min_connections = self.max_connections = 1
+        
+        await super().connect()
+    
+    async def _on_connect(self, pool: ConnectionPool):
+        """Seed sample data once the pool is open."""
+        async with pool.acquire() as connection:
+            await self._initialize_sample_data(connection)
+    
+    def _reusable_after_error(self, connection, error: BaseException) -> bool:
+        """Keep connections a failed or cancelled statement left outside a transaction.
+        
+        aiosqlite runs each statement to completion in the connection's own
+        thread, so cancelling the caller cannot leave it mid-protocol, and
+        the only connection to :memory: holds the whole database.
+        """
+        return not self.is_connection_error(error) and not connection.in_transaction
+    
+    def _database_path(self) -> str:
+        """Resolve the SQLite database file path."""
         import os
         
         # Extract database path from connection string
@@ -86,91 +411,183 @@ class SQLiteAdapter(DatabaseAdapter):
                 # Fallback to current directory
                 db_path = os.path.join(os.getcwd(), db_path)
         
-        self.connection = await aiosqlite.connect(db_path)
-        self.connection.row_factory = aiosqlite.Row
-        await self._initialize_sample_data()
+        return db_path
     
-    async def disconnect(self):
-        """Close SQLite connection."""
-        if self.connection:
-            await self.connection.close()
+    async def _open_connection(self):
+        """Open a SQLite connection."""
+        aiosqlite = self.load_driver()
+        connection = await aiosqlite.connect(self._database_path())
+        connection.row_factory = aiosqlite.Row
+        return connection
     
-    async def execute_query(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Execute SQLite query."""
-        if not self.connection:
-            await self.connect()
-        
-        cursor = await self.connection.execute(query)
-        results = await cursor.fetchall()
-        
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        result_list = [dict(row) for row in results]
-        
-        await cursor.close()
-        return result_list, columns
+    async def _close_connection(self, connection):
+        """Close a SQLite connection."""
+        await connection.close()
     
-    async def get_schema(self) -> str:
-        """Get SQLite schema information."""
-        if not self.connection:
-            await self.connect()
-        
-        cursor = await self.connection.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
-        )
-        tables = await cursor.fetchall()
+    async def _ping(self, connection) -> bool:
+        """Run SELECT 1 on a SQLite connection."""
+        cursor = await connection.execute("SELECT 1")
+        result = await cursor.fetchone()
         await cursor.close()
-        
-        schema_text = "Database Schema (SQLite):\n\n"
-        
-        for table_row in tables:
-            table_name = table_row[0]
-            schema_text += f"Table: {table_name}\n"
+        return result[0] == 1
+    
+    async def execute_query(self, query: str, params: Optional[Sequence[Any]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Execute SQLite query."""
+        async with self.acquire() as connection:
+            cursor = await connection.execute(query, tuple(params or ()))
+            results = await cursor.fetchall()
             
-            cursor = await self.connection.execute(f"PRAGMA table_info({table_name})")
-            columns = await cursor.fetchall()
-            await cursor.close()
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            result_list = [dict(row) for row in results]
             
-            for col in columns:
-                col_name, col_type = col[1], col[2]
-                not_null = "NOT NULL" if col[3] else "NULL"
-                primary_key = " (PRIMARY KEY)" if col[5] else ""
-                schema_text += f"  - {col_name}: {col_type} {not_null}{primary_key}\n"
+            await cursor.close()
+        return result_list, columns
+    
+    async def stream_query(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Stream SQLite rows in batches."""
+        async with self.acquire() as connection:
+            cursor = await connection.execute(query, tuple(params or ()))
+            try:
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                rows = await cursor.fetchmany(batch_size)
+                yield columns, [tuple(row) for row in rows]
+                while rows:
+                    rows = await cursor.fetchmany(batch_size)
+                    if rows:
+                        yield columns, [tuple(row) for row in rows]
+            finally:
+                await cursor.close()
+    
+    async def explain(self, query: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+        """Get the SQLite query plan, one line per plan step."""
+        rows, _ = await self.execute_query(self.explain_prefix + query, params)
+        return [row["detail"] for row in rows]
+    
+    async def list_indexes(self, table: str) -> List[List[str]]:
+        """Indexes from PRAGMA index_list, plus the rowid alias of INTEGER PRIMARY KEY tables."""
+        indexes = []
+        async with self.acquire() as connection:
+            cursor = await connection.execute(f"PRAGMA index_list({self.quote_identifier(table)})")
+            index_rows = await cursor.fetchall()
+            await cursor.close()
+            for index_row in index_rows:
+                # Partial indexes only serve queries that repeat their WHERE clause
+                if index_row["partial"]:
+                    continue
+                cursor = await connection.execute(f"PRAGMA index_info({self.quote_identifier(index_row['name'])})")
+                columns = [row["name"] for row in await cursor.fetchall()]
+                await cursor.close()
+                if columns and None not in columns:
+                    indexes.append(columns)
             
-            schema_text += "\n"
+            cursor = await connection.execute(f"PRAGMA table_info({self.quote_identifier(table)})")
+            primary_key = [row for row in await cursor.fetchall() if row["pk"]]
+            await cursor.close()
+        if len(primary_key) == 1 and primary_key[0]["type"].upper() == "INTEGER":
+            indexes.append([primary_key[0]["name"]])
+        return indexes
+    
+    async def plan_with_index(
+        self,
+        queries: Sequence[str],
+        index: Optional[Tuple[str, Sequence[str]]] = None,
+        build: bool = True
+    ) -> List[Dict[str, Any]]:
+        """EXPLAIN QUERY PLAN, with the index built in a rolled back transaction.
         
-        return schema_text
+        SQLite plans carry no cost, so ``cost`` is None.
+        """
+        async with self.acquire() as connection:
+            if index is not None:
+                await connection.execute("BEGIN")
+            try:
+                if index is not None:
+                    table, columns = index
+                    await connection.execute(self._index_sql(table, columns, "index_advisor_probe"))
+                plans = []
+                for query in queries:
+                    cursor = await connection.execute(self.explain_prefix + query)
+                    plans.append({"plan": [row["detail"] for row in await cursor.fetchall()], "cost": None})
+                    await cursor.close()
+            finally:
+                if index is not None:
+                    await connection.execute("ROLLBACK")
+        return plans
     
-    async def test_connection(self) -> bool:
-        """Test SQLite connection."""
-        try:
-            if not self.connection:
-                await self.connect()
-            cursor = await self.connection.execute("SELECT 1")
-            result = await cursor.fetchone()
+    async def table_versions(self) -> Dict[str, str]:
+        """Hash of each table's CREATE statement in sqlite_master."""
+        async with self.acquire() as connection:
+            cursor = await connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+            tables = await cursor.fetchall()
             await cursor.close()
-            return result[0] == 1
-        except Exception:
-            return False
+        return {
+            name: hashlib.sha1((sql or "").encode("utf-8")).hexdigest()
+            for name, sql in tables
+        }
+    
+    async def data_versions(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Modification time and size of the database file and its WAL, shared by all tables."""
+        import os
+        
+        path = self._database_path()
+        if path == ':memory:':
+            return {}
+        parts = []
+        for file_path in (path, path + "-wal"):
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        version = "|".join(parts)
+        return {table: version for table in tables} if parts else {}
+    
+    async def read_tables(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Read SQLite table columns with PRAGMA table_info."""
+        blocks = {}
+        async with self.acquire() as connection:
+            for table_name in tables:
+                block = f"Table: {table_name}\n"
+                
+                cursor = await connection.execute(f"PRAGMA table_info({self.quote_identifier(table_name)})")
+                columns = await cursor.fetchall()
+                await cursor.close()
+                
+                for col in columns:
+                    col_name, col_type = col[1], col[2]
+                    not_null = "NOT NULL" if col[3] else "NULL"
+                    primary_key = " (PRIMARY KEY)" if col[5] else ""
+                    block += f"  - {col_name}: {col_type} {not_null}{primary_key}\n"
+                
+                blocks[table_name] = block + "\n"
+        return blocks
     
     def get_sql_dialect(self) -> str:
         """Get SQL dialect for LLM."""
         return "SQLite"
     
-    async def _initialize_sample_data(self):
+    async def _initialize_sample_data(self, connection):
         """Initialize SQLite with sample data if needed."""
-        cursor = await self.connection.execute(
+        cursor = await connection.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='customers'"
         )
         exists = await cursor.fetchone()
         await cursor.close()
         
         if not exists:
-            await self._create_sample_tables()
+            await self._create_sample_tables(connection)
     
-    async def _create_sample_tables(self):
+    async def _create_sample_tables(self, connection):
         """Create sample tables for SQLite."""
         # Create customers table
-        await self.connection.execute('''
+        await connection.execute('''
             CREATE TABLE customers (
                 customer_id TEXT PRIMARY KEY,
                 company_name TEXT NOT NULL,
@@ -187,7 +604,7 @@ class SQLiteAdapter(DatabaseAdapter):
         ''')
         
         # Create products table
-        await self.connection.execute('''
+        await connection.execute('''
             CREATE TABLE products (
                 product_id INTEGER PRIMARY KEY,
                 product_name TEXT NOT NULL,
@@ -203,7 +620,7 @@ class SQLiteAdapter(DatabaseAdapter):
         ''')
         
         # Create categories table
-        await self.connection.execute('''
+        await connection.execute('''
             CREATE TABLE categories (
                 category_id INTEGER PRIMARY KEY,
                 category_name TEXT NOT NULL,
@@ -212,7 +629,7 @@ class SQLiteAdapter(DatabaseAdapter):
         ''')
         
         # Create orders table
-        await self.connection.execute('''
+        await connection.execute('''
             CREATE TABLE orders (
                 order_id INTEGER PRIMARY KEY,
                 customer_id TEXT,
@@ -233,10 +650,10 @@ class SQLiteAdapter(DatabaseAdapter):
         ''')
         
         # Insert sample data
-        await self._insert_sample_data()
-        await self.connection.commit()
+        await self._insert_sample_data(connection)
+        await connection.commit()
     
-    async def _insert_sample_data(self):
+    async def _insert_sample_data(self, connection):
         """Insert sample data into tables."""
         # Sample customers
         customers_data = [
@@ -248,7 +665,7 @@ class SQLiteAdapter(DatabaseAdapter):
             ('BLAUS', 'Blauer See Delikatessen', 'Hanna Moos', 'Sales Representative', 'Forsterstr. 57', 'Mannheim', None, '68306', 'Germany', '0621-08460', '0621-08924'),
         ]
         
-        await self.connection.executemany('''
+        await connection.executemany('''
             INSERT INTO customers 
             (customer_id, company_name, contact_name, contact_title, address, city, region, postal_code, country, phone, fax) 
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -263,7 +680,7 @@ class SQLiteAdapter(DatabaseAdapter):
             (5, 'Meat/Poultry', 'Prepared meats'),
         ]
         
-        await self.connection.executemany('''
+        await connection.executemany('''
             INSERT INTO categories (category_id, category_name, description) 
             VALUES (?, ?, ?)
         ''', categories_data)
@@ -277,7 +694,7 @@ class SQLiteAdapter(DatabaseAdapter):
             (5, 'Chef Antons Gumbo Mix', 2, 2, '36 boxes', 21.35, 0, 0, 0, 1),
         ]
         
-        await self.connection.executemany('''
+        await connection.executemany('''
             INSERT INTO products 
             (product_id, product_name, supplier_id, category_id, quantity_per_unit, unit_price, units_in_stock, units_on_order, reorder_level, discontinued) 
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -289,7 +706,7 @@ class SQLiteAdapter(DatabaseAdapter):
             (10249, 'ANATR', 6, '1996-07-05', '1996-08-16', '1996-07-10', 1, 11.61, 'Ana Trujillo Emparedados y helados', 'Avda. de la Constitución 2222', 'México D.F.', None, '05021', 'Mexico'),
         ]
         
-        await self.connection.executemany('''
+        await connection.executemany('''
             INSERT INTO orders 
             (order_id, customer_id, employee_id, order_date, required_date, shipped_date, ship_via, freight, ship_name, ship_address, ship_city, ship_region, ship_postal_code, ship_country) 
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -297,39 +714,169 @@ class SQLiteAdapter(DatabaseAdapter):
 
 
 class PostgreSQLAdapter(DatabaseAdapter):
-    """PostgreSQL database adapter."""
+    """PostgreSQL database adapter.
     
-    async def connect(self):
-        """Establish PostgreSQL connection."""
-        import asyncpg
-        self.connection = await asyncpg.connect(self.connection_string)
+    Queries run through prepared statements cached per connection, so a
+    repeated query (e.g. SQL served from the cache) is parsed and planned
+    once per connection. Column names come from the statement, so they are
+    known even for empty results.
+    """
     
-    async def disconnect(self):
-        """Close PostgreSQL connection."""
-        if self.connection:
-            await self.connection.close()
+    driver_name = "asyncpg"
+    paramstyle = "numeric"
     
-    async def execute_query(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Execute PostgreSQL query."""
-        if not self.connection:
-            await self.connect()
+    def __init__(self, connection_string: str, **pool_options):
+        super().__init__(connection_string, **pool_options)
+        # Connection id -> prepared statements in least recently used order
+        self._statements: Dict[int, "OrderedDict[str, Any]"] = {}
+    
+    async def _open_connection(self):
+        """Open a PostgreSQL connection with the adapter's type codecs."""
+        asyncpg = self.load_driver()
+        # Statements are cached by the adapter, not by asyncpg
+        connection = await asyncpg.connect(self.connection_string, statement_cache_size=0)
+        try:
+            await self._register_codecs(connection)
+        except BaseException:
+            await connection.close()
+            raise
+        return connection
+    
+    async def _register_codecs(self, connection):
+        """Decode JSON as Python objects.
         
-        result = await self.connection.fetch(query)
+        The default returns JSON text, which costs a second conversion
+        before the results can be serialized. Numeric and timestamps keep
+        asyncpg's native binary codecs, which decode numeric to an exact
+        Decimal.
+        """
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name, schema="pg_catalog", encoder=json.dumps, decoder=json.loads, format="text"
+            )
+    
+    async def _close_connection(self, connection):
+        """Close a PostgreSQL connection."""
+        self._statements.pop(id(connection), None)
+        await connection.close()
+    
+    async def _ping(self, connection) -> bool:
+        """Run SELECT 1 on a PostgreSQL connection."""
+        return await connection.fetchval("SELECT 1") == 1
+    
+    async def _prepare(self, connection, query: str):
+        """Get a prepared statement for a query, preparing it on first use."""
+        statements = self._statements.setdefault(id(connection), OrderedDict())
+        statement = statements.get(query)
+        if statement is not None:
+            statements.move_to_end(query)
+            return statement
         
-        if result:
-            columns = list(result[0].keys())
-            result_list = [dict(row) for row in result]
-        else:
-            columns = []
-            result_list = []
+        statement = await connection.prepare(query)
+        if self.statement_cache_size > 0:
+            statements[query] = statement
+            while len(statements) > self.statement_cache_size:
+                statements.popitem(last=False)
+        return statement
+    
+    def _forget(self, connection, query: str):
+        """Drop a cached prepared statement."""
+        self._statements.get(id(connection), {}).pop(query, None)
+    
+    async def execute_query(self, query: str, params: Optional[Sequence[Any]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Execute PostgreSQL query."""
+        asyncpg = self.load_driver()
+        async with self.acquire() as connection:
+            statement = await self._prepare(connection, query)
+            try:
+                result = await statement.fetch(*(params or ()))
+            except asyncpg.exceptions.InvalidCachedStatementError:
+                # A schema change invalidated the plan; prepare it again once
+                self._forget(connection, query)
+                statement = await self._prepare(connection, query)
+                result = await statement.fetch(*(params or ()))
         
+        columns = [attribute.name for attribute in statement.get_attributes()]
+        result_list = [dict(row) for row in result]
         return result_list, columns
     
-    async def get_schema(self) -> str:
-        """Get PostgreSQL schema information."""
-        if not self.connection:
-            await self.connect()
+    async def stream_query(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Stream PostgreSQL rows in batches through a server-side cursor."""
+        async with self.acquire() as connection:
+            # Cursors only exist inside a transaction
+            async with connection.transaction(readonly=True):
+                statement = await self._prepare(connection, query)
+                columns = [attribute.name for attribute in statement.get_attributes()]
+                try:
+                    cursor = await statement.cursor(*(params or ()))
+                except Exception:
+                    # The transaction cannot retry; make sure the next call prepares afresh
+                    self._forget(connection, query)
+                    raise
+                rows = await cursor.fetch(batch_size)
+                yield columns, [tuple(row) for row in rows]
+                while rows:
+                    rows = await cursor.fetch(batch_size)
+                    if rows:
+                        yield columns, [tuple(row) for row in rows]
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool and prepared statement cache statistics."""
+        stats = super().pool_stats()
+        stats["prepared_statements"] = sum(len(statements) for statements in self._statements.values())
+        return stats
+    
+    async def table_versions(self) -> Dict[str, str]:
+        """Relation OID plus a digest of live column count, types, nullability and primary key.
         
+        Reads only pg_catalog, which is far cheaper than information_schema
+        on catalogs with thousands of tables.
+        """
+        query = """
+        SELECT
+            c.relname AS table_name,
+            c.oid::text || ':' || md5(
+                COALESCE((
+                    SELECT count(*)::text || '/' || string_agg(
+                        a.attname || ' ' || a.atttypid::text || ' ' || a.attnotnull::text, ',' ORDER BY a.attnum
+                    )
+                    FROM pg_attribute a
+                    WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                ), '') || '|' || COALESCE((
+                    SELECT p.conkey::text FROM pg_constraint p WHERE p.conrelid = c.oid AND p.contype = 'p'
+                ), '')
+            ) AS version
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+        ORDER BY c.relname
+        """
+        async with self.acquire() as connection:
+            result = await connection.fetch(query)
+        return {row['table_name']: row['version'] for row in result}
+    
+    async def data_versions(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Inserted, updated and deleted row counts from pg_stat_user_tables.
+        
+        The statistics are reported when transactions end, so a change
+        shows up shortly after it commits.
+        """
+        query = """
+        SELECT relname, n_tup_ins::text || ':' || n_tup_upd::text || ':' || n_tup_del::text AS version
+        FROM pg_stat_user_tables
+        WHERE schemaname = 'public' AND relname = ANY($1::text[])
+        """
+        async with self.acquire() as connection:
+            result = await connection.fetch(query, list(tables))
+        return {row['relname']: row['version'] for row in result}
+    
+    async def read_tables(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Read PostgreSQL table columns from information_schema."""
         query = """
         SELECT 
             t.table_name,
@@ -339,43 +886,183 @@ class PostgreSQLAdapter(DatabaseAdapter):
             c.column_default,
             CASE WHEN pk.column_name IS NOT NULL THEN 'YES' ELSE 'NO' END as is_primary_key
         FROM information_schema.tables t
-        LEFT JOIN information_schema.columns c ON t.table_name = c.table_name
+        LEFT JOIN information_schema.columns c ON t.table_name = c.table_name AND t.table_schema = c.table_schema
         LEFT JOIN (
             SELECT ku.table_name, ku.column_name
             FROM information_schema.table_constraints tc
             JOIN information_schema.key_column_usage ku ON tc.constraint_name = ku.constraint_name
             WHERE tc.constraint_type = 'PRIMARY KEY'
         ) pk ON c.table_name = pk.table_name AND c.column_name = pk.column_name
-        WHERE t.table_schema = 'public' AND t.table_type = 'BASE TABLE'
+        WHERE t.table_schema = 'public' AND t.table_type = 'BASE TABLE' AND t.table_name = ANY($1::text[])
         ORDER BY t.table_name, c.ordinal_position
         """
         
-        result = await self.connection.fetch(query)
-        
-        schema_text = "Database Schema (PostgreSQL):\n\n"
-        current_table = None
+        async with self.acquire() as connection:
+            result = await connection.fetch(query, list(tables))
         
+        blocks: Dict[str, str] = {}
         for row in result:
-            if row['table_name'] != current_table:
-                current_table = row['table_name']
-                schema_text += f"Table: {current_table}\n"
+            table_name = row['table_name']
+            if table_name not in blocks:
+                blocks[table_name] = f"Table: {table_name}\n"
+            if row['column_name'] is None:
+                continue
             
             nullable = "NULL" if row['is_nullable'] == 'YES' else "NOT NULL"
             primary_key = " (PRIMARY KEY)" if row['is_primary_key'] == 'YES' else ""
             
-            schema_text += f"  - {row['column_name']}: {row['data_type']} {nullable}{primary_key}\n"
+            blocks[table_name] += f"  - {row['column_name']}: {row['data_type']} {nullable}{primary_key}\n"
         
-        return schema_text
+        return blocks
     
-    async def test_connection(self) -> bool:
-        """Test PostgreSQL connection."""
-        try:
-            if not self.connection:
-                await self.connect()
-            result = await self.connection.fetchval("SELECT 1")
-            return result == 1
-        except Exception:
-            return False
+    async def list_indexes(self, table: str) -> List[List[str]]:
+        """Indexes from pg_indexes; expression and partial indexes are left out."""
+        async with self.acquire() as connection:
+            result = await connection.fetch(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = 'public' AND tablename = $1", table
+            )
+        indexes = []
+        for row in result:
+            match = re.search(r"USING \w+ \((.*)\)(?: INCLUDE \(.*\))?$", row["indexdef"])
+            if match is None:
+                continue
+            columns = []
+            for part in match.group(1).split(", "):
+                name = re.sub(r" (ASC|DESC|NULLS FIRST|NULLS LAST)\b", "", part).strip()
+                if re.fullmatch(r'\w+|"(?:[^"]|"")+"', name) is None:
+                    columns = None
+                    break
+                columns.append(name[1:-1].replace('""', '"') if name.startswith('"') else name)
+            if columns:
+                indexes.append(columns)
+        return indexes
+    
+    async def hypothetical_indexes(self) -> bool:
+        """Whether the hypopg extension is installed."""
+        async with self.acquire() as connection:
+            return bool(await connection.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'hypopg')"
+            ))
+    
+    async def plan_with_index(
+        self,
+        queries: Sequence[str],
+        index: Optional[Tuple[str, Sequence[str]]] = None,
+        build: bool = True
+    ) -> List[Dict[str, Any]]:
+        """EXPLAIN (FORMAT JSON) with a hypothetical index.
+        
+        The index is a hypopg index when that extension is installed, so no
+        index is built. Otherwise, and only with ``build``, it is built once
+        inside a transaction that is rolled back after all the queries are
+        planned. The build holds a SHARE lock, blocking writes to the table
+        for up to the statement timeout; the lock timeout only bounds the
+        wait for that lock.
+        """
+        hypopg = index is not None and await self.hypothetical_indexes()
+        if index is not None and not hypopg and not build:
+            raise NotImplementedError("Planning with an index on PostgreSQL needs the hypopg extension")
+        async with self.acquire() as connection:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                if index is not None:
+                    table, columns = index
+                    if hypopg:
+                        await connection.fetchval(
+                            "SELECT indexrelid FROM hypopg_create_index($1)",
+                            self._index_sql(table, columns, "index_advisor_probe")
+                        )
+                    else:
+                        await connection.execute("SET LOCAL lock_timeout = '1s'")
+                        await connection.execute(f"SET LOCAL statement_timeout = '{int((self.query_timeout or 30) * 1000)}ms'")
+                        await connection.execute(self._index_sql(table, columns, "index_advisor_probe"))
+                results = [await connection.fetchval("EXPLAIN (FORMAT JSON) " + query) for query in queries]
+            finally:
+                await transaction.rollback()
+                if hypopg:
+                    await connection.execute("SELECT hypopg_reset()")
+        plans = []
+        for result in results:
+            root = (json.loads(result) if isinstance(result, str) else result)[0]["Plan"]
+            plans.append({"plan": _describe_plan_node(root), "cost": float(root["Total Cost"])})
+        return plans
+    
+    async def column_statistics(
+        self,
+        table: str,
+        sample_rows: int = 1000,
+        max_values: int = 8
+    ) -> List[Dict[str, Any]]:
+        """Column statistics from pg_stats, sampling tables that were never analyzed.
+        
+        pg_stats covers the whole table at no query cost. Negative
+        n_distinct values are fractions of the row count; the range comes
+        from the histogram bounds, which leave out the most common values.
+        """
+        query = """
+        SELECT
+            s.attname,
+            s.null_frac,
+            s.n_distinct,
+            c.reltuples,
+            t.typcategory IN ('S', 'E') AS is_text,
+            array_to_json(s.most_common_vals::text::text[]) AS most_common_vals,
+            array_to_json(s.histogram_bounds::text::text[]) AS histogram_bounds
+        FROM pg_stats s
+        JOIN pg_namespace n ON n.nspname = s.schemaname
+        JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = s.attname
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE s.schemaname = 'public' AND s.tablename = $1 AND NOT s.inherited
+        ORDER BY a.attnum
+        """
+        async with self.acquire() as connection:
+            result = await connection.fetch(query, table)
+        if not result:
+            return await super().column_statistics(table, sample_rows, max_values)
+        
+        statistics = []
+        for row in result:
+            n_distinct = row['n_distinct']
+            if n_distinct < 0:
+                n_distinct = -n_distinct * max(row['reltuples'], 0)
+            common = row['most_common_vals'] or []
+            bounds = row['histogram_bounds'] or []
+            is_text = row['is_text']
+            statistics.append({
+                "column": row['attname'],
+                "null_fraction": round(row['null_frac'], 3),
+                "distinct": int(n_distinct) or None,
+                "rows": int(max(row['reltuples'], 0) * (1 - row['null_frac'])),
+                "values": [value for value in common[:max_values] if len(value) <= 64] if is_text else [],
+                "min": bounds[0] if bounds and not is_text else None,
+                "max": bounds[-1] if bounds and not is_text else None,
+                "sampled": False
+            })
+        return statistics
+    
+    async def replication_lag(self) -> Optional[float]:
+        """Seconds since the last replayed transaction on a standby, 0 on a primary."""
+        async with self.acquire() as connection:
+            lag = await connection.fetchval(
+                "SELECT CASE WHEN pg_is_in_recovery() "
+                "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )
+        return float(lag)
+    
+    def is_connection_error(self, error: BaseException) -> bool:
+        """Whether an error means the server is unreachable rather than the query failed."""
+        asyncpg = self.load_driver()
+        return super().is_connection_error(error) or isinstance(
+            error,
+            (
+                asyncpg.exceptions.PostgresConnectionError,
+                asyncpg.exceptions.CannotConnectNowError,
+                asyncpg.exceptions.InterfaceError
+            )
+        )
     
     def get_sql_dialect(self) -> str:
         """Get SQL dialect for LLM."""
@@ -383,14 +1070,31 @@ class PostgreSQLAdapter(DatabaseAdapter):
 
 
 class MySQLAdapter(DatabaseAdapter):
-    """MySQL database adapter."""
+    """MySQL and MariaDB database adapter.
     
-    async def connect(self):
-        """Establish MySQL connection."""
-        import aiomysql
+    Results are read with unbuffered tuple cursors in batches, so the driver
+    never holds a second full copy of a large result. Interactive queries
+    get a server-side time limit of ``query_timeout`` seconds.
+    """
+    
+    driver_name = "aiomysql"
+    paramstyle = "format"
+    identifier_quote = "`"
+    
+    # Rows read per round trip from unbuffered cursors
+    fetch_batch_size = 1000
+    
+    def __init__(self, connection_string: str, **pool_options):
+        super().__init__(connection_string, **pool_options)
+        # MariaDB has its own syntax for per-statement time limits; detected on connect
+        self.is_mariadb = False
+    
+    async def _open_connection(self):
+        """Open a MySQL connection."""
+        aiomysql = self.load_driver()
         
         parsed = urlparse(self.connection_string)
-        self.connection = await aiomysql.connect(
+        connection = await aiomysql.connect(
             host=parsed.hostname,
             port=parsed.port or 3306,
             user=parsed.username,
@@ -398,36 +1102,119 @@ class MySQLAdapter(DatabaseAdapter):
             db=parsed.path.lstrip('/'),
             autocommit=True
         )
+        self.is_mariadb = "mariadb" in (connection.get_server_info() or "").lower()
+        return connection
     
-    async def disconnect(self):
-        """Close MySQL connection."""
-        if self.connection:
-            self.connection.close()
+    async def _close_connection(self, connection):
+        """Close a MySQL connection."""
+        connection.close()
     
-    async def execute_query(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Execute MySQL query."""
-        if not self.connection:
-            await self.connect()
-        
-        cursor = await self.connection.cursor(aiomysql.DictCursor)
-        await cursor.execute(query)
-        result = await cursor.fetchall()
-        
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        result_list = list(result) if result else []
-        
+    async def _ping(self, connection) -> bool:
+        """Run SELECT 1 on a MySQL connection."""
+        cursor = await connection.cursor()
+        await cursor.execute("SELECT 1")
+        result = await cursor.fetchone()
         await cursor.close()
-        return result_list, columns
+        return result[0] == 1
     
-    async def get_schema(self) -> str:
-        """Get MySQL schema information."""
-        if not self.connection:
-            await self.connect()
+    def _with_time_limit(self, query: str) -> str:
+        """Add the server-side execution time limit to a query.
         
-        parsed = urlparse(self.connection_string)
-        database_name = parsed.path.lstrip('/')
+        The MAX_EXECUTION_TIME hint goes after the main query's SELECT
+        keyword: the first one outside parentheses, which skips the CTE
+        bodies of a WITH query, or else the first one, as for a
+        parenthesized query or union. Statements without a SELECT run
+        without a limit.
+        """
+        if not self.query_timeout:
+            return query
+        if self.is_mariadb:
+            return f"SET STATEMENT max_statement_time={float(self.query_timeout)} FOR {query}"
+        selects = [token for token in tokenize_sql(query) if token.is_word("SELECT")]
+        select = next((token for token in selects if token.depth == 0), selects[0] if selects else None)
+        if select is None:
+            logger.debug("No execution time limit for statement without SELECT: %s", query[:80])
+            return query
+        hint = f" /*+ MAX_EXECUTION_TIME({int(self.query_timeout * 1000)}) */"
+        position = select.start + len(select.text)
+        return query[:position] + hint + query[position:]
+    
+    async def execute_query(self, query: str, params: Optional[Sequence[Any]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Execute MySQL query."""
+        aiomysql = self.load_driver()
+        async with self.acquire() as connection:
+            cursor = await connection.cursor(aiomysql.SSCursor)
+            try:
+                await cursor.execute(self._with_time_limit(query), tuple(params) if params else None)
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                result_list = []
+                rows = await cursor.fetchmany(self.fetch_batch_size)
+                while rows:
+                    result_list.extend(dict(zip(columns, row)) for row in rows)
+                    rows = await cursor.fetchmany(self.fetch_batch_size)
+            finally:
+                await cursor.close()
+        return result_list, columns
+    
+    async def stream_query(
+        self,
+        query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Stream MySQL rows in batches through an unbuffered cursor."""
+        aiomysql = self.load_driver()
+        async with self.acquire() as connection:
+            cursor = await connection.cursor(aiomysql.SSCursor)
+            try:
+                await cursor.execute(query, tuple(params) if params else None)
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                rows = await cursor.fetchmany(batch_size)
+                yield columns, list(rows)
+                while rows:
+                    rows = await cursor.fetchmany(batch_size)
+                    if rows:
+                        yield columns, list(rows)
+            finally:
+                # Closing an unbuffered cursor drains unread rows from the connection
+                await cursor.close()
+    
+    def _database_name(self) -> str:
+        """Database (schema) name from the connection string."""
+        return urlparse(self.connection_string).path.lstrip('/')
+    
+    async def table_versions(self) -> Dict[str, str]:
+        """CREATE_TIME and UPDATE_TIME of each table from INFORMATION_SCHEMA.TABLES.
         
+        ALTER TABLE changes one of them; UPDATE_TIME also moves on writes,
+        which only costs an unnecessary re-read of that table.
+        """
         query = """
+        SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME
+        FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = %s
+        ORDER BY TABLE_NAME
+        """
+        async with self.acquire() as connection:
+            cursor = await connection.cursor()
+            try:
+                await cursor.execute(query, (self._database_name(),))
+                result = await cursor.fetchall()
+            finally:
+                await cursor.close()
+        return {table_name: f"{created}|{updated}" for table_name, created, updated in result}
+    
+    async def data_versions(self, tables: Sequence[str]) -> Dict[str, str]:
+        """UPDATE_TIME of each table, which InnoDB moves on every committed write."""
+        versions = await self.table_versions()
+        return {table: versions[table] for table in tables if table in versions}
+    
+    async def read_tables(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Read MySQL table columns from INFORMATION_SCHEMA.COLUMNS."""
+        if not tables:
+            return {}
+        
+        query = f"""
         SELECT 
             TABLE_NAME,
             COLUMN_NAME,
@@ -436,42 +1223,61 @@ class MySQLAdapter(DatabaseAdapter):
             COLUMN_DEFAULT,
             COLUMN_KEY
         FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_SCHEMA = %s
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME IN ({", ".join(["%s"] * len(tables))})
         ORDER BY TABLE_NAME, ORDINAL_POSITION
         """
         
-        cursor = await self.connection.cursor(aiomysql.DictCursor)
-        await cursor.execute(query, (database_name,))
-        result = await cursor.fetchall()
-        await cursor.close()
-        
-        schema_text = "Database Schema (MySQL):\n\n"
-        current_table = None
+        aiomysql = self.load_driver()
+        async with self.acquire() as connection:
+            cursor = await connection.cursor(aiomysql.DictCursor)
+            await cursor.execute(query, (self._database_name(), *tables))
+            result = await cursor.fetchall()
+            await cursor.close()
         
+        blocks: Dict[str, str] = {}
         for row in result:
-            if row['TABLE_NAME'] != current_table:
-                current_table = row['TABLE_NAME']
-                schema_text += f"Table: {current_table}\n"
+            table_name = row['TABLE_NAME']
+            if table_name not in blocks:
+                blocks[table_name] = f"Table: {table_name}\n"
             
             nullable = "NULL" if row['IS_NULLABLE'] == 'YES' else "NOT NULL"
             primary_key = " (PRIMARY KEY)" if row['COLUMN_KEY'] == 'PRI' else ""
             
-            schema_text += f"  - {row['COLUMN_NAME']}: {row['DATA_TYPE']} {nullable}{primary_key}\n"
+            blocks[table_name] += f"  - {row['COLUMN_NAME']}: {row['DATA_TYPE']} {nullable}{primary_key}\n"
         
-        return schema_text
+        return blocks
     
-    async def test_connection(self) -> bool:
-        """Test MySQL connection."""
-        try:
-            if not self.connection:
-                await self.connect()
-            cursor = await self.connection.cursor()
-            await cursor.execute("SELECT 1")
-            result = await cursor.fetchone()
-            await cursor.close()
-            return result[0] == 1
-        except Exception:
-            return False
+    async def replication_lag(self) -> Optional[float]:
+        """Seconds_Behind_Source of a replica, 0 when the server is not replicating."""
+        aiomysql = self.load_driver()
+        async with self.acquire() as connection:
+            cursor = await connection.cursor(aiomysql.DictCursor)
+            try:
+                try:
+                    await cursor.execute("SHOW REPLICA STATUS")
+                except aiomysql.ProgrammingError:
+                    # Servers before MySQL 8.0.22 / MariaDB 10.5 only know the old name
+                    await cursor.execute("SHOW SLAVE STATUS")
+                status = await cursor.fetchone()
+            finally:
+                await cursor.close()
+        if not status:
+            return 0.0
+        lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        if lag is None:
+            raise RuntimeError("Replication is not running")
+        return float(lag)
+    
+    def is_connection_error(self, error: BaseException) -> bool:
+        """Whether an error means the server is unreachable rather than the query failed."""
+        aiomysql = self.load_driver()
+        # Can't connect, server gone away, lost connection during query
+        connection_codes = (2002, 2003, 2006, 2013, 2055)
+        return super().is_connection_error(error) or (
+            isinstance(error, aiomysql.OperationalError)
+            and bool(error.args)
+            and error.args[0] in connection_codes
+        )
     
     def get_sql_dialect(self) -> str:
         """Get SQL dialect for LLM."""
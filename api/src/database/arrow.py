@@ -0,0 +1,158 @@
+"""
+Apache Arrow record batches built from driver rows (requires the optional pyarrow package).
+"""
+import importlib.util
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def arrow_available() -> bool:
+    """Whether pyarrow is installed."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class RecordBatchBuilder:
+    """Turns batches of row tuples into Arrow record batches with a fixed schema.
+
+    Column types are inferred from the first batch and reused for the rest,
+    so every batch of a stream shares one schema. Columns that are entirely
+    NULL in the first batch are typed as strings. With ``widen_integers``
+    (for dynamically typed databases such as SQLite, where one column may
+    hold integers and reals) integer columns are typed float64 and decimal
+    columns get the widest precision. Values a later batch holds that do not
+    fit the schema are converted one by one, or written as NULL when they
+    cannot be, rather than failing the stream.
+    """
+
+    def __init__(self, columns: List[str], metadata: Optional[Dict[str, str]] = None, widen_integers: bool = False):
+        import pyarrow
+
+        self._pa = pyarrow
+        self.columns = columns
+        self.metadata = metadata
+        self.widen_integers = widen_integers
+        self.schema = None
+        self._stringify: List[bool] = []
+
+    def build(self, rows: List[tuple]):
+        """Build a record batch from row tuples."""
+        pa = self._pa
+        values = [list(column) for column in zip(*rows)] if rows else [[] for _ in self.columns]
+
+        if self.schema is None:
+            inferred = [self._infer(column) for column in values]
+            self._stringify = [pa.types.is_null(data_type) for data_type in inferred]
+            self.schema = pa.schema(
+                [
+                    pa.field(name, pa.string() if stringify else data_type)
+                    for name, data_type, stringify in zip(self.columns, inferred, self._stringify)
+                ],
+                metadata=self.metadata
+            )
+
+        arrays = []
+        for column, field, stringify in zip(values, self.schema, self._stringify):
+            if stringify:
+                column = [None if value is None else str(value) for value in column]
+            try:
+                arrays.append(pa.array(column, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError, TypeError, ValueError):
+                arrays.append(self._coerce(column, field))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _infer(self, column: List[Any]):
+        """Arrow type of a column in the first batch."""
+        pa = self._pa
+        data_type = pa.array(column).type
+        if not self.widen_integers:
+            return data_type
+        if pa.types.is_integer(data_type):
+            return pa.float64()
+        if pa.types.is_decimal(data_type):
+            return pa.decimal128(38, min(data_type.scale, 38))
+        return data_type
+
+    def _coerce(self, column: List[Any], field):
+        """Array of a column whose values do not all match the field type."""
+        pa = self._pa
+        data_type = field.type
+        converted = []
+        for value in column:
+            if value is not None:
+                try:
+                    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+                        value = str(value)
+                    elif pa.types.is_floating(data_type):
+                        value = float(value)
+                    elif pa.types.is_integer(data_type):
+                        value = int(value) if float(value).is_integer() else None
+                    elif pa.types.is_decimal(data_type):
+                        value = Decimal(str(value)).quantize(Decimal(1).scaleb(-data_type.scale))
+                    pa.array([value], type=data_type)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, ArithmeticError, TypeError, ValueError):
+                    value = None
+            converted.append(value)
+        lost = sum(1 for before, after in zip(column, converted) if before is not None and after is None)
+        if lost:
+            logger.warning("Wrote %d value(s) of column %s as NULL: they do not fit %s", lost, field.name, data_type)
+        return pa.array(converted, type=data_type)
+
+
+class _ChunkSink:
+    """File-like object collecting what the IPC writer produces."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def ipc_stream(batches: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """Encode record batches as an Arrow IPC stream, one chunk per batch."""
+    import pyarrow.ipc
+
+    sink = _ChunkSink()
+    writer = None
+    try:
+        async for batch in batches:
+            if writer is None:
+                writer = pyarrow.ipc.new_stream(sink, batch.schema)
+            writer.write_batch(batch)
+            yield sink.drain()
+
+        if writer is not None:
+            # Closing writes the end-of-stream marker
+            writer.close()
+            writer = None
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
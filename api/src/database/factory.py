@@ -1,6 +1,7 @@
 """
 Database factory for creating appropriate database adapters.
 """
+from typing import Type
 from urllib.parse import urlparse
 from .adapters import DatabaseAdapter, SQLiteAdapter, PostgreSQLAdapter, MySQLAdapter
 
@@ -9,17 +10,23 @@ class DatabaseFactory:
     """Factory class to create appropriate database adapter."""
     
     @staticmethod
-    def create_adapter(connection_string: str) -> DatabaseAdapter:
+    def create_adapter(connection_string: str, **pool_options) -> DatabaseAdapter:
         """Create database adapter based on connection string."""
+        adapter_class = DatabaseFactory.get_adapter_class(connection_string)
+        return adapter_class(connection_string, **pool_options)
+    
+    @staticmethod
+    def get_adapter_class(connection_string: str) -> Type[DatabaseAdapter]:
+        """Resolve the adapter class for a connection string without connecting."""
         parsed = urlparse(connection_string)
         scheme = parsed.scheme.lower()
         
         if scheme.startswith('sqlite'):
-            return SQLiteAdapter(connection_string)
+            return SQLiteAdapter
         elif scheme.startswith('postgresql') or scheme.startswith('postgres'):
-            return PostgreSQLAdapter(connection_string)
+            return PostgreSQLAdapter
         elif scheme.startswith('mysql'):
-            return MySQLAdapter(connection_string)
+            return MySQLAdapter
         elif scheme.startswith('mssql') or scheme.startswith('sqlserver'):
             # TODO: Implement SQL Server adapter
             raise NotImplementedError("SQL Server support coming soon")
@@ -1,42 +1,305 @@
 """
 Database manager for handling database operations.
 """
-from typing import Dict, Any, List, Tuple
+import asyncio
+import hashlib
+import time
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Sequence, Tuple, Optional
 from .factory import DatabaseFactory
 from .adapters import DatabaseAdapter
+from .replicas import ReplicaRouter
+from ..utils.exceptions import QueryExecutionError
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def mask_url(database_url: str) -> str:
+    """Hide credentials in a connection string."""
+    if '@' in database_url:
+        parts = database_url.split('@')
+        if len(parts) == 2:
+            protocol_and_creds = parts[0]
+            host_and_db = parts[1]
+            if '://' in protocol_and_creds:
+                protocol = protocol_and_creds.split('://')[0]
+                return f"{protocol}://***@{host_and_db}"
+    return "***"
 
 
 class DatabaseManager:
-    """Enhanced Database Manager with multi-database support."""
+    """Enhanced Database Manager with multi-database support.
     
-    def __init__(self, database_url: str):
+    With replica URLs configured, queries are spread across the replicas and
+    fall back to the primary when none is available. Schema introspection
+    always reads the primary, so every request sees one consistent schema.
+    
+    The schema is kept per table together with a cheap version token from
+    the catalog. A refresh compares tokens and re-reads only tables that
+    changed, so large catalogs stay cheap to keep current. Once loaded, an
+    expired schema is still served while it is refreshed in the background.
+    """
+    
+    def __init__(
+        self,
+        database_url: str,
+        schema_ttl_seconds: Optional[float] = None,
+        replica_urls: Optional[Sequence[str]] = None,
+        max_replica_lag_seconds: Optional[float] = None,
+        replica_backoff_seconds: float = 1.0,
+        **pool_options
+    ):
         self.database_url = database_url
-        self.adapter: DatabaseAdapter = DatabaseFactory.create_adapter(database_url)
+        self.adapter: DatabaseAdapter = DatabaseFactory.create_adapter(database_url, **pool_options)
+        self.replicas: Optional[ReplicaRouter] = None
+        if replica_urls:
+            self.replicas = ReplicaRouter(
+                [
+                    (f"replica-{index} ({mask_url(url)})", DatabaseFactory.create_adapter(url, **pool_options))
+                    for index, url in enumerate(replica_urls, start=1)
+                ],
+                max_lag_seconds=max_replica_lag_seconds,
+                backoff_seconds=replica_backoff_seconds
+            )
+        self.schema_ttl_seconds = schema_ttl_seconds
+        self._schema: Optional[str] = None
+        self._schema_hash: Optional[str] = None
+        self._schema_loaded_at: Optional[float] = None
+        self._tables: Dict[str, str] = {}
+        self._table_versions: Dict[str, str] = {}
+        self._schema_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.schema_refreshes = 0
+        self.tables_reread = 0
+    
+    async def connect(self):
+        """Open the adapter connection pool."""
+        await self.adapter.connect()
     
-    async def get_connection(self):
-        """Get database connection through adapter."""
-        if not self.adapter.connection:
-            await self.adapter.connect()
-        return self.adapter.connection
+    def get_connection(self):
+        """Borrow a pooled connection (use as ``async with``)."""
+        return self.adapter.acquire()
     
     async def test_connection(self) -> bool:
         """Test database connection."""
         return await self.adapter.test_connection()
     
-    async def get_schema(self) -> str:
-        """Get database schema information."""
-        return await self.adapter.get_schema()
+    async def ping_pool(self) -> Dict[str, int]:
+        """Run SELECT 1 on every pooled connection."""
+        return await self.adapter.ping_pool()
     
-    async def execute_query(self, sql_query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Execute SQL query and return results."""
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics."""
+        stats = self.adapter.pool_stats()
+        if self.replicas is not None:
+            stats = {**stats, "replicas": self.replicas.stats()}
+        return stats
+    
+    async def check_replicas(self):
+        """Ping replicas and refresh their replication lag."""
+        if self.replicas is not None:
+            await self.replicas.check()
+    
+    async def get_schema(self, refresh: bool = False) -> str:
+        """Get database schema information, cached between calls.
+        
+        Only the first load (or ``refresh=True``) waits for the database; an
+        expired schema is returned as is and refreshed in the background.
+        """
+        if self._schema is None or refresh:
+            await self.refresh_schema()
+        elif (
+            self.schema_ttl_seconds is not None
+            and time.monotonic() - self._schema_loaded_at > self.schema_ttl_seconds
+            and (self._refresh_task is None or self._refresh_task.done())
+        ):
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+        return self._schema
+    
+    async def refresh_schema(self) -> List[str]:
+        """Re-read tables whose catalog version changed and return their names.
+        
+        Dropped tables are removed and new ones added; the schema text and
+        hash only change when a table description actually differs.
+        """
+        async with self._schema_lock:
+            versions = await self.adapter.table_versions()
+            changed = [
+                table for table, version in versions.items()
+                if self._table_versions.get(table) != version or table not in self._tables
+            ]
+            blocks = await self.adapter.read_tables(changed) if changed else {}
+            
+            tables = {table: self._tables[table] for table in versions if table in self._tables}
+            tables.update(blocks)
+            self._tables = tables
+            # Tables that vanished between the two reads are retried next time
+            self._table_versions = {table: version for table, version in versions.items() if table in tables}
+            
+            schema = self.adapter.compose_schema(list(versions), tables)
+            if schema != self._schema:
+                self._set_schema(schema)
+            else:
+                self._schema_loaded_at = time.monotonic()
+            self.schema_refreshes += 1
+            self.tables_reread += len(blocks)
+            return changed
+    
+    async def _background_refresh(self):
+        try:
+            changed = await self.refresh_schema()
+        except Exception as e:
+            logger.warning("Background schema refresh failed: %s", e)
+            return
+        if changed:
+            logger.info("Schema refreshed: %d changed table(s)", len(changed))
+    
+    @property
+    def schema_hash(self) -> Optional[str]:
+        """Short hash of the cached schema text, or None before the first load."""
+        return self._schema_hash
+    
+    def _set_schema(self, schema: str):
+        """Store schema text and its hash."""
+        self._schema = schema
+        self._schema_hash = hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+        self._schema_loaded_at = time.monotonic()
+    
+    async def execute_query(self, sql_query: str, params: Optional[Sequence[Any]] = None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Execute SQL query with optional bind parameters and return results."""
         # Safety check - only allow SELECT queries
         if not sql_query.strip().upper().startswith('SELECT'):
             raise ValueError("Only SELECT queries are allowed")
         
         try:
-            return await self.adapter.execute_query(sql_query)
+            return await self._read(lambda adapter: adapter.execute_query(sql_query, params))
         except Exception as e:
-            raise Exception(f"Query execution error: {str(e)}")
+            raise QueryExecutionError(f"Query execution error: {str(e)}") from e
+    
+    def is_connection_error(self, error: BaseException) -> bool:
+        """Whether an error, or the error it was raised from, means the database is unreachable."""
+        seen = set()
+        while error is not None and id(error) not in seen:
+            if self.adapter.is_connection_error(error):
+                return True
+            seen.add(id(error))
+            error = error.__cause__ or error.__context__
+        return False
+    
+    async def explain(self, sql_query: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+        """Get the execution plan of a SELECT query without running it."""
+        if not sql_query.strip().upper().startswith('SELECT'):
+            raise ValueError("Only SELECT queries are allowed")
+        return await self._read(lambda adapter: adapter.explain(sql_query, params))
+    
+    async def data_versions(self, tables: Sequence[str]) -> Dict[str, str]:
+        """Row-change version tokens of tables on the primary, where the database provides them."""
+        return await self.adapter.data_versions(tables)
+    
+    async def list_indexes(self, table: str) -> List[List[str]]:
+        """Column lists of a table's indexes on the primary."""
+        return await self.adapter.list_indexes(table)
+    
+    async def plan_with_index(
+        self,
+        sql_queries: Sequence[str],
+        index: Optional[Tuple[str, Sequence[str]]] = None,
+        build: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Plans and costs of SELECT queries on the primary, optionally with a hypothetical index."""
+        if not all(sql_query.strip().upper().startswith('SELECT') for sql_query in sql_queries):
+            raise ValueError("Only SELECT queries are allowed")
+        return await self.adapter.plan_with_index(sql_queries, index, build)
+    
+    async def hypothetical_indexes(self) -> bool:
+        """Whether the primary can plan with indexes without building them."""
+        return await self.adapter.hypothetical_indexes()
+    
+    async def create_index(self, name: str, table: str, columns: Sequence[str]):
+        """Create an index on the primary."""
+        await self.adapter.create_index(name, table, columns)
+    
+    async def column_statistics(self, table: str, sample_rows: int = 1000, max_values: int = 8) -> List[Dict[str, Any]]:
+        """Get column statistics of one table (see ``DatabaseAdapter.column_statistics``)."""
+        return await self._read(lambda adapter: adapter.column_statistics(table, sample_rows, max_values))
+    
+    def stream_query(
+        self,
+        sql_query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Stream (columns, rows) batches of a SELECT query with bounded memory."""
+        if not sql_query.strip().upper().startswith('SELECT'):
+            raise ValueError("Only SELECT queries are allowed")
+        return self._read_stream(lambda adapter: adapter.stream_query(sql_query, params, batch_size))
+    
+    def stream_record_batches(
+        self,
+        sql_query: str,
+        params: Optional[Sequence[Any]] = None,
+        batch_size: int = 10000,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Any]:
+        """Stream a SELECT query as Arrow record batches (requires pyarrow)."""
+        if not sql_query.strip().upper().startswith('SELECT'):
+            raise ValueError("Only SELECT queries are allowed")
+        return self._read_stream(
+            lambda adapter: adapter.stream_record_batches(sql_query, params, batch_size, metadata)
+        )
+    
+    async def _read(self, operation: Callable[[DatabaseAdapter], Awaitable[Any]]) -> Any:
+        """Run a read on a replica, failing over to others and then the primary."""
+        tried = []
+        while self.replicas is not None:
+            node = self.replicas.pick(exclude=tried)
+            if node is None:
+                break
+            tried.append(node)
+            try:
+                async with self.replicas.track(node):
+                    result = await operation(node.adapter)
+            except Exception as e:
+                # Errors in the query itself would fail on every node
+                if not node.adapter.is_connection_error(e):
+                    raise
+                self.replicas.record_failure(node, e)
+                continue
+            self.replicas.record_success(node)
+            return result
+        return await operation(self.adapter)
+    
+    async def _read_stream(self, open_stream: Callable[[DatabaseAdapter], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Stream a read from a replica, or the primary if the replica fails before the first item."""
+        node = self.replicas.pick() if self.replicas is not None else None
+        if node is not None:
+            async with self.replicas.track(node):
+                stream = open_stream(node.adapter)
+                try:
+                    first = await stream.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    await stream.aclose()
+                    if not node.adapter.is_connection_error(e):
+                        raise
+                    self.replicas.record_failure(node, e)
+                else:
+                    self.replicas.record_success(node)
+                    try:
+                        yield first
+                        async for item in stream:
+                            yield item
+                    finally:
+                        await stream.aclose()
+                    return
+        
+        stream = open_stream(self.adapter)
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            await stream.aclose()
     
     def get_sql_dialect(self) -> str:
         """Get SQL dialect for LLM prompts."""
@@ -45,17 +308,7 @@ class DatabaseManager:
     def get_database_info(self) -> Dict[str, Any]:
         """Get database information."""
         # Mask sensitive information in connection string
-        masked_url = self.database_url
-        if '@' in masked_url:
-            parts = masked_url.split('@')
-            if len(parts) == 2:
-                protocol_and_creds = parts[0]
-                host_and_db = parts[1]
-                if '://' in protocol_and_creds:
-                    protocol = protocol_and_creds.split('://')[0]
-                    masked_url = f"{protocol}://***@{host_and_db}"
-        else:
-            masked_url = "***"
+        masked_url = mask_url(self.database_url)
         
         # Get database features
         supported_dbs = DatabaseFactory.get_supported_databases()
@@ -65,9 +318,26 @@ class DatabaseManager:
         return {
             "database_type": dialect,
             "connection_string_masked": masked_url,
-            "supported_features": features
+            "supported_features": features,
+            "replicas": [node.name for node in self.replicas.nodes] if self.replicas is not None else []
+        }
+    
+    def schema_stats(self) -> Dict[str, Any]:
+        """Get schema cache statistics."""
+        return {
+            "tables": len(self._tables),
+            "schema_hash": self._schema_hash,
+            "age_seconds": round(time.monotonic() - self._schema_loaded_at, 1) if self._schema_loaded_at else None,
+            "refreshes": self.schema_refreshes,
+            "tables_reread": self.tables_reread,
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done()
         }
     
     async def close(self):
         """Close database connection."""
-        await self.adapter.disconnect()
\ No newline at end of file
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+        await self.adapter.disconnect()
+        if self.replicas is not None:
+            await self.replicas.close()
\ No newline at end of file
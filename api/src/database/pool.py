@@ -0,0 +1,165 @@
+"""
+Lightweight asyncio connection pool shared by the database adapters.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class ConnectionPool:
+    """Bounded pool of driver connections with min/max sizing and health pings."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Any]],
+        close: Callable[[Any], Awaitable[None]],
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: Optional[float] = 30,
+        reusable: Optional[Callable[[Any, BaseException], bool]] = None
+    ):
+        self._connect = connect
+        self._close = close
+        self._reusable = reusable
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: deque = deque()
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        # Counters for pool statistics
+        self.acquired_total = 0
+        self.created_total = 0
+        self.discarded_total = 0
+
+    async def open(self):
+        """Open connections up to the minimum pool size."""
+        while self._size < self.min_size:
+            self._idle.append(await self._create())
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a connection from the pool for the duration of the block.
+
+        The connection goes back to the pool only when the block exits
+        cleanly. When it raises or is cancelled the connection may be broken
+        or stopped mid-protocol (e.g. a cursor drain cut short), so it is
+        closed instead, unless the ``reusable`` hook vouches for it.
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.acquire_timeout)
+        finally:
+            self._waiting -= 1
+
+        try:
+            connection = self._idle.pop() if self._idle else await self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        self._in_use += 1
+        self.acquired_total += 1
+        try:
+            yield connection
+        except BaseException as error:
+            self._in_use -= 1
+            try:
+                if self._closed or self._reusable is None or not self._reusable(connection, error):
+                    await self._discard(connection)
+                else:
+                    self._idle.append(connection)
+            finally:
+                self._slots.release()
+            raise
+
+        self._in_use -= 1
+        try:
+            if self._closed:
+                await self._discard(connection)
+            else:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    async def ping(self, check: Callable[[Any], Awaitable[bool]]) -> Dict[str, int]:
+        """Run a health check on every idle connection, replacing broken ones."""
+        checked = 0
+        healthy = 0
+        replaced = 0
+        for _ in range(len(self._idle)):
+            # Hold a slot while checking so concurrent acquires never exceed max_size;
+            # stop if requests are waiting, they will use the idle connections anyway
+            if not self._idle or self._slots.locked():
+                break
+            await self._slots.acquire()
+            connection = self._idle.popleft()
+            checked += 1
+            try:
+                try:
+                    ok = await check(connection)
+                except Exception:
+                    ok = False
+
+                if ok:
+                    healthy += 1
+                    self._idle.append(connection)
+                    continue
+
+                await self._discard(connection)
+                if self._size < self.min_size:
+                    try:
+                        self._idle.append(await self._create())
+                        replaced += 1
+                    except Exception:
+                        pass
+            finally:
+                self._slots.release()
+
+        return {"checked": checked, "healthy": healthy, "replaced": replaced}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "acquired_total": self.acquired_total,
+            "created_total": self.created_total,
+            "discarded_total": self.discarded_total,
+            "closed": self._closed
+        }
+
+    async def close(self):
+        """Close idle connections; borrowed ones are closed when released."""
+        self._closed = True
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    async def _create(self):
+        """Open a new driver connection."""
+        connection = await self._connect()
+        self._size += 1
+        self.created_total += 1
+        return connection
+
+    async def _discard(self, connection):
+        """Close a connection and drop it from the pool."""
+        self._size -= 1
+        self.discarded_total += 1
+        try:
+            await self._close(connection)
+        except Exception:
+            pass
@@ -0,0 +1,131 @@
+"""
+Read-replica routing with least-outstanding-requests balancing and ejection.
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .adapters import DatabaseAdapter
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ReplicaNode:
+    """A replica adapter with its routing state."""
+
+    def __init__(self, name: str, adapter: DatabaseAdapter):
+        self.name = name
+        self.adapter = adapter
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.requests_total = 0
+        self.errors_total = 0
+
+    def stats(self) -> Dict[str, Any]:
+        remaining = self.ejected_until - time.monotonic()
+        return {
+            "name": self.name,
+            "ejected": remaining > 0,
+            "retry_in_seconds": round(remaining, 1) if remaining > 0 else None,
+            "outstanding": self.outstanding,
+            "lag_seconds": self.lag_seconds,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "pool": self.adapter.pool_stats()
+        }
+
+
+class ReplicaRouter:
+    """Chooses a replica for each read.
+
+    Reads go to the available replica with the fewest requests in flight.
+    A replica is unavailable while it is ejected after a connection failure
+    (for an exponentially growing backoff, after which it gets traffic again
+    on trial) or while its last measured replication lag exceeds
+    ``max_lag_seconds``. When no replica is available, callers fall back to
+    the primary.
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[Tuple[str, DatabaseAdapter]],
+        max_lag_seconds: Optional[float] = None,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0
+    ):
+        self.nodes = [ReplicaNode(name, adapter) for name, adapter in replicas]
+        self.max_lag_seconds = max_lag_seconds
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+    def available(self, node: ReplicaNode) -> bool:
+        """Whether a node may receive reads now."""
+        if node.ejected_until > time.monotonic():
+            return False
+        if self.max_lag_seconds is not None and node.lag_seconds is not None:
+            return node.lag_seconds <= self.max_lag_seconds
+        return True
+
+    def pick(self, exclude: Sequence[ReplicaNode] = ()) -> Optional[ReplicaNode]:
+        """The available replica with the fewest outstanding requests, or None."""
+        candidates = [node for node in self.nodes if node not in exclude and self.available(node)]
+        if not candidates:
+            return None
+        fewest = min(node.outstanding for node in candidates)
+        return random.choice([node for node in candidates if node.outstanding == fewest])
+
+    @asynccontextmanager
+    async def track(self, node: ReplicaNode):
+        """Count a request as outstanding on a node while it runs."""
+        node.outstanding += 1
+        node.requests_total += 1
+        try:
+            yield node
+        finally:
+            node.outstanding -= 1
+
+    def record_success(self, node: ReplicaNode):
+        """Reset a node's failure count after a successful request or check."""
+        if node.failures:
+            logger.info("Replica %s recovered", node.name)
+        node.failures = 0
+        node.ejected_until = 0.0
+        node.last_error = None
+
+    def record_failure(self, node: ReplicaNode, error: BaseException):
+        """Eject a node for a backoff that doubles with each consecutive failure."""
+        node.failures += 1
+        node.errors_total += 1
+        node.last_error = str(error) or type(error).__name__
+        backoff = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** (node.failures - 1))
+        node.ejected_until = time.monotonic() + backoff
+        logger.warning("Replica %s ejected for %.1fs: %s", node.name, backoff, node.last_error)
+
+    async def check(self, timeout: float = 5.0):
+        """Ping replicas and measure their lag; ejected ones only once their backoff has passed."""
+        now = time.monotonic()
+        due = [node for node in self.nodes if node.ejected_until <= now]
+        await asyncio.gather(*(self._check_node(node, timeout) for node in due))
+
+    async def _check_node(self, node: ReplicaNode, timeout: float):
+        try:
+            node.lag_seconds = await asyncio.wait_for(node.adapter.replication_lag(), timeout=timeout)
+        except Exception as e:
+            self.record_failure(node, e)
+            return
+        self.record_success(node)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Routing state of every replica."""
+        return [node.stats() for node in self.nodes]
+
+    async def close(self):
+        """Close every replica's connection pool."""
+        await asyncio.gather(*(node.adapter.disconnect() for node in self.nodes), return_exceptions=True)
@@ -1,30 +1,195 @@
 """
 Main FastAPI application entry point.
 """
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .core.simple_settings import settings
+from .core.settings import settings
 from .api.routes import router
+from .api.compression import CompressionMiddleware
+from .api.request_logging import RequestLoggingMiddleware
+from .api.profiling import ProfileStore, ProfilingMiddleware
+from .database.manager import DatabaseManager
+from .services.llm_service import LLMService
+from .services.column_stats import ColumnStatsCollector
+from .services.warmup_service import WarmupService
+from .services.health_service import HealthService
+from .services.index_advisor import IndexAdvisor
+from .services.result_service import ResultService
+from .services.result_refiner import ResultRefiner
+from .services.session_store import SessionStore
+from .services.summary_store import SummaryStore
+from .services.export_service import ExportService
+from .services.slow_query_log import SlowQueryLog
+from .utils.logging import setup_logging
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background warm-up and health checks; release resources on shutdown."""
+    tasks = [
+        asyncio.create_task(app.state.warmup_service.run()),
+        asyncio.create_task(app.state.health_service.run())
+    ]
+    if app.state.index_advisor.auto_apply:
+        tasks.append(asyncio.create_task(app.state.index_advisor.run()))
+    if app.state.summary_store is not None:
+        tasks.append(asyncio.create_task(app.state.summary_store.run()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await app.state.export_service.close()
+        await app.state.slow_query_log.close()
+        if app.state.llm_service.column_stats is not None:
+            await app.state.llm_service.column_stats.close()
+        await app.state.db_manager.close()
+        await app.state.llm_service.cache.close()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
     
+    setup_logging()
+    
     app = FastAPI(
-        title=settings.api_title,
-        version=settings.api_version,
-        description=settings.api_description
+        title=settings.api.title,
+        version=settings.api.version,
+        description=settings.api.description,
+        lifespan=lifespan
+    )
+    
+    # Shared services; connections are opened lazily or by the warm-up
+    app.state.db_manager = DatabaseManager(
+        settings.database.url,
+        schema_ttl_seconds=settings.database.schema_ttl_seconds,
+        replica_urls=settings.database.replica_urls,
+        max_replica_lag_seconds=settings.database.max_replica_lag_seconds,
+        replica_backoff_seconds=settings.database.replica_backoff_seconds,
+        min_connections=settings.database.min_connections,
+        max_connections=settings.database.max_connections,
+        connection_timeout=settings.database.connection_timeout,
+        statement_cache_size=settings.database.statement_cache_size,
+        query_timeout=settings.database.query_timeout
+    )
+    column_stats = None
+    if settings.llm.column_stats_enabled:
+        column_stats = ColumnStatsCollector(
+            app.state.db_manager,
+            sample_rows=settings.llm.column_stats_sample_rows,
+            max_values=settings.llm.column_stats_max_values,
+            ttl_seconds=settings.llm.column_stats_ttl_seconds
+        )
+    app.state.llm_service = LLMService(column_stats=column_stats)
+    app.state.result_service = ResultService(
+        app.state.db_manager,
+        ttl_seconds=settings.results.ttl_seconds,
+        max_handles=settings.results.max_handles,
+        default_page_size=settings.results.page_size,
+        max_page_size=settings.results.max_page_size
+    )
+    app.state.session_store = SessionStore(
+        ttl_seconds=settings.sessions.ttl_seconds,
+        max_sessions=settings.sessions.max_sessions,
+        max_turns=settings.sessions.max_turns,
+        max_result_rows=settings.sessions.max_result_rows,
+        max_cached_rows=settings.sessions.max_cached_rows
+    )
+    app.state.result_refiner = ResultRefiner()
+    app.state.summary_store = None
+    if settings.summaries.enabled:
+        app.state.summary_store = SummaryStore(
+            app.state.db_manager,
+            min_executions=settings.summaries.min_executions,
+            max_summaries=settings.summaries.max_summaries,
+            max_rows=settings.summaries.max_rows,
+            refresh_seconds=settings.summaries.refresh_seconds,
+            check_interval_seconds=settings.summaries.check_interval_seconds
+        )
+    app.state.export_service = ExportService(
+        app.state.db_manager,
+        app.state.llm_service,
+        directory=settings.exports.directory,
+        ttl_seconds=settings.exports.ttl_seconds,
+        max_concurrent_jobs=settings.exports.max_concurrent_jobs,
+        batch_size=settings.exports.batch_size
+    )
+    app.state.slow_query_log = SlowQueryLog(
+        app.state.db_manager,
+        generation_threshold_ms=settings.slow_queries.generation_threshold_ms,
+        execution_threshold_ms=settings.slow_queries.execution_threshold_ms,
+        max_entries=settings.slow_queries.max_entries,
+        file_path=settings.slow_queries.file_path,
+        capture_plans=settings.slow_queries.capture_plans
+    )
+    # Indexes are only created automatically on development SQLite databases
+    app.state.index_advisor = IndexAdvisor(
+        app.state.db_manager,
+        max_queries=settings.index_advisor.max_queries,
+        min_executions=settings.index_advisor.min_executions,
+        max_candidates=settings.index_advisor.max_candidates,
+        auto_apply=(
+            settings.index_advisor.auto_apply
+            and settings.is_development
+            and app.state.db_manager.get_sql_dialect() == "SQLite"
+        ),
+        interval_seconds=settings.index_advisor.interval_seconds,
+        build_indexes=settings.index_advisor.build_indexes
     )
+    app.state.profile_store = ProfileStore(max_profiles=settings.profiling.max_profiles)
+    app.state.warmup_service = WarmupService(
+        app.state.db_manager,
+        app.state.llm_service,
+        questions=settings.warmup.questions,
+        timeout_seconds=settings.warmup.timeout_seconds,
+        enabled=settings.warmup.enabled
+    )
+    app.state.health_service = HealthService(
+        app.state.db_manager,
+        app.state.warmup_service,
+        interval_seconds=settings.health.interval_seconds,
+        stale_after_seconds=settings.health.stale_after_seconds
+    )
+    
+    # Compress large responses; added first so it wraps the routes directly
+    if settings.compression.enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression.minimum_size,
+            levels={
+                "gzip": settings.compression.gzip_level,
+                "br": settings.compression.brotli_quality,
+                "zstd": settings.compression.zstd_level
+            }
+        )
     
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.cors_origins,
+        allow_origins=settings.api.cors_origins,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
     )
     
+    # Opt-in profiling; inside request logging so profiles carry the request ID
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=app.state.profile_store,
+        admin_token=settings.api.admin_token,
+        sample_rate=settings.profiling.sample_rate,
+        interval_ms=settings.profiling.interval_ms
+    )
+    
+    # Outermost, so request IDs and timings cover the whole middleware stack
+    app.add_middleware(
+        RequestLoggingMiddleware,
+        slow_request_ms=settings.logging.slow_request_ms
+    )
+    
     # Include API routes
     app.include_router(router)
     
@@ -39,7 +204,7 @@ if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
         "src.main:app",
-        host=settings.api_host,
-        port=settings.api_port,
+        host=settings.api.host,
+        port=settings.api.port,
         reload=True
-    )
\ No newline at end of file
+    )
@@ -4,15 +4,25 @@ Data models for the application.
 from .query_models import (
     QueryRequest,
     QueryResponse,
+    PagedQueryRequest,
+    ResultPage,
+    ExportRequest,
+    ExportJob,
     DatabaseInfo,
     SchemaResponse,
-    HealthResponse
+    HealthResponse,
+    ReadinessResponse
 )
 
 __all__ = [
     "QueryRequest",
     "QueryResponse", 
+    "PagedQueryRequest",
+    "ResultPage",
+    "ExportRequest",
+    "ExportJob",
     "DatabaseInfo",
     "SchemaResponse",
-    "HealthResponse"
+    "HealthResponse",
+    "ReadinessResponse"
 ]
\ No newline at end of file
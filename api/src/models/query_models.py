@@ -2,7 +2,7 @@
 Data models for query operations.
 """
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class QueryRequest(BaseModel):
@@ -10,12 +10,16 @@ class QueryRequest(BaseModel):
     
     question: str = Field(..., description="Natural language question")
     schema: Optional[str] = Field(None, description="Optional database schema override")
+    session_id: Optional[str] = Field(None, description="Conversation session to continue, from a previous response")
+    start_session: bool = Field(False, description="Start a conversation session when no session_id is given")
     
     class Config:
         json_schema_extra = {
             "example": {
                 "question": "Show me all customers from Germany",
-                "schema": None
+                "schema": None,
+                "session_id": None,
+                "start_session": True
             }
         }
 
@@ -28,6 +32,12 @@ class QueryResponse(BaseModel):
     columns: List[str] = Field(..., description="Column names")
     row_count: int = Field(..., description="Number of rows returned")
     execution_time_ms: Optional[float] = Field(None, description="Query execution time in milliseconds")
+    sql_source: Optional[str] = Field(None, description="Where the SQL came from: llm, cache, similarity or repair")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt size in tokens when the LLM was called")
+    repair_attempts: int = Field(0, description="Times failing SQL was sent back to the LLM for correction")
+    session_id: Optional[str] = Field(None, description="Conversation session to pass with follow-up questions")
+    data_source: str = Field("database", description="Where the rows came from: database, session for a follow-up filtered from the previous result, or summary for a precomputed aggregate")
+    limit_applied: bool = Field(False, description="Whether the row limit was added to the SQL and the results may be cut short")
     
     class Config:
         json_schema_extra = {
@@ -43,7 +53,125 @@ class QueryResponse(BaseModel):
                 ],
                 "columns": ["customer_id", "company_name", "city", "country"],
                 "row_count": 1,
-                "execution_time_ms": 45.2
+                "execution_time_ms": 45.2,
+                "sql_source": "llm",
+                "prompt_tokens": 812,
+                "session_id": "Hk3v0Qd8yJz1mW5tB9cXrA",
+                "data_source": "database",
+                "limit_applied": False
+            }
+        }
+
+
+class PagedQueryRequest(QueryRequest):
+    """Request model for natural language queries returned one page at a time."""
+    
+    page_size: Optional[int] = Field(None, ge=1, description="Rows per page (defaults to RESULTS_PAGE_SIZE)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "question": "Show me all orders",
+                "schema": None,
+                "page_size": 100
+            }
+        }
+
+
+class ResultPage(BaseModel):
+    """One page of a server-side query result."""
+    
+    result_id: str = Field(..., description="Server-side result handle")
+    sql_query: str = Field(..., description="Generated SQL query")
+    results: List[Dict[str, Any]] = Field(..., description="Rows on this page")
+    columns: List[str] = Field(..., description="Column names")
+    row_count: int = Field(..., description="Number of rows on this page")
+    page_size: int = Field(..., description="Maximum rows per page")
+    pagination: str = Field(..., description="Pagination strategy: keyset or offset")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, or null on the last page")
+    has_more: bool = Field(..., description="Whether more rows follow this page")
+    expires_in_seconds: float = Field(..., description="Idle time after which the result handle expires")
+    execution_time_ms: Optional[float] = Field(None, description="Time to produce this page in milliseconds")
+    sql_source: Optional[str] = Field(None, description="Where the SQL came from: llm, cache, similarity or repair")
+    prompt_tokens: Optional[int] = Field(None, description="Prompt size in tokens when the LLM was called")
+    repair_attempts: int = Field(0, description="Times failing SQL was sent back to the LLM for correction")
+    session_id: Optional[str] = Field(None, description="Conversation session to pass with follow-up questions")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "result_id": "q5kXv1mJ3o8tH0cJcVf2xw",
+                "sql_query": "SELECT order_id, customer_id, order_date FROM orders",
+                "results": [
+                    {"order_id": 10248, "customer_id": "VINET", "order_date": "1996-07-04"}
+                ],
+                "columns": ["order_id", "customer_id", "order_date"],
+                "row_count": 1,
+                "page_size": 100,
+                "pagination": "keyset",
+                "next_cursor": "eyJyIjoicTVrWHYxbUozbzh0SDBjSmNWZjJ4dyIsImsiOlsxMDM0N119",
+                "has_more": True,
+                "expires_in_seconds": 600,
+                "execution_time_ms": 12.7
+            }
+        }
+
+
+class ExportRequest(BaseModel):
+    """Request model for background export jobs."""
+    
+    question: Optional[str] = Field(None, description="Natural language question to generate SQL for")
+    sql_query: Optional[str] = Field(None, description="SELECT query to export instead of a question")
+    format: str = Field("csv", description="Export format: csv, jsonl or parquet")
+    
+    @model_validator(mode="after")
+    def _require_query(self):
+        """Require a question or a SQL query."""
+        if not self.question and not self.sql_query:
+            raise ValueError("Either question or sql_query is required")
+        return self
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "question": "Show me all orders",
+                "sql_query": None,
+                "format": "csv"
+            }
+        }
+
+
+class ExportJob(BaseModel):
+    """Background export job status."""
+    
+    job_id: str = Field(..., description="Export job identifier")
+    status: str = Field(..., description="Job status: queued, running, completed, failed or cancelled")
+    format: str = Field(..., description="Export format")
+    question: Optional[str] = Field(None, description="Question the SQL was generated for")
+    sql_query: Optional[str] = Field(None, description="SQL being exported")
+    rows_written: int = Field(0, description="Rows written so far")
+    bytes_written: int = Field(0, description="File size once completed")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    created_at: str = Field(..., description="When the job was submitted")
+    started_at: Optional[str] = Field(None, description="When the job started running")
+    finished_at: Optional[str] = Field(None, description="When the job finished")
+    download_url: Optional[str] = Field(None, description="Download URL once completed")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "r2Jx0s8nQy1ZbW4k",
+                "status": "completed",
+                "format": "csv",
+                "question": "Show me all orders",
+                "sql_query": "SELECT * FROM orders",
+                "rows_written": 830,
+                "bytes_written": 98214,
+                "error": None,
+                "created_at": "2024-01-15T10:30:00Z",
+                "started_at": "2024-01-15T10:30:00Z",
+                "finished_at": "2024-01-15T10:30:01Z",
+                "download_url": "/exports/r2Jx0s8nQy1ZbW4k/download"
             }
         }
 
@@ -54,6 +182,7 @@ class DatabaseInfo(BaseModel):
     database_type: str = Field(..., description="Type of database (SQLite, PostgreSQL, etc.)")
     connection_string_masked: str = Field(..., description="Masked connection string")
     supported_features: Dict[str, Any] = Field(..., description="Database-specific features")
+    replicas: List[str] = Field(default_factory=list, description="Masked read replica connection strings")
     
     class Config:
         json_schema_extra = {
@@ -65,7 +194,8 @@ class DatabaseInfo(BaseModel):
                     "limit_syntax": "LIMIT",
                     "supports_joins": True,
                     "supports_aggregations": True
-                }
+                },
+                "replicas": []
             }
         }
 
@@ -95,6 +225,7 @@ class HealthResponse(BaseModel):
     database_type: str = Field(..., description="Database type")
     version: str = Field(..., description="API version")
     timestamp: Optional[str] = Field(None, description="Health check timestamp")
+    last_checked: Optional[str] = Field(None, description="When the database was last checked")
     
     class Config:
         json_schema_extra = {
@@ -103,6 +234,41 @@ class HealthResponse(BaseModel):
                 "database": "connected",
                 "database_type": "SQLite",
                 "version": "2.0.0",
+                "timestamp": "2024-01-15T10:30:00Z",
+                "last_checked": "2024-01-15T10:29:55Z"
+            }
+        }
+
+
+class ReadinessResponse(BaseModel):
+    """Readiness probe response model."""
+    
+    status: str = Field(..., description="Readiness status (ready or not_ready)")
+    ready: bool = Field(..., description="Whether the instance should receive traffic")
+    warmup: Dict[str, Any] = Field(..., description="Startup warm-up status and step timings")
+    database: Optional[Dict[str, Any]] = Field(None, description="Cached database health state and pool statistics")
+    timestamp: Optional[str] = Field(None, description="Readiness check timestamp")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "status": "ready",
+                "ready": True,
+                "warmup": {
+                    "status": "ready",
+                    "ready": True,
+                    "steps": {
+                        "open_pools": {"status": "ok", "duration_ms": 12.4},
+                        "schema": {"status": "ok", "duration_ms": 3.1}
+                    }
+                },
+                "database": {
+                    "status": "connected",
+                    "healthy": True,
+                    "latency_ms": 0.8,
+                    "last_checked": "2024-01-15T10:29:55Z",
+                    "pool": {"min_size": 1, "max_size": 10, "size": 2, "idle": 2, "in_use": 0}
+                },
                 "timestamp": "2024-01-15T10:30:00Z"
             }
         }
\ No newline at end of file
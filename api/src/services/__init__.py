@@ -3,8 +3,16 @@ Business services layer.
 """
 from .llm_service import LLMService
 from .query_service import QueryService
+from .warmup_service import WarmupService
+from .health_service import HealthService
+from .result_service import ResultService
+from .export_service import ExportService
 
 __all__ = [
     "LLMService",
-    "QueryService"
+    "QueryService",
+    "WarmupService",
+    "HealthService",
+    "ResultService",
+    "ExportService"
 ]
\ No newline at end of file
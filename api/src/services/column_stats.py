@@ -0,0 +1,164 @@
+"""
+Column statistics collected in the background to enrich prompts.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..database.manager import DatabaseManager
+from ..utils.logging import get_logger
+from .prompt_builder import split_schema
+
+logger = get_logger(__name__)
+
+
+def _sql_literal(value: Any) -> str:
+    """Render a value the way it would be written in SQL."""
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+class ColumnStatsCollector:
+    """Caches per-column statistics of every table for the current schema.
+
+    Statistics come from the database catalog where it has them (pg_stats)
+    and from bounded sampling queries elsewhere. They are collected table by
+    table in a background task, so prompts never wait for them: a table gets
+    statistics in its prompts once they are collected. Each table's entry is
+    tied to the schema text of that table and re-collected when the table
+    changes or the entry is older than ``ttl_seconds``. Entries are rendered
+    to prompt text once, when collected.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        sample_rows: int = 1000,
+        max_values: int = 8,
+        max_distinct: int = 50,
+        ttl_seconds: float = 3600,
+        table_timeout_seconds: float = 10.0
+    ):
+        self.db_manager = db_manager
+        self.sample_rows = sample_rows
+        self.max_values = max_values
+        self.max_distinct = max_distinct
+        self.ttl_seconds = ttl_seconds
+        self.table_timeout_seconds = table_timeout_seconds
+
+        # Table name -> (schema block it was collected for, collected at, rendered text)
+        self._tables: Dict[str, Tuple[str, float, str]] = {}
+        self._notes: Optional[Tuple[str, Dict[str, str]]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_check = 0.0
+
+        self.tables_collected = 0
+        self.errors = 0
+
+    def notes(self, schema: str, schema_hash: str) -> Dict[str, str]:
+        """Rendered statistics per table that are current for a schema.
+
+        Starts a background collection when some tables of the database
+        schema have no current statistics. Schemas supplied by clients get
+        no statistics, since they do not describe the connected database.
+        """
+        if schema_hash != self.db_manager.schema_hash:
+            return {}
+
+        now = time.monotonic()
+        if self._notes is None or self._notes[0] != schema_hash:
+            self._next_check = now
+            _, blocks = split_schema(schema)
+            current = {}
+            for table, block in blocks:
+                entry = self._tables.get(table)
+                if entry is not None and entry[0] == block and entry[2]:
+                    current[table] = entry[2]
+            self._notes = (schema_hash, current)
+
+        # Expiry is checked a few times per TTL instead of on every prompt
+        if now >= self._next_check and (self._task is None or self._task.done()):
+            self._next_check = now + self.ttl_seconds / 10
+            if self._stale_tables(schema):
+                self._task = asyncio.create_task(self.collect(schema))
+        return self._notes[1]
+
+    async def collect(self, schema: str) -> int:
+        """Collect statistics of the tables of a schema that have none or stale ones."""
+        collected = 0
+        for table, block in self._stale_tables(schema):
+            try:
+                statistics = await asyncio.wait_for(
+                    self.db_manager.column_statistics(table, self.sample_rows, self.max_values),
+                    timeout=self.table_timeout_seconds
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Retried after the TTL rather than on every prompt
+                self.errors += 1
+                logger.warning("Could not collect column statistics of %s: %s", table, e)
+                self._tables[table] = (block, time.monotonic(), "")
+                continue
+            self._tables[table] = (block, time.monotonic(), self.render(table, statistics))
+            collected += 1
+
+        # Forget dropped tables and rebuild the notes on next use
+        tables = {table for table, _ in split_schema(schema)[1]}
+        self._tables = {table: entry for table, entry in self._tables.items() if table in tables}
+        self._notes = None
+        self.tables_collected += collected
+        if collected:
+            logger.info("Collected column statistics of %d table(s)", collected)
+        return collected
+
+    def render(self, table: str, statistics: List[Dict[str, Any]]) -> str:
+        """Render a table's column statistics as prompt text."""
+        lines = []
+        for column in statistics:
+            parts = []
+            distinct = column.get("distinct")
+            values = column.get("values") or []
+            # Values of unique columns (keys, names) do not help write filters
+            repeated = distinct is not None and distinct < (column.get("rows") or 0)
+            if values and repeated and distinct <= self.max_distinct:
+                listed = ", ".join(_sql_literal(value) for value in values)
+                if distinct is not None and distinct > len(values):
+                    listed += f", ... ({distinct} distinct)"
+                parts.append(listed)
+            elif column.get("min") is not None and column.get("max") is not None:
+                parts.append(f"{_sql_literal(column['min'])} to {_sql_literal(column['max'])}")
+
+            null_fraction = column.get("null_fraction") or 0
+            if null_fraction >= 0.01:
+                parts.append(f"{round(null_fraction * 100)}% NULL")
+
+            if parts:
+                lines.append(f"  - {column['column']}: {'; '.join(parts)}\n")
+        return f"{table}:\n" + "".join(lines) if lines else ""
+
+    def stats(self) -> Dict[str, Any]:
+        """Get column statistics cache statistics."""
+        return {
+            "tables": sum(1 for entry in self._tables.values() if entry[2]),
+            "tables_collected": self.tables_collected,
+            "errors": self.errors,
+            "collecting": self._task is not None and not self._task.done(),
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    async def close(self):
+        """Stop a running collection."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def _stale_tables(self, schema: str) -> List[Tuple[str, str]]:
+        """Tables of a schema whose statistics are missing, outdated or expired."""
+        now = time.monotonic()
+        stale = []
+        for table, block in split_schema(schema)[1]:
+            entry = self._tables.get(table)
+            if entry is None or entry[0] != block or now - entry[1] > self.ttl_seconds:
+                stale.append((table, block))
+        return stale
@@ -0,0 +1,323 @@
+"""
+Few-shot example store built from questions whose SQL ran successfully.
+"""
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Set
+from .similarity_cache import normalize_question
+from ..utils.logging import get_logger
+from ..utils.sql import tokenize_sql
+
+logger = get_logger(__name__)
+
+# Keywords ending the table list of a FROM clause
+_FROM_END_WORDS = {
+    "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "FETCH", "WINDOW", "UNION",
+    "INTERSECT", "EXCEPT", "MINUS", "FOR", "RETURNING"
+}
+
+# Built-in examples for the Northwind sample schema, used until the query log has better ones
+BUILTIN_EXAMPLES: Dict[str, List[tuple]] = {
+    "SQLite": [
+        ("Show me all customers", "SELECT * FROM customers LIMIT 50"),
+        ("What are the most expensive products?", "SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10"),
+        ("Show customers from Germany", "SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'"),
+        ("List products by category", "SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name"),
+        ("How many customers are there?", "SELECT COUNT(*) as customer_count FROM customers"),
+    ],
+    "PostgreSQL": [
+        ("Show me all customers", "SELECT * FROM customers LIMIT 50"),
+        ("What are the most expensive products?", "SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10"),
+        ("Show customers from Germany", "SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'"),
+        ("Find customers with 'market' in company name", "SELECT company_name, contact_name FROM customers WHERE company_name ILIKE '%market%'"),
+        ("List products by category", "SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name"),
+        ("How many customers are there?", "SELECT COUNT(*) as customer_count FROM customers"),
+    ],
+    "MySQL": [
+        ("Show me all customers", "SELECT * FROM customers LIMIT 50"),
+        ("What are the most expensive products?", "SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10"),
+        ("Show customers from Germany", "SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'"),
+        ("Find customers with 'market' in company name (case-insensitive)", "SELECT company_name, contact_name FROM customers WHERE LOWER(company_name) LIKE LOWER('%market%')"),
+        ("List products by category", "SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name"),
+        ("How many customers are there?", "SELECT COUNT(*) as customer_count FROM customers"),
+    ],
+    "SQL Server": [
+        ("Show me all customers", "SELECT TOP 50 * FROM customers"),
+        ("What are the most expensive products?", "SELECT TOP 10 product_name, unit_price FROM products ORDER BY unit_price DESC"),
+        ("Show customers from Germany", "SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'"),
+        ("Find customers with 'market' in company name (case-insensitive)", "SELECT company_name, contact_name FROM customers WHERE LOWER(company_name) LIKE LOWER('%market%')"),
+        ("List products by category", "SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name"),
+        ("How many customers are there?", "SELECT COUNT(*) as customer_count FROM customers"),
+    ],
+    "Oracle": [
+        ("Show me all customers", "SELECT * FROM customers WHERE ROWNUM <= 50"),
+        ("What are the most expensive products?", "SELECT * FROM (SELECT product_name, unit_price FROM products ORDER BY unit_price DESC) WHERE ROWNUM <= 10"),
+        ("Show customers from Germany", "SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'"),
+        ("Find customers with 'market' in company name (case-insensitive)", "SELECT company_name, contact_name FROM customers WHERE UPPER(company_name) LIKE UPPER('%market%')"),
+        ("List products by category", "SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name"),
+        ("How many customers are there?", "SELECT COUNT(*) as customer_count FROM customers"),
+    ],
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def referenced_tables(sql_query: str) -> Set[str]:
+    """Table names read by FROM/JOIN clauses, lowercased and unquoted.
+
+    FROM only counts inside a SELECT at the same parenthesis depth, so
+    function arguments such as ``EXTRACT(YEAR FROM col)`` are not taken for
+    tables. Tables of subqueries are included; CTE names, derived tables
+    and table functions are not.
+    """
+    tokens = tokenize_sql(sql_query)
+    ctes = set()
+    if tokens and tokens[0].is_word("WITH"):
+        ctes = {
+            token.text.strip('`"[]').lower() for index, token in enumerate(tokens[:-2])
+            if token.depth == 0 and tokens[index + 1].is_word("AS") and tokens[index + 2].text == "("
+        }
+
+    tables = set()
+    selects: Dict[int, bool] = {0: False}
+    in_from: Dict[int, bool] = {0: False}
+    for index, token in enumerate(tokens):
+        depth = token.depth
+        if token.text == "(":
+            selects[depth + 1] = in_from[depth + 1] = False
+            continue
+        if token.is_word("SELECT"):
+            selects[depth], in_from[depth] = True, False
+            continue
+        if token.is_word("FROM", "JOIN") and selects.get(depth):
+            in_from[depth] = True
+        elif not (token.text == "," and in_from.get(depth)):
+            if token.is_word(*_FROM_END_WORDS):
+                in_from[depth] = False
+            continue
+
+        position = index + 1
+        if position < len(tokens) and tokens[position].is_word("ONLY", "LATERAL"):
+            position += 1
+        while position + 2 < len(tokens) and tokens[position + 1].text == ".":
+            # Keep the bare table name of schema-qualified names
+            position += 2
+        if position >= len(tokens) or tokens[position].kind not in ("word", "quoted"):
+            continue
+        if position + 1 < len(tokens) and tokens[position + 1].text == "(":
+            continue
+        name = tokens[position].text.strip('`"[]').lower()
+        if name not in ctes:
+            tables.add(name)
+    return tables
+
+
+def schema_tables(schema: str) -> Set[str]:
+    """Table names listed in a schema description."""
+    return {
+        line[len("Table: "):].strip().lower()
+        for line in schema.split("\n")
+        if line.startswith("Table: ")
+    }
+
+
+class ExampleStore:
+    """Local index of successful question/SQL pairs for few-shot prompting.
+
+    Examples are indexed by stemmed keywords and by referenced tables. For a
+    new question the store ranks examples by IDF-weighted keyword overlap
+    plus a bonus for tables the question names, skips examples that use
+    tables missing from the current schema, and returns the top k that fit
+    in the token budget.
+    """
+
+    def __init__(
+        self,
+        max_examples: int = 5000,
+        path: Optional[str] = None,
+        token_counter: Callable[[str], int] = estimate_tokens
+    ):
+        self.max_examples = max_examples
+        self.path = path
+        self.token_counter = token_counter
+
+        self._examples: Dict[int, Dict[str, Any]] = {}
+        self._by_keyword: Dict[str, Set[int]] = {}
+        self._by_table: Dict[str, Set[int]] = {}
+        self._by_question: Dict[tuple, int] = {}
+        self._learned_ids: deque = deque()
+        self._next_id = 0
+
+        self.retrievals = 0
+        self.examples_served = 0
+
+        for sql_dialect, examples in BUILTIN_EXAMPLES.items():
+            for question, sql_query in examples:
+                self._index(question, sql_query, sql_dialect, source="builtin")
+        if path:
+            self._load(path)
+
+    def add(self, question: str, sql_query: str, sql_dialect: str):
+        """Record a question whose SQL executed successfully."""
+        if self._index(question, sql_query, sql_dialect, source="log") is None:
+            return
+        if self.path:
+            self._append(question, sql_query, sql_dialect)
+
+    def retrieve(
+        self,
+        question: str,
+        sql_dialect: str,
+        available_tables: Optional[Set[str]] = None,
+        k: int = 3,
+        token_budget: int = 400
+    ) -> List[Dict[str, Any]]:
+        """Get the k most relevant examples that fit in the token budget."""
+        tokens, _ = normalize_question(question)
+        keywords = set(tokens)
+
+        # Candidates share a keyword with the question or use a table it names
+        candidate_ids: Set[int] = set()
+        for keyword in keywords:
+            candidate_ids.update(self._by_keyword.get(keyword, ()))
+            candidate_ids.update(self._by_table.get(keyword, ()))
+
+        def eligible(example: Dict[str, Any]) -> bool:
+            return example["dialect"] == sql_dialect and (
+                available_tables is None or example["tables"] <= available_tables
+            )
+
+        total = len(self._examples) or 1
+        scored = []
+        for example_id in candidate_ids:
+            example = self._examples[example_id]
+            if not eligible(example):
+                continue
+            score = sum(
+                math.log(1 + total / len(self._by_keyword[keyword]))
+                for keyword in keywords & example["keywords"]
+            )
+            score += 2.0 * len(keywords & example["table_keywords"])
+            # Prefer learned examples over built-in ones on ties
+            score += 0.1 if example["source"] == "log" else 0.0
+            scored.append((score, example["id"], example))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+
+        if not scored:
+            # Nothing relevant: keep one valid example to anchor the output format
+            fallback = next((example for example in self._examples.values() if eligible(example)), None)
+            if fallback is not None:
+                scored.append((0.0, fallback["id"], fallback))
+
+        selected = []
+        used_tokens = 0
+        for score, _, example in scored:
+            if len(selected) >= k:
+                break
+            if score < 1.0 and selected:
+                break
+            cost = example.get("tokens")
+            if cost is None:
+                cost = example["tokens"] = self.token_counter(self.format_example(example))
+            if used_tokens + cost > token_budget:
+                continue
+            selected.append(example)
+            used_tokens += cost
+
+        self.retrievals += 1
+        self.examples_served += len(selected)
+        return selected
+
+    @staticmethod
+    def format_example(example: Dict[str, Any]) -> str:
+        """Render one example for the prompt."""
+        return f'Question: "{example["question"]}"\nSQL: {example["sql_query"]}'
+
+    def stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        return {
+            "size": len(self._examples),
+            "learned": len(self._learned_ids),
+            "max_size": self.max_examples,
+            "retrievals": self.retrievals,
+            "avg_examples_per_prompt": round(self.examples_served / self.retrievals, 2) if self.retrievals else 0.0
+        }
+
+    def _index(self, question: str, sql_query: str, sql_dialect: str, source: str) -> Optional[int]:
+        """Add an example to the in-memory index; returns its id, or None if already known."""
+        tokens, _ = normalize_question(question)
+        question_key = (sql_dialect, " ".join(tokens))
+        if question_key in self._by_question:
+            return None
+
+        if source == "log":
+            self._evict_if_full()
+
+        example_id = self._next_id
+        self._next_id += 1
+        keywords = set(tokens)
+        tables = referenced_tables(sql_query)
+        self._examples[example_id] = {
+            "id": example_id,
+            "question": question,
+            "sql_query": sql_query,
+            "dialect": sql_dialect,
+            "keywords": keywords,
+            "tables": tables,
+            "table_keywords": set(normalize_question(" ".join(tables))[0]),
+            "source": source,
+            "added_at": time.time()
+        }
+        self._by_question[question_key] = example_id
+        if source == "log":
+            self._learned_ids.append(example_id)
+        for keyword in keywords:
+            self._by_keyword.setdefault(keyword, set()).add(example_id)
+        for keyword in self._examples[example_id]["table_keywords"]:
+            self._by_table.setdefault(keyword, set()).add(example_id)
+        return example_id
+
+    def _evict_if_full(self):
+        """Drop the oldest learned example once the store is full."""
+        if len(self._learned_ids) < self.max_examples:
+            return
+        example = self._examples.pop(self._learned_ids.popleft())
+        tokens, _ = normalize_question(example["question"])
+        self._by_question.pop((example["dialect"], " ".join(tokens)), None)
+        for index, keywords in ((self._by_keyword, example["keywords"]), (self._by_table, example["table_keywords"])):
+            for keyword in keywords:
+                ids = index.get(keyword)
+                if ids is not None:
+                    ids.discard(example["id"])
+                    if not ids:
+                        del index[keyword]
+
+    def _load(self, path: str):
+        """Load logged examples from a JSON-lines file."""
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                    self._index(record["question"], record["sql_query"], record["dialect"], source="log")
+                except (ValueError, KeyError):
+                    continue
+
+    def _append(self, question: str, sql_query: str, sql_dialect: str):
+        """Append an example to the JSON-lines log (single write, safe across workers)."""
+        record = json.dumps({"question": question, "sql_query": sql_query, "dialect": sql_dialect})
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as log_file:
+                log_file.write(record + "\n")
+        except OSError as e:
+            logger.warning("Could not persist few-shot example: %s", e)
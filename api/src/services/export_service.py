@@ -0,0 +1,290 @@
+"""
+Background export jobs that stream query results to files.
+"""
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import secrets
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from ..database.arrow import RecordBatchBuilder, arrow_available
+from ..database.manager import DatabaseManager
+from .llm_service import LLMService
+from ..utils.exceptions import ResultNotFoundError
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ExportWriter(ABC):
+    """Writes batches of rows to an export file."""
+
+    def __init__(self, path: str, columns: List[str], dynamic_typing: bool = False):
+        self.path = path
+        self.columns = columns
+        self.dynamic_typing = dynamic_typing
+
+    @abstractmethod
+    def write(self, rows: List[tuple]):
+        """Append a batch of rows."""
+        pass
+
+    @abstractmethod
+    def close(self):
+        """Flush and close the file."""
+        pass
+
+
+class CSVExportWriter(ExportWriter):
+    """CSV with a header row."""
+
+    def __init__(self, path: str, columns: List[str], dynamic_typing: bool = False):
+        super().__init__(path, columns, dynamic_typing)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLExportWriter(ExportWriter):
+    """One JSON object per line."""
+
+    def __init__(self, path: str, columns: List[str], dynamic_typing: bool = False):
+        super().__init__(path, columns, dynamic_typing)
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows: List[tuple]):
+        self._file.writelines(
+            json.dumps(dict(zip(self.columns, row)), default=str) + "\n"
+            for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExportWriter(ExportWriter):
+    """Parquet with one row group per batch (requires the optional pyarrow package)."""
+
+    def __init__(self, path: str, columns: List[str], dynamic_typing: bool = False):
+        super().__init__(path, columns, dynamic_typing)
+        import pyarrow.parquet
+
+        self._pq = pyarrow.parquet
+        self._builder = RecordBatchBuilder(columns, widen_integers=dynamic_typing)
+        self._writer = None
+
+    def write(self, rows: List[tuple]):
+        batch = self._builder.build(rows)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, self._builder.schema)
+        self._writer.write_batch(batch)
+
+    def close(self):
+        if self._writer is None:
+            self.write([])
+        self._writer.close()
+
+
+# Format name -> (writer class, file extension, media type)
+EXPORT_FORMATS: Dict[str, Tuple[type, str, str]] = {
+    "csv": (CSVExportWriter, "csv", "text/csv"),
+    "jsonl": (JSONLExportWriter, "jsonl", "application/x-ndjson"),
+    "parquet": (ParquetExportWriter, "parquet", "application/vnd.apache.parquet")
+}
+
+
+class ExportService:
+    """Runs exports as background jobs that stream rows straight to disk.
+
+    Rows are read from a server-side cursor in batches and each batch is
+    written by a worker thread, so memory stays bounded by the batch size
+    whatever the result size. Files are written under a temporary name and
+    renamed when complete. Jobs live in this process and are removed, with
+    their files, once they have been finished for longer than the TTL.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        llm_service: LLMService,
+        directory: str = "exports",
+        ttl_seconds: float = 3600,
+        max_concurrent_jobs: int = 2,
+        batch_size: int = 1000
+    ):
+        self.db_manager = db_manager
+        self.llm_service = llm_service
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent_jobs)
+
+    async def submit(
+        self,
+        export_format: str = "csv",
+        sql_query: Optional[str] = None,
+        question: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queue an export of a SQL query or of the SQL generated for a question."""
+        export_format = export_format.lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if export_format == "parquet" and not arrow_available():
+            raise ValueError("Parquet export requires the optional pyarrow package")
+        if not sql_query and not question:
+            raise ValueError("Either sql_query or question is required")
+
+        self.evict_expired()
+
+        job_id = secrets.token_urlsafe(12)
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "format": export_format,
+            "question": question,
+            "sql_query": sql_query,
+            "rows_written": 0,
+            "bytes_written": 0,
+            "error": None,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "started_at": None,
+            "finished_at": None,
+            "_finished_monotonic": None,
+            "_path": None
+        }
+        self._jobs[job_id] = job
+        self._tasks[job_id] = asyncio.create_task(self._run(job))
+        return self.public(job)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Look up a job."""
+        self.evict_expired()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ResultNotFoundError(f"Export {job_id} not found or expired")
+        return job
+
+    def download_info(self, job_id: str) -> Optional[Tuple[str, str, str]]:
+        """File path, media type and download name of a completed export, or None."""
+        job = self.get(job_id)
+        if job["status"] != "completed":
+            return None
+        _, extension, media_type = EXPORT_FORMATS[job["format"]]
+        return job["_path"], media_type, f"export_{job_id}.{extension}"
+
+    async def delete(self, job_id: str):
+        """Cancel a job if it is still running and delete it with its file."""
+        job = self.get(job_id)
+        task = self._tasks.pop(job_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._remove(job)
+
+    def evict_expired(self) -> int:
+        """Remove jobs finished longer ago than the TTL, with their files."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [
+            job for job in self._jobs.values()
+            if job["_finished_monotonic"] is not None and job["_finished_monotonic"] < cutoff
+        ]
+        for job in expired:
+            self._remove(job)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get export job statistics."""
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"jobs": len(self._jobs), "by_status": counts, "ttl_seconds": self.ttl_seconds}
+
+    async def close(self):
+        """Cancel running jobs on shutdown."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job fields safe to return to clients."""
+        view = {key: value for key, value in job.items() if not key.startswith("_")}
+        view["download_url"] = f"/exports/{job['job_id']}/download" if job["status"] == "completed" else None
+        return view
+
+    async def _run(self, job: Dict[str, Any]):
+        """Generate SQL if needed and stream the results into the export file."""
+        async with self._semaphore:
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow().isoformat() + "Z"
+            writer_class, extension, _ = EXPORT_FORMATS[job["format"]]
+            path = os.path.join(self.directory, f"{job['job_id']}.{extension}")
+            partial_path = path + ".part"
+
+            try:
+                if not job["sql_query"]:
+                    schema = await self.db_manager.get_schema()
+                    job["sql_query"] = await self.llm_service.generate_sql(
+                        job["question"], schema, self.db_manager.get_sql_dialect()
+                    )
+
+                await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+                writer = None
+                try:
+                    batches = self.db_manager.stream_query(job["sql_query"], batch_size=self.batch_size)
+                    async with contextlib.aclosing(batches):
+                        async for columns, rows in batches:
+                            if writer is None:
+                                writer = await asyncio.to_thread(
+                                    writer_class, partial_path, columns, self.db_manager.adapter.dynamic_typing
+                                )
+                            if rows:
+                                await asyncio.to_thread(writer.write, rows)
+                                job["rows_written"] += len(rows)
+                finally:
+                    if writer is not None:
+                        await asyncio.to_thread(writer.close)
+
+                await asyncio.to_thread(os.replace, partial_path, path)
+                job["_path"] = path
+                job["bytes_written"] = os.path.getsize(path)
+                job["status"] = "completed"
+            except asyncio.CancelledError:
+                job["status"] = "cancelled"
+                self._delete_file(partial_path)
+                raise
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self._delete_file(partial_path)
+                logger.warning("Export %s failed: %s", job["job_id"], e)
+            finally:
+                job["finished_at"] = datetime.utcnow().isoformat() + "Z"
+                job["_finished_monotonic"] = time.monotonic()
+                self._tasks.pop(job["job_id"], None)
+
+    def _remove(self, job: Dict[str, Any]):
+        """Forget a job and delete its file."""
+        self._jobs.pop(job["job_id"], None)
+        if job["_path"]:
+            self._delete_file(job["_path"])
+
+    @staticmethod
+    def _delete_file(path: str):
+        """Delete a file if it exists."""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
@@ -0,0 +1,102 @@
+"""
+Cached health state refreshed in the background.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from ..database.manager import DatabaseManager
+from .warmup_service import WarmupService
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class HealthService:
+    """Keeps the database health state cached so probes never do I/O."""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        warmup_service: Optional[WarmupService] = None,
+        interval_seconds: float = 10,
+        stale_after_seconds: Optional[float] = None
+    ):
+        self.db_manager = db_manager
+        self.warmup_service = warmup_service
+        self.interval_seconds = interval_seconds
+        self.stale_after_seconds = stale_after_seconds or interval_seconds * 3
+
+        self.database_status = "unknown"
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.last_checked: Optional[str] = None
+        self.consecutive_failures = 0
+        self._last_checked_monotonic: Optional[float] = None
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the cached state is too old to be trusted."""
+        if self._last_checked_monotonic is None:
+            return True
+        return time.monotonic() - self._last_checked_monotonic > self.stale_after_seconds
+
+    @property
+    def healthy(self) -> bool:
+        """Whether the last database check succeeded and is still fresh."""
+        return self.database_status == "connected" and not self.is_stale
+
+    async def run(self):
+        """Refresh the health state forever on the configured interval."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval_seconds)
+
+    async def refresh(self):
+        """Check the database using pooled connections and update the cache."""
+        start = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(self._check_database(), timeout=self.interval_seconds)
+            self.error = None if ok else "SELECT 1 failed"
+        except Exception as e:
+            ok = False
+            self.error = str(e) or type(e).__name__
+
+        self.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.database_status = "connected" if ok else "disconnected"
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        self.last_checked = datetime.utcnow().isoformat() + "Z"
+        self._last_checked_monotonic = time.monotonic()
+
+        # Replica failures eject replicas from routing but do not make this instance unhealthy
+        try:
+            await asyncio.wait_for(self.db_manager.check_replicas(), timeout=self.interval_seconds)
+        except Exception as e:
+            logger.warning("Replica health check failed: %s", e)
+
+        if not ok:
+            logger.warning("Database health check failed: %s", self.error)
+        elif self.warmup_service is not None and self.warmup_service.status == "failed":
+            # The database is back; retry the warm-up so readiness can recover
+            await self.warmup_service.run()
+
+    def get_state(self) -> Dict[str, Any]:
+        """Get the cached health state with current pool statistics (no I/O)."""
+        return {
+            "status": self.database_status,
+            "healthy": self.healthy,
+            "stale": self.is_stale,
+            "error": self.error,
+            "latency_ms": self.latency_ms,
+            "last_checked": self.last_checked,
+            "consecutive_failures": self.consecutive_failures,
+            "pool": self.db_manager.get_pool_stats(),
+            "schema": self.db_manager.schema_stats()
+        }
+
+    async def _check_database(self) -> bool:
+        """Ping idle pooled connections, or borrow one if all are busy."""
+        result = await self.db_manager.ping_pool()
+        if result["checked"] == 0:
+            return await self.db_manager.test_connection()
+        return result["healthy"] + result["replaced"] > 0
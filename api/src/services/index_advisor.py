@@ -0,0 +1,451 @@
+"""
+Index recommendations for recurring generated queries.
+"""
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ..database.manager import DatabaseManager
+from ..utils.exceptions import UnsupportedDatabaseError
+from ..utils.logging import get_logger, sql_fingerprint
+from ..utils.sql import Token, split_clauses, split_conjuncts, tokenize_sql
+
+logger = get_logger(__name__)
+
+_DIALECTS = {"SQLite", "PostgreSQL"}
+
+# Words that separate the table references of a FROM clause
+_JOIN_WORDS = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL"}
+
+_RANGE_OPS = {"<", ">", "<=", ">="}
+
+# Words a constant operand may contain besides function names
+_CONSTANT_WORDS = {"NULL", "TRUE", "FALSE", "DATE", "TIME", "TIMESTAMP", "INTERVAL", "CURRENT_DATE", "CURRENT_TIMESTAMP"}
+
+# Most columns in a recommended index
+_MAX_INDEX_COLUMNS = 3
+
+# "SCAN t", "SEARCH t USING INDEX i (a=?)" lines of SQLite's EXPLAIN QUERY PLAN
+_SQLITE_PLAN_RE = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(?: USING (.*))?$")
+
+
+def _unquote(token: Token) -> str:
+    if token.kind == "quoted":
+        return token.text[1:-1]
+    return token.text
+
+
+def _unwrap(tokens: List[Token]) -> List[Token]:
+    """Strip parentheses that enclose a whole condition."""
+    while (
+        len(tokens) >= 2
+        and tokens[0].text == "("
+        and tokens[-1].text == ")"
+        and all(token.depth > tokens[0].depth for token in tokens[1:-1])
+    ):
+        tokens = tokens[1:-1]
+    return tokens
+
+
+def schema_columns(schema: str) -> Dict[str, Tuple[str, Dict[str, str]]]:
+    """Table name and columns per table of a schema description, keyed by lower-cased names."""
+    tables: Dict[str, Tuple[str, Dict[str, str]]] = {}
+    columns: Optional[Dict[str, str]] = None
+    for line in schema.split("\n"):
+        if line.startswith("Table: "):
+            table = line[len("Table: "):].strip()
+            columns = {}
+            tables[table.lower()] = (table, columns)
+        elif columns is not None and line.strip().startswith("- "):
+            column = line.strip()[2:].split(":", 1)[0].strip()
+            columns[column.lower()] = column
+    return tables
+
+
+def _table_refs(from_clause: List[Token]) -> Tuple[Dict[str, Optional[str]], List[List[Token]]]:
+    """Tables by alias (None for derived tables) and the ON conditions of a FROM clause."""
+    segments: List[List[Token]] = [[]]
+    for token in from_clause:
+        if token.depth == 0 and (token.text == "," or token.is_word(*_JOIN_WORDS)):
+            if segments[-1]:
+                segments.append([])
+        else:
+            segments[-1].append(token)
+
+    refs: Dict[str, Optional[str]] = {}
+    conditions = []
+    for segment in segments:
+        on = next((index for index, token in enumerate(segment) if token.depth == 0 and token.is_word("ON", "USING")), None)
+        if on is not None:
+            if segment[on].is_word("ON"):
+                conditions.append(segment[on + 1:])
+            segment = segment[:on]
+        if not segment:
+            continue
+        if segment[0].text == "(":
+            # Derived table: its alias hides its columns from the base tables
+            table, rest = None, [token for token in segment if token.depth == 0 and token.text != ")"][1:]
+        else:
+            position = 0
+            while position + 2 < len(segment) and segment[position + 1].text == ".":
+                position += 2
+            table, rest = _unquote(segment[position]).lower(), segment[position + 1:]
+        if rest and rest[0].is_word("AS"):
+            rest = rest[1:]
+        alias = _unquote(rest[0]).lower() if rest and rest[0].kind in ("word", "quoted") else table
+        if alias is not None:
+            refs[alias] = table
+    return refs, conditions
+
+
+class _Predicates:
+    """Indexable columns of one query: equality and range filters and join keys."""
+
+    def __init__(self, refs: Dict[str, Optional[str]], tables: Dict[str, Tuple[str, Dict[str, str]]]):
+        self.refs = refs
+        self.tables = tables
+        self.equality: Dict[str, List[str]] = {}
+        self.range: Dict[str, List[str]] = {}
+        self.joins: Set[Tuple[str, str]] = set()
+
+    def column(self, tokens: List[Token]) -> Optional[Tuple[str, str]]:
+        """(table, column) of a column reference, if it names a base table column."""
+        if len(tokens) == 1 and tokens[0].kind in ("word", "quoted"):
+            qualifier, name = None, _unquote(tokens[0]).lower()
+        elif len(tokens) == 3 and tokens[1].text == "." and tokens[2].kind in ("word", "quoted"):
+            qualifier, name = _unquote(tokens[0]).lower(), _unquote(tokens[2]).lower()
+        else:
+            return None
+        if qualifier is not None:
+            matches = [self.refs.get(qualifier)]
+        else:
+            matches = [table for table in set(self.refs.values()) if table in self.tables and name in self.tables[table][1]]
+            if len(matches) != 1:
+                return None
+        table = self.tables.get(matches[0]) if matches[0] is not None else None
+        if table is None or name not in table[1]:
+            return None
+        return table[0], table[1][name]
+
+    def add(self, condition: List[Token]):
+        """Record the column a conjunct filters or joins on."""
+        condition = _unwrap(condition)
+        split = next(
+            (
+                index for index, token in enumerate(condition)
+                if token.depth == condition[0].depth and (token.text in _RANGE_OPS or token.text == "=" or token.is_word("IN", "BETWEEN", "IS"))
+            ),
+            None
+        ) if condition else None
+        if split is None:
+            return
+        left, operator, right = condition[:split], condition[split], condition[split + 1:]
+        left_column, right_column = self.column(left), self.column(right)
+
+        if operator.text == "=" and left_column and right_column:
+            if left_column[0] != right_column[0]:
+                self.joins.update((left_column, right_column))
+            return
+        if operator.is_word("IS") and not (right and right[0].is_word("NULL")):
+            return
+        if left_column and self._constant(right):
+            column, kind = left_column, "equality" if operator.text == "=" or operator.is_word("IN", "IS") else "range"
+        elif right_column and self._constant(left) and (operator.text == "=" or operator.text in _RANGE_OPS):
+            column, kind = right_column, "equality" if operator.text == "=" else "range"
+        else:
+            return
+        columns = getattr(self, kind).setdefault(column[0], [])
+        if column[1] not in columns:
+            columns.append(column[1])
+
+    def _constant(self, tokens: List[Token]) -> bool:
+        """Whether an operand is a literal, parameter or function of them."""
+        if not tokens:
+            return False
+        for index, token in enumerate(tokens):
+            if token.kind in ("word", "quoted"):
+                calls = index + 1 < len(tokens) and tokens[index + 1].text == "("
+                if not calls and not token.is_word(*_CONSTANT_WORDS, "AND"):
+                    return False
+            elif token.kind not in ("string", "number", "param", "op"):
+                return False
+        return True
+
+    def candidates(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """Indexes that would serve this query: equality columns then one range column per table, and join keys."""
+        candidates = []
+        for table in set(self.equality) | set(self.range):
+            columns = list(self.equality.get(table, []))[:_MAX_INDEX_COLUMNS]
+            ranged = [column for column in self.range.get(table, []) if column not in columns]
+            if ranged and len(columns) < _MAX_INDEX_COLUMNS:
+                columns.append(ranged[0])
+            candidates.append((table, tuple(columns)))
+        candidates.extend((table, (column,)) for table, column in sorted(self.joins))
+        return list(dict.fromkeys(candidates))
+
+
+def index_uses(
+    sql_query: str,
+    tables: Dict[str, Tuple[str, Dict[str, str]]]
+) -> Optional[Tuple[Dict[str, Optional[str]], List[Tuple[str, Tuple[str, ...]]]]]:
+    """Table aliases of a query and the (table, columns) indexes that could serve it.
+
+    Only plain SELECT statements are read; filters inside OR and
+    subqueries are not considered.
+    """
+    clauses = split_clauses(tokenize_sql(sql_query))
+    if clauses is None or not clauses.get("FROM"):
+        return None
+    refs, conditions = _table_refs(clauses["FROM"])
+    predicates = _Predicates(refs, tables)
+    for condition in conditions + [clauses.get("WHERE", [])]:
+        for conjunct in split_conjuncts(condition):
+            predicates.add(conjunct)
+    return refs, predicates.candidates()
+
+
+def index_name(table: str, columns: Tuple[str, ...]) -> str:
+    """Name of an index created by the advisor."""
+    return re.sub(r"\W", "_", f"idx_advisor_{table}_{'_'.join(columns)}")[:63]
+
+
+class IndexAdvisor:
+    """Recommends indexes for the generated queries that run most often.
+
+    Every query sent to the database is counted by fingerprint. To advise,
+    the columns that recurring queries filter on with equality or range
+    conditions, and their join keys, are turned into candidate indexes;
+    candidates already covered by the leading columns of an existing index
+    are dropped. Each remaining candidate is planned against the queries
+    that would use it, with and without the index, and ranked by the
+    estimated cost saved times how often those queries ran. Costs are the
+    planner's for PostgreSQL; for SQLite they are the rows a plan reads,
+    from table sizes and whether each table is scanned or searched.
+
+    With ``auto_apply`` (meant for SQLite development databases only) the
+    recommendations are created as indexes every ``interval_seconds``.
+
+    PostgreSQL candidates are hypopg hypothetical indexes. Without that
+    extension advice is unsupported unless ``build_indexes`` allows
+    building each candidate in a rolled back transaction, which blocks
+    writes to its table while the index builds.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        max_queries: int = 500,
+        min_executions: int = 2,
+        max_candidates: int = 10,
+        max_queries_per_candidate: int = 5,
+        auto_apply: bool = False,
+        interval_seconds: float = 3600,
+        build_indexes: bool = False
+    ):
+        self.db_manager = db_manager
+        self.max_queries = max_queries
+        self.min_executions = min_executions
+        self.max_candidates = max_candidates
+        self.max_queries_per_candidate = max_queries_per_candidate
+        self.auto_apply = auto_apply
+        self.interval_seconds = interval_seconds
+        self.build_indexes = build_indexes
+
+        self._queries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+        self.observed = 0
+        self.applied: List[Dict[str, Any]] = []
+
+    def observe(self, sql_query: str):
+        """Count an execution of a query sent to the database."""
+        fingerprint = sql_fingerprint(sql_query)
+        entry = self._queries.get(fingerprint)
+        if entry is None:
+            entry = self._queries[fingerprint] = {"sql_fingerprint": fingerprint, "executions": 0}
+            while len(self._queries) > self.max_queries:
+                self._queries.popitem(last=False)
+        else:
+            self._queries.move_to_end(fingerprint)
+        entry["sql_query"] = sql_query
+        entry["executions"] += 1
+        self.observed += 1
+
+    async def run(self):
+        """Create recommended indexes forever on the configured interval."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.apply()
+            except Exception as e:
+                logger.warning("Index advisor run failed: %s", str(e) or type(e).__name__)
+
+    async def apply(self) -> List[Dict[str, Any]]:
+        """Create the recommended indexes on a SQLite database and return them."""
+        if self.db_manager.get_sql_dialect() != "SQLite":
+            raise UnsupportedDatabaseError("Indexes are only applied automatically to SQLite databases")
+        created = []
+        for recommendation in await self.recommend():
+            await self.db_manager.create_index(recommendation["name"], recommendation["table"], recommendation["columns"])
+            logger.info("Created index %s: %s", recommendation["name"], recommendation["statement"])
+            created.append({**recommendation, "applied_at": time.time()})
+        self.applied.extend(created)
+        return created
+
+    async def recommend(self) -> List[Dict[str, Any]]:
+        """Ranked index recommendations for the queries seen so far."""
+        sql_dialect = self.db_manager.get_sql_dialect()
+        if sql_dialect not in _DIALECTS:
+            raise UnsupportedDatabaseError(f"Index advice is not available for {sql_dialect}")
+        if sql_dialect == "PostgreSQL" and not self.build_indexes and not await self.db_manager.hypothetical_indexes():
+            raise UnsupportedDatabaseError("Index advice on PostgreSQL needs the hypopg extension or INDEX_ADVISOR_BUILD_INDEXES=true")
+
+        async with self._lock:
+            tables = schema_columns(await self.db_manager.get_schema())
+            candidates: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[Dict[str, Any], Dict[str, Optional[str]]]]] = {}
+            for entry in list(self._queries.values()):
+                if entry["executions"] < self.min_executions:
+                    continue
+                uses = index_uses(entry["sql_query"], tables)
+                if uses is None:
+                    continue
+                refs, wanted = uses
+                for candidate in wanted:
+                    candidates.setdefault(candidate, []).append((entry, refs))
+
+            indexes = {}
+            for table in {table for table, _ in candidates}:
+                indexes[table] = [[column.lower() for column in index] for index in await self.db_manager.list_indexes(table)]
+            ranked = sorted(
+                (
+                    (candidate, queries) for candidate, queries in candidates.items()
+                    if not any(index[:len(candidate[1])] == [column.lower() for column in candidate[1]] for index in indexes[candidate[0]])
+                ),
+                key=lambda item: -sum(entry["executions"] for entry, _ in item[1])
+            )[:self.max_candidates]
+
+            row_counts: Dict[str, int] = {}
+            baselines: Dict[str, Dict[str, Any]] = {}
+            recommendations = []
+            for (table, index_columns), queries in ranked:
+                queries = sorted(queries, key=lambda item: -item[0]["executions"])[:self.max_queries_per_candidate]
+                try:
+                    recommendation = await self._evaluate(table, index_columns, queries, row_counts, baselines)
+                except Exception as e:
+                    logger.warning("Could not evaluate index on %s%s: %s", table, index_columns, str(e) or type(e).__name__)
+                    continue
+                if recommendation is not None:
+                    recommendations.append(recommendation)
+        recommendations.sort(key=lambda recommendation: -recommendation["estimated_benefit"])
+        return recommendations
+
+    def stats(self) -> Dict[str, Any]:
+        """Get index advisor statistics."""
+        return {
+            "queries": len(self._queries),
+            "max_queries": self.max_queries,
+            "observed": self.observed,
+            "min_executions": self.min_executions,
+            "auto_apply": self.auto_apply,
+            "applied": len(self.applied)
+        }
+
+    async def _evaluate(
+        self,
+        table: str,
+        columns: Tuple[str, ...],
+        queries: List[Tuple[Dict[str, Any], Dict[str, Optional[str]]]],
+        row_counts: Dict[str, int],
+        baselines: Dict[str, Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """Compare the plans of the queries with and without an index on the columns."""
+        benefit = 0.0
+        cost_before = cost_after = 0.0
+        improved = []
+        missing = [query for query in queries if query[0]["sql_fingerprint"] not in baselines]
+        if missing:
+            for (entry, _), plan in zip(missing, await self._plans(missing, row_counts)):
+                baselines[entry["sql_fingerprint"]] = plan
+        # One index build (or hypothetical index) serves all the candidate's queries
+        afters = await self._plans(queries, row_counts, (table, columns))
+        for (entry, _), after in zip(queries, afters):
+            fingerprint = entry["sql_fingerprint"]
+            before = baselines[fingerprint]
+            if after["cost"] >= before["cost"]:
+                continue
+            benefit += (before["cost"] - after["cost"]) * entry["executions"]
+            cost_before += before["cost"] * entry["executions"]
+            cost_after += after["cost"] * entry["executions"]
+            improved.append({
+                "sql_fingerprint": fingerprint,
+                "sql_query": entry["sql_query"],
+                "executions": entry["executions"],
+                "plan_before": before["plan"],
+                "plan_after": after["plan"]
+            })
+        if not improved:
+            return None
+
+        name = index_name(table, columns)
+        adapter = self.db_manager.adapter
+        return {
+            "table": table,
+            "columns": list(columns),
+            "name": name,
+            "statement": (
+                f"CREATE INDEX {adapter.quote_identifier(name)} ON {adapter.quote_identifier(table)} "
+                f"({', '.join(adapter.quote_identifier(column) for column in columns)})"
+            ),
+            "executions": sum(query["executions"] for query in improved),
+            "estimated_benefit": round(benefit, 2),
+            "cost_reduction": round(1 - cost_after / cost_before, 3) if cost_before else None,
+            "queries": improved
+        }
+
+    async def _plans(
+        self,
+        queries: List[Tuple[Dict[str, Any], Dict[str, Optional[str]]]],
+        row_counts: Dict[str, int],
+        index: Optional[Tuple[str, Tuple[str, ...]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Plans and costs of queries, planned together under the same index."""
+        # SQLite always builds the index; elsewhere only when allowed
+        build = self.build_indexes or self.db_manager.get_sql_dialect() == "SQLite"
+        results = await self.db_manager.plan_with_index([entry["sql_query"] for entry, _ in queries], index, build)
+        return [await self._cost(result, refs, row_counts) for result, (_, refs) in zip(results, queries)]
+
+    async def _cost(
+        self,
+        result: Dict[str, Any],
+        refs: Dict[str, Optional[str]],
+        row_counts: Dict[str, int]
+    ) -> Dict[str, Any]:
+        """A plan with its cost, estimating the cost of SQLite plans from table sizes."""
+        if result["cost"] is not None:
+            return result
+
+        cost = 0.0
+        for line in result["plan"]:
+            match = _SQLITE_PLAN_RE.match(line.strip())
+            if match is None:
+                continue
+            name = match.group(2).strip('"`[]').lower()
+            table = refs.get(name, name)
+            if table is None:
+                continue
+            if table not in row_counts:
+                rows, _ = await self.db_manager.execute_query(
+                    f"SELECT COUNT(*) AS row_count FROM {self.db_manager.adapter.quote_identifier(table)}"
+                )
+                row_counts[table] = rows[0]["row_count"]
+            rows = row_counts[table]
+            using = match.group(3) or ""
+            # A search reads about one B-tree path; scans and automatic indexes read the whole table
+            if match.group(1) == "SEARCH" and "AUTOMATIC" not in using:
+                cost += math.log2(rows + 1) + 1
+            else:
+                cost += rows
+        return {"plan": result["plan"], "cost": round(cost, 2)}
+
@@ -1,54 +1,264 @@
 """
 Large Language Model service for SQL generation.
 """
-import openai
-from typing import Dict, Any
-from ..core.simple_settings import settings
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+from ..core.settings import settings
+from ..utils.exceptions import ConfigurationError
+from .sql_cache import SQLCache, create_sql_cache
+from .similarity_cache import SimilarityCache
+from .example_store import ExampleStore, schema_tables
+from .prompt_builder import PromptBuilder, create_token_counter
+from .column_stats import ColumnStatsCollector
 
 
 class LLMService:
     """LLM Service for generating SQL queries with multi-database support."""
     
-    def __init__(self, api_key: str = None):
-        self.client = openai.OpenAI(api_key=api_key or settings.openai_api_key)
+    def __init__(
+        self,
+        api_key: str = None,
+        cache: Optional[SQLCache] = None,
+        similarity_cache: Optional[SimilarityCache] = None,
+        example_store: Optional[ExampleStore] = None,
+        prompt_builder: Optional[PromptBuilder] = None,
+        column_stats: Optional[ColumnStatsCollector] = None
+    ):
+        self._api_key = api_key
+        self._client = None
+        
+        # Cache of generated SQL (in-process or shared on-disk)
+        self.cache = cache or create_sql_cache(
+            settings.llm.cache_backend,
+            max_entries=settings.llm.cache_size,
+            path=settings.llm.cache_path
+        )
+        
+        # Reuses SQL for paraphrased questions ("German customers" / "customers in Germany")
+        self.similarity_cache = similarity_cache or SimilarityCache(
+            threshold=settings.llm.similarity_threshold,
+            max_entries=settings.llm.similarity_cache_size
+        )
+        
+        # Precompiled prompt parts and token-budget accounting
+        self.prompt_builder = prompt_builder or PromptBuilder(
+            token_budget=settings.llm.prompt_token_budget,
+            token_counter=create_token_counter(settings.llm.tokenizer, settings.llm.primary_model)
+        )
+        
+        # Few-shot examples retrieved per question from successful queries
+        self.example_store = example_store or ExampleStore(
+            max_examples=settings.llm.examples_max,
+            path=settings.llm.examples_path,
+            token_counter=self.prompt_builder.count_tokens
+        )
+        
+        # Sampled column values for the tables a question relates to (optional)
+        self.column_stats = column_stats
+        
+        # Outcomes of repairing SQL that failed to execute
+        self.repairs = {"requests": 0, "attempts": 0, "succeeded": 0}
+    
+    @property
+    def client(self):
+        """OpenAI client, constructed on first use to keep startup cheap."""
+        if self._client is None:
+            import openai
+            
+            api_key = self._api_key or settings.llm.openai_api_key
+            if not api_key:
+                raise ConfigurationError("OPENAI_API_KEY environment variable is required")
+            self._client = openai.OpenAI(api_key=api_key)
+        return self._client
     
     async def generate_sql(self, question: str, schema: str, sql_dialect: str = "SQLite") -> str:
         """Generate SQL query from natural language question with dialect support."""
+        generation = await self.generate_sql_with_details(question, schema, sql_dialect)
+        return generation["sql_query"]
+    
+    async def generate_sql_with_details(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str = "SQLite",
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Generate SQL and report where it came from and the prompt size used.
         
-        # Get dialect-specific instructions
-        dialect_instructions = self._get_dialect_instructions(sql_dialect)
+        ``history`` holds the earlier (question, SQL) turns of a conversation.
+        A follow-up is cached against the SQL it follows, and never matched
+        by similarity, since "only the German ones" means nothing on its own.
+        """
+        cache_key = self._cache_key(question, sql_dialect, history)
+        schema_hash = self._schema_hash(schema)
+        cached_sql = await self.cache.get(cache_key, schema_hash)
+        if cached_sql is not None:
+            return {"sql_query": cached_sql, "source": "cache", "prompt_tokens": None}
         
-        system_prompt = f"""You are an expert SQL developer. Convert natural language questions to {sql_dialect} queries using ONLY the provided database schema.
-
-IMPORTANT DATABASE SCHEMA:
-{schema}
-
-CRITICAL RULES:
-1. ONLY use table and column names that exist in the schema above
-2. Only generate SELECT queries
-3. Use proper {sql_dialect} syntax
-4. Return ONLY the SQL query, no explanations or markdown
-5. Use INNER JOIN or LEFT JOIN when combining tables
-6. {dialect_instructions['text_search']}
-7. Use {dialect_instructions['limit_syntax']} for queries that might return many results
-8. If a question asks for data that doesn't exist in the schema, return a simple query on available data
-
-{dialect_instructions['examples']}
-
-REMEMBER: Only use columns and tables that exist in the schema provided above!
-"""
-
-        user_prompt = f"Question: {question}\nSQL:"
+        if not history:
+            similar = self.similarity_cache.lookup(question, sql_dialect, schema_hash)
+            if similar is not None:
+                await self.cache.put(cache_key, schema_hash, similar["sql_query"])
+                return {"sql_query": similar["sql_query"], "source": "similarity", "prompt_tokens": None}
+        
+        sql_query, prompt = await self._generate_sql(question, schema, sql_dialect, history)
+        await self.cache.put(cache_key, schema_hash, sql_query)
+        if not history:
+            self.similarity_cache.add(question, sql_dialect, schema_hash, sql_query)
+        return {
+            "sql_query": sql_query,
+            "source": "llm",
+            "prompt_tokens": prompt["tokens"]["total"],
+            "prompt": {"tokens": prompt["tokens"], "trimmed": prompt["trimmed"]}
+        }
+    
+    async def repair_sql(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        failed_sql: str,
+        error: str,
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Ask the LLM to correct SQL that failed, given the database error.
+        
+        The failed SQL is dropped from the similarity cache. The correction
+        is not cached here, since it has not run yet; ``cache_repair`` does
+        that once it succeeds.
+        """
+        schema_hash = self._schema_hash(schema)
+        self.similarity_cache.discard(sql_dialect, schema_hash, failed_sql)
+        
+        # Compact follow-up: no few-shot examples, the failing SQL and a truncated error
+        prompt = self._build_prompt(question, schema, sql_dialect, examples=None, history=history)
+        messages = [
+            {"role": "system", "content": prompt["system"]},
+            {"role": "user", "content": prompt["user"]},
+            {"role": "assistant", "content": failed_sql},
+            {
+                "role": "user",
+                "content": f"That query failed with this error:\n{error[:500]}\nReturn ONLY the corrected SQL query."
+            }
+        ]
+        self.repairs["attempts"] += 1
+        sql_query = await self._complete(messages)
+        return {
+            "sql_query": sql_query,
+            "source": "repair",
+            "prompt_tokens": prompt["tokens"]["total"],
+            "prompt": {"tokens": prompt["tokens"], "trimmed": prompt["trimmed"]}
+        }
+    
+    def record_repair(self, succeeded: bool):
+        """Count a request whose SQL needed repairing and whether a repair ran."""
+        self.repairs["requests"] += 1
+        self.repairs["succeeded"] += int(succeeded)
+    
+    async def cache_repair(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        sql_query: str,
+        history: Optional[List[Tuple[str, str]]] = None
+    ):
+        """Cache repaired SQL that executed successfully in place of the SQL that failed."""
+        schema_hash = self._schema_hash(schema)
+        await self.cache.put(self._cache_key(question, sql_dialect, history), schema_hash, sql_query)
+        if not history:
+            self.similarity_cache.add(question, sql_dialect, schema_hash, sql_query)
+    
+    def record_success(self, question: str, sql_query: str, sql_dialect: str = "SQLite"):
+        """Remember a question whose SQL executed successfully as a few-shot example."""
+        self.example_store.add(question, sql_query, sql_dialect)
+    
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        """Get SQL cache statistics."""
+        return {
+            "sql": await self.cache.stats(),
+            "similarity": self.similarity_cache.stats(),
+            "examples": self.example_store.stats(),
+            "prompts": self.prompt_builder.stats(),
+            "column_stats": self.column_stats.stats() if self.column_stats is not None else None,
+            "repairs": {
+                **self.repairs,
+                "success_rate": (
+                    round(self.repairs["succeeded"] / self.repairs["requests"], 4) if self.repairs["requests"] else 0.0
+                )
+            }
+        }
+    
+    def _cache_key(self, question: str, sql_dialect: str, history: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Build a cache key from the dialect and normalized question.
+        
+        Follow-up questions are keyed by the SQL of the turn they follow.
+        """
+        normalized = " ".join(question.lower().split())
+        key = f"{sql_dialect}:{normalized}"
+        if history:
+            key += "|after:" + hashlib.sha256(history[-1][1].encode("utf-8")).hexdigest()[:16]
+        return key
+    
+    def _schema_hash(self, schema: str) -> str:
+        """Short hash of the schema text used for cache invalidation."""
+        return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+    
+    async def _generate_sql(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Call the LLM to generate SQL for a question."""
+        prompt = self._build_prompt(
+            question,
+            schema,
+            sql_dialect,
+            examples=self._retrieve_examples(question, schema, sql_dialect),
+            history=history
+        )
+        messages = [
+            {"role": "system", "content": prompt["system"]},
+            {"role": "user", "content": prompt["user"]}
+        ]
+        return await self._complete(messages), prompt
+    
+    def _build_prompt(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        examples: Optional[List[str]] = None,
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Assemble the prompt for a question with column statistics where available."""
+        schema_hash = self._schema_hash(schema)
+        return self.prompt_builder.build(
+            question,
+            schema,
+            sql_dialect,
+            examples=examples,
+            schema_hash=schema_hash,
+            statistics=self.column_stats.notes(schema, schema_hash) if self.column_stats is not None else None,
+            history=history
+        )
+    
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """Get SQL from the primary model, falling back to the secondary model.
         
+        The blocking client runs in a worker thread, so the event loop keeps
+        serving other requests and callers' timeouts take effect.
+        """
         try:
-            response = self.client.chat.completions.create(
-                model=settings.llm_primary_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=settings.llm_max_tokens,
-                temperature=settings.llm_temperature
+            response = await asyncio.to_thread(
+                self.client.chat.completions.create,
+                model=settings.llm.primary_model,
+                messages=messages,
+                max_tokens=settings.llm.max_tokens,
+                temperature=settings.llm.temperature
             )
             
             sql_query = response.choices[0].message.content.strip()
@@ -57,14 +267,12 @@ REMEMBER: Only use columns and tables that exist in the schema provided above!
         except Exception:
             # Fallback to secondary model
             try:
-                response = self.client.chat.completions.create(
-                    model=settings.llm_fallback_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    max_tokens=settings.llm_max_tokens,
-                    temperature=settings.llm_temperature
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
+                    model=settings.llm.fallback_model,
+                    messages=messages,
+                    max_tokens=settings.llm.max_tokens,
+                    temperature=settings.llm.temperature
                 )
                 
                 sql_query = response.choices[0].message.content.strip()
@@ -73,6 +281,17 @@ REMEMBER: Only use columns and tables that exist in the schema provided above!
             except Exception as fallback_error:
                 raise Exception(f"LLM service error: {str(fallback_error)}")
     
+    def _retrieve_examples(self, question: str, schema: str, sql_dialect: str) -> List[str]:
+        """Render the few-shot examples most relevant to the question."""
+        examples = self.example_store.retrieve(
+            question,
+            sql_dialect,
+            available_tables=schema_tables(schema) or None,
+            k=settings.llm.few_shot_k,
+            token_budget=settings.llm.few_shot_token_budget
+        )
+        return [ExampleStore.format_example(example) for example in examples]
+    
     def _clean_sql_response(self, sql_query: str) -> str:
         """Clean up the SQL response from LLM."""
         # Remove any markdown formatting
@@ -85,122 +304,3 @@ REMEMBER: Only use columns and tables that exist in the schema provided above!
         
         # Remove any extra whitespace or newlines
         return sql_query.strip()
-    
-    def _get_dialect_instructions(self, sql_dialect: str) -> Dict[str, str]:
-        """Get database-specific SQL instructions for LLM prompts."""
-        
-        dialect_configs = {
-            "SQLite": {
-                "text_search": "Use LIKE for text searches (SQLite doesn't have ILIKE)",
-                "limit_syntax": "LIMIT",
-                "examples": """EXAMPLE QUERIES FOR SQLite:
-Question: "Show me all customers"
-SQL: SELECT * FROM customers LIMIT 50
-
-Question: "What are the most expensive products?"
-SQL: SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10
-
-Question: "Show customers from Germany"
-SQL: SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'
-
-Question: "List products by category"
-SQL: SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name
-
-Question: "How many customers are there?"
-SQL: SELECT COUNT(*) as customer_count FROM customers"""
-            },
-            
-            "PostgreSQL": {
-                "text_search": "Use ILIKE for case-insensitive text searches, LIKE for case-sensitive",
-                "limit_syntax": "LIMIT",
-                "examples": """EXAMPLE QUERIES FOR PostgreSQL:
-Question: "Show me all customers"
-SQL: SELECT * FROM customers LIMIT 50
-
-Question: "What are the most expensive products?"
-SQL: SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10
-
-Question: "Show customers from Germany"
-SQL: SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'
-
-Question: "Find customers with 'market' in company name"
-SQL: SELECT company_name, contact_name FROM customers WHERE company_name ILIKE '%market%'
-
-Question: "List products by category"
-SQL: SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name
-
-Question: "How many customers are there?"
-SQL: SELECT COUNT(*) as customer_count FROM customers"""
-            },
-            
-            "MySQL": {
-                "text_search": "Use LIKE for text searches, use LOWER() for case-insensitive searches",
-                "limit_syntax": "LIMIT",
-                "examples": """EXAMPLE QUERIES FOR MySQL:
-Question: "Show me all customers"
-SQL: SELECT * FROM customers LIMIT 50
-
-Question: "What are the most expensive products?"
-SQL: SELECT product_name, unit_price FROM products ORDER BY unit_price DESC LIMIT 10
-
-Question: "Show customers from Germany"
-SQL: SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'
-
-Question: "Find customers with 'market' in company name (case-insensitive)"
-SQL: SELECT company_name, contact_name FROM customers WHERE LOWER(company_name) LIKE LOWER('%market%')
-
-Question: "List products by category"
-SQL: SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name
-
-Question: "How many customers are there?"
-SQL: SELECT COUNT(*) as customer_count FROM customers"""
-            },
-            
-            "SQL Server": {
-                "text_search": "Use LIKE for text searches, use LOWER() for case-insensitive searches",
-                "limit_syntax": "TOP",
-                "examples": """EXAMPLE QUERIES FOR SQL Server:
-Question: "Show me all customers"
-SQL: SELECT TOP 50 * FROM customers
-
-Question: "What are the most expensive products?"
-SQL: SELECT TOP 10 product_name, unit_price FROM products ORDER BY unit_price DESC
-
-Question: "Show customers from Germany"
-SQL: SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'
-
-Question: "Find customers with 'market' in company name (case-insensitive)"
-SQL: SELECT company_name, contact_name FROM customers WHERE LOWER(company_name) LIKE LOWER('%market%')
-
-Question: "List products by category"
-SQL: SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name
-
-Question: "How many customers are there?"
-SQL: SELECT COUNT(*) as customer_count FROM customers"""
-            },
-            
-            "Oracle": {
-                "text_search": "Use LIKE for text searches, use UPPER() or LOWER() for case-insensitive searches",
-                "limit_syntax": "ROWNUM",
-                "examples": """EXAMPLE QUERIES FOR Oracle:
-Question: "Show me all customers"
-SQL: SELECT * FROM customers WHERE ROWNUM <= 50
-
-Question: "What are the most expensive products?"
-SQL: SELECT * FROM (SELECT product_name, unit_price FROM products ORDER BY unit_price DESC) WHERE ROWNUM <= 10
-
-Question: "Show customers from Germany"
-SQL: SELECT company_name, contact_name, city FROM customers WHERE country = 'Germany'
-
-Question: "Find customers with 'market' in company name (case-insensitive)"
-SQL: SELECT company_name, contact_name FROM customers WHERE UPPER(company_name) LIKE UPPER('%market%')
-
-Question: "List products by category"
-SQL: SELECT p.product_name, c.category_name, p.unit_price FROM products p JOIN categories c ON p.category_id = c.category_id ORDER BY c.category_name
-
-Question: "How many customers are there?"
-SQL: SELECT COUNT(*) as customer_count FROM customers"""
-            }
-        }
-        
-        return dialect_configs.get(sql_dialect, dialect_configs["SQLite"])
\ No newline at end of file
@@ -0,0 +1,374 @@
+"""
+Prompt assembly with precompiled templates and token-budget accounting.
+"""
+import hashlib
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .similarity_cache import normalize_question
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Database-specific SQL instructions, built once at import time
+DIALECT_INSTRUCTIONS: Dict[str, Dict[str, str]] = {
+    "SQLite": {
+        "text_search": "Use LIKE for text searches (SQLite doesn't have ILIKE)",
+        "limit_syntax": "LIMIT"
+    },
+    "PostgreSQL": {
+        "text_search": "Use ILIKE for case-insensitive text searches, LIKE for case-sensitive",
+        "limit_syntax": "LIMIT"
+    },
+    "MySQL": {
+        "text_search": "Use LIKE for text searches, use LOWER() for case-insensitive searches",
+        "limit_syntax": "LIMIT"
+    },
+    "SQL Server": {
+        "text_search": "Use LIKE for text searches, use LOWER() for case-insensitive searches",
+        "limit_syntax": "TOP"
+    },
+    "Oracle": {
+        "text_search": "Use LIKE for text searches, use UPPER() or LOWER() for case-insensitive searches",
+        "limit_syntax": "ROWNUM"
+    }
+}
+
+_PROMPT_HEADER = """You are an expert SQL developer. Convert natural language questions to {sql_dialect} queries using ONLY the provided database schema.
+
+IMPORTANT DATABASE SCHEMA:
+"""
+
+_PROMPT_RULES = """
+CRITICAL RULES:
+1. ONLY use table and column names that exist in the schema above
+2. Only generate SELECT queries
+3. Use proper {sql_dialect} syntax
+4. Return ONLY the SQL query, no explanations or markdown
+5. Use INNER JOIN or LEFT JOIN when combining tables
+6. {text_search}
+7. Use {limit_syntax} for queries that might return many results
+8. If a question asks for data that doesn't exist in the schema, return a simple query on available data
+
+"""
+
+_STATISTICS_HEADER = """
+COLUMN VALUES (sampled from the data; match these spellings and codes exactly):
+"""
+
+_HISTORY_HEADER = """
+CONVERSATION SO FAR (oldest first; the new question may refer to it):
+"""
+
+_PROMPT_FOOTER = """
+
+REMEMBER: Only use columns and tables that exist in the schema provided above!
+"""
+
+# Pre-tokenization pattern modelled on the cl100k_base splitter
+_PIECE_RE = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+",
+    re.IGNORECASE
+)
+
+
+def approximate_token_count(text: str) -> int:
+    """Count tokens with a bundled approximation of the cl100k_base tokenizer.
+
+    Text is split the way BPE pre-tokenization does it; words are charged
+    one token per six characters, punctuation runs one per two characters
+    and whitespace runs one token. For English prompts and SQL this lands
+    within about ten percent of the real count.
+    """
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        stripped = piece.strip()
+        if not stripped:
+            count += 1
+        elif stripped[0].isalpha() or stripped[0] == "'":
+            count += (len(stripped) + 5) // 6
+        elif stripped[0].isdigit():
+            count += 1
+        else:
+            count += (len(stripped) + 1) // 2
+    return count
+
+
+def create_token_counter(tokenizer: str = "approx", model: str = "gpt-4") -> Callable[[str], int]:
+    """Create a token counting function by name."""
+    tokenizer = tokenizer.lower()
+    if tokenizer == "approx":
+        return approximate_token_count
+    elif tokenizer == "tiktoken":
+        # Optional dependency; the encoding must already be in TIKTOKEN_CACHE_DIR offline
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    else:
+        raise ValueError(f"Unsupported tokenizer: {tokenizer}")
+
+
+def split_schema(schema: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split schema text into its preamble and one block per "Table: " section."""
+    preamble_lines: List[str] = []
+    blocks: List[Tuple[str, List[str]]] = []
+    for line in schema.splitlines(keepends=True):
+        if line.startswith("Table: "):
+            blocks.append((line[len("Table: "):].strip(), [line]))
+        elif blocks:
+            blocks[-1][1].append(line)
+        else:
+            preamble_lines.append(line)
+    return "".join(preamble_lines), [(table, "".join(lines)) for table, lines in blocks]
+
+
+@lru_cache(maxsize=None)
+def _compile_dialect_parts(sql_dialect: str) -> Tuple[str, str, str]:
+    """Render the static header, rules and footer for a dialect once."""
+    instructions = DIALECT_INSTRUCTIONS.get(sql_dialect, DIALECT_INSTRUCTIONS["SQLite"])
+    return (
+        _PROMPT_HEADER.format(sql_dialect=sql_dialect),
+        _PROMPT_RULES.format(sql_dialect=sql_dialect, **instructions),
+        _PROMPT_FOOTER
+    )
+
+
+class PromptBuilder:
+    """Assembles SQL generation prompts within a token budget.
+
+    The static parts of the system prompt are rendered once per dialect and
+    the schema is split into per-table blocks once per schema version, each
+    with its token count. Building a prompt then only sums cached counts and
+    joins strings. Column statistics are added only for tables the question
+    relates to, and earlier turns of a conversation so follow-up questions
+    can be resolved. When the prompt would exceed the budget, statistics are
+    dropped first, then few-shot examples, then the oldest conversation
+    turns and then the tables least related to the question.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        token_counter: Callable[[str], int] = approximate_token_count,
+        cache_size: int = 32
+    ):
+        self.token_budget = token_budget
+        self.token_counter = token_counter
+        self.cache_size = cache_size
+
+        self._dialect_tokens: Dict[str, Tuple[int, int, int]] = {}
+        self._schemas: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.prompts_built = 0
+        self.prompts_trimmed = 0
+        self.total_tokens = 0
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens in a piece of text."""
+        return self.token_counter(text)
+
+    def build(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        examples: Optional[List[str]] = None,
+        schema_hash: Optional[str] = None,
+        statistics: Optional[Dict[str, str]] = None,
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Assemble the system and user prompts and their token accounting.
+        
+        ``statistics`` maps table names to rendered column statistics and
+        ``history`` lists earlier (question, SQL) turns, oldest first.
+        """
+        header, rules, footer = _compile_dialect_parts(sql_dialect)
+        fixed_tokens = sum(self._dialect_part_tokens(sql_dialect))
+
+        user_prompt = f"Question: {question}\nSQL:"
+        user_tokens = self.count_tokens(user_prompt)
+
+        compiled = self._compile_schema(schema, schema_hash)
+        schema_tokens = compiled["tokens"]
+        keywords = set(normalize_question(question.replace("_", " "))[0])
+        
+        notes = self._select_statistics(compiled, keywords, statistics or {})
+        note_tokens = [self.count_tokens(text) for _, text in notes]
+        statistics_header_tokens = self.count_tokens(_STATISTICS_HEADER) if notes else 0
+
+        examples = list(examples or [])
+        example_tokens = [self.count_tokens(example) for example in examples]
+        examples_header = f"EXAMPLE QUERIES FOR {sql_dialect}:\n"
+        examples_header_tokens = self.count_tokens(examples_header) if examples else 0
+
+        turns = [f"Q: {turn_question}\nSQL: {turn_sql}\n" for turn_question, turn_sql in history or []]
+        turn_tokens = [self.count_tokens(turn) for turn in turns]
+        history_header_tokens = self.count_tokens(_HISTORY_HEADER) if turns else 0
+
+        def total() -> int:
+            return (
+                fixed_tokens + user_tokens + schema_tokens + statistics_header_tokens + sum(note_tokens)
+                + examples_header_tokens + sum(example_tokens) + history_header_tokens + sum(turn_tokens)
+            )
+
+        dropped_statistics = 0
+        while notes and total() > self.token_budget:
+            notes.pop()
+            note_tokens.pop()
+            dropped_statistics += 1
+            if not notes:
+                statistics_header_tokens = 0
+
+        dropped_examples = 0
+        while examples and total() > self.token_budget:
+            examples.pop()
+            example_tokens.pop()
+            dropped_examples += 1
+            if not examples:
+                examples_header_tokens = 0
+
+        dropped_turns = 0
+        while turns and total() > self.token_budget:
+            turns.pop(0)
+            turn_tokens.pop(0)
+            dropped_turns += 1
+            if not turns:
+                history_header_tokens = 0
+
+        schema_text = compiled["text"]
+        dropped_tables: List[str] = []
+        if total() > self.token_budget and len(compiled["blocks"]) > 1:
+            available = self.token_budget - (total() - schema_tokens)
+            schema_text, schema_tokens, dropped_tables = self._trim_schema(compiled, keywords, available)
+            kept = [index for index, (table, _) in enumerate(notes) if table not in dropped_tables]
+            notes = [notes[index] for index in kept]
+            note_tokens = [note_tokens[index] for index in kept]
+            if not notes:
+                statistics_header_tokens = 0
+
+        statistics_text = _STATISTICS_HEADER + "".join(text for _, text in notes) if notes else ""
+        examples_text = examples_header + "\n\n".join(examples) if examples else ""
+        history_text = _HISTORY_HEADER + "".join(turns) if turns else ""
+        system_prompt = header + schema_text + statistics_text + rules + examples_text + history_text + footer
+
+        prompt_tokens = total()
+        trimmed = bool(dropped_statistics or dropped_examples or dropped_turns or dropped_tables)
+        self.prompts_built += 1
+        self.prompts_trimmed += int(trimmed)
+        self.total_tokens += prompt_tokens
+        if prompt_tokens > self.token_budget:
+            logger.warning("Prompt is %d tokens, over the %d token budget", prompt_tokens, self.token_budget)
+
+        return {
+            "system": system_prompt,
+            "user": user_prompt,
+            "tokens": {
+                "total": prompt_tokens,
+                "instructions": fixed_tokens,
+                "schema": schema_tokens,
+                "statistics": statistics_header_tokens + sum(note_tokens),
+                "examples": examples_header_tokens + sum(example_tokens),
+                "history": history_header_tokens + sum(turn_tokens),
+                "question": user_tokens,
+                "budget": self.token_budget
+            },
+            "trimmed": {
+                "statistics": dropped_statistics,
+                "examples": dropped_examples,
+                "history": dropped_turns,
+                "tables": dropped_tables
+            }
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Get prompt assembly statistics."""
+        return {
+            "token_budget": self.token_budget,
+            "compiled_schemas": len(self._schemas),
+            "prompts_built": self.prompts_built,
+            "prompts_trimmed": self.prompts_trimmed,
+            "avg_prompt_tokens": round(self.total_tokens / self.prompts_built, 1) if self.prompts_built else 0.0
+        }
+
+    def _dialect_part_tokens(self, sql_dialect: str) -> Tuple[int, int, int]:
+        """Token counts of the static prompt parts, counted once per dialect."""
+        counts = self._dialect_tokens.get(sql_dialect)
+        if counts is None:
+            counts = tuple(self.count_tokens(part) for part in _compile_dialect_parts(sql_dialect))
+            self._dialect_tokens[sql_dialect] = counts
+        return counts
+
+    def _compile_schema(self, schema: str, schema_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Split a schema into per-table blocks with token counts, cached per schema version."""
+        key = schema_hash or hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+        compiled = self._schemas.get(key)
+        if compiled is not None:
+            self._schemas.move_to_end(key)
+            return compiled
+
+        preamble, blocks = split_schema(schema)
+        compiled = {
+            "text": schema,
+            "tokens": self.count_tokens(schema),
+            "preamble": preamble,
+            "preamble_tokens": self.count_tokens(preamble),
+            "blocks": [
+                {
+                    "table": table,
+                    "text": text,
+                    "tokens": self.count_tokens(text),
+                    "keywords": set(normalize_question(text.replace("_", " "))[0]),
+                    "table_keywords": set(normalize_question(table.replace("_", " "))[0])
+                }
+                for table, text in blocks
+            ]
+        }
+        self._schemas[key] = compiled
+        while len(self._schemas) > self.cache_size:
+            self._schemas.popitem(last=False)
+        return compiled
+
+    @staticmethod
+    def _relevance(block: Dict[str, Any], keywords: set) -> int:
+        """How strongly a table block relates to the question keywords."""
+        return 2 * len(keywords & block["table_keywords"]) + len(keywords & block["keywords"])
+
+    def _select_statistics(
+        self,
+        compiled: Dict[str, Any],
+        keywords: set,
+        statistics: Dict[str, str]
+    ) -> List[Tuple[str, str]]:
+        """Statistics of the tables related to the question, most related first."""
+        related = []
+        for index, block in enumerate(compiled["blocks"]):
+            text = statistics.get(block["table"])
+            relevance = self._relevance(block, keywords) if text else 0
+            if relevance > 0:
+                related.append((-relevance, index, block["table"], text))
+        return [(table, text) for _, _, table, text in sorted(related)]
+
+    def _trim_schema(self, compiled: Dict[str, Any], keywords: set, available: int) -> Tuple[str, int, List[str]]:
+        """Keep the tables most related to the question that fit in the available tokens."""
+        blocks = compiled["blocks"]
+
+        # Tables named in the question first, then tables with matching columns, then schema order
+        ranked = sorted(range(len(blocks)), key=lambda index: (-self._relevance(blocks[index], keywords), index))
+
+        used = compiled["preamble_tokens"]
+        kept = set()
+        for index in ranked:
+            cost = blocks[index]["tokens"]
+            if used + cost > available and kept:
+                continue
+            kept.add(index)
+            used += cost
+
+        text = compiled["preamble"] + "".join(blocks[index]["text"] for index in sorted(kept))
+        dropped = [blocks[index]["table"] for index in range(len(blocks)) if index not in kept]
+        return text, used, dropped
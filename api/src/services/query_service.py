@@ -1,40 +1,157 @@
 """
 Query processing service.
 """
+import asyncio
 import time
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional
+from ..database.arrow import ipc_stream
 from ..database.manager import DatabaseManager
+from .index_advisor import IndexAdvisor
 from .llm_service import LLMService
-from ..models.query_models import QueryRequest, QueryResponse
+from .result_refiner import ResultRefiner
+from .result_service import ResultService
+from .session_store import SessionStore
+from .summary_store import SummaryStore
+from .slow_query_log import SlowQueryLog
+from ..models.query_models import QueryRequest, QueryResponse, PagedQueryRequest, ResultPage
+from ..utils.exceptions import InvalidCursorError, ResultNotFoundError
+from ..utils.logging import annotate, get_logger, sql_fingerprint, timed_stage
+from ..utils.sql import limit_rows
+
+logger = get_logger(__name__)
 
 
 class QueryService:
-    """Service for processing natural language queries."""
+    """Service for processing natural language queries.
+    
+    When generated SQL fails to execute, the database error is sent back to
+    the LLM for a corrected query, up to ``repair_attempts`` times and only
+    while the request is younger than ``repair_deadline_seconds``.
+    Connection failures are not repaired.
+    
+    Requests that carry a ``session_id`` continue a conversation: the last
+    ``history_turns`` questions and their SQL go into the prompt, and a
+    follow-up whose SQL only filters, sorts, limits or aggregates the
+    previous result is answered from that result's cached rows without
+    querying the database.
+    
+    SQL run for ``/query`` and ``/query/arrow`` is rewritten to return at
+    most ``max_rows`` rows (0 disables this), so a question that matches a
+    whole table does not load it into memory.
     
-    def __init__(self, db_manager: DatabaseManager, llm_service: LLMService):
+    Aggregate SQL that ``/query`` runs often is answered from the summary
+    store's precomputed results instead of the database.
+    """
+    
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        llm_service: LLMService,
+        result_service: Optional[ResultService] = None,
+        slow_query_log: Optional[SlowQueryLog] = None,
+        repair_attempts: int = 2,
+        repair_deadline_seconds: float = 20.0,
+        session_store: Optional[SessionStore] = None,
+        result_refiner: Optional[ResultRefiner] = None,
+        history_turns: int = 3,
+        max_rows: int = 1000,
+        index_advisor: Optional[IndexAdvisor] = None,
+        summary_store: Optional[SummaryStore] = None
+    ):
         self.db_manager = db_manager
         self.llm_service = llm_service
+        self.result_service = result_service
+        self.slow_query_log = slow_query_log
+        self.repair_attempts = repair_attempts
+        self.repair_deadline_seconds = repair_deadline_seconds
+        self.session_store = session_store
+        self.result_refiner = result_refiner
+        self.history_turns = history_turns
+        self.max_rows = max_rows
+        self.index_advisor = index_advisor
+        self.summary_store = summary_store
     
     async def process_query(self, request: QueryRequest) -> QueryResponse:
         """Process a natural language query and return results."""
         start_time = time.time()
+        deadline = time.monotonic() + self.repair_deadline_seconds
+        timings: Dict[str, float] = {}
+        generation = None
+        session_id, history = self._open_session(request.session_id, request.start_session)
         
         try:
             # Get database schema if not provided
             schema = request.schema
             if not schema:
-                schema = await self.db_manager.get_schema()
+                with timed_stage("schema", timings):
+                    schema = await self.db_manager.get_schema()
             
             # Generate SQL using LLM with database-specific dialect
             sql_dialect = self.db_manager.get_sql_dialect()
-            sql_query = await self.llm_service.generate_sql(
-                request.question, 
-                schema, 
-                sql_dialect
-            )
+            with timed_stage("generate_sql", timings):
+                generation = await self.llm_service.generate_sql_with_details(
+                    request.question, 
+                    schema, 
+                    sql_dialect,
+                    history=history
+                )
+            self._annotate_generation(generation)
+            
+            # Answer follow-ups that operate on the previous result from its rows
+            refined = None
+            if history:
+                with timed_stage("refine", timings):
+                    refined = await self._refine(session_id, generation["sql_query"], sql_dialect)
+            
+            # Frequent aggregate queries are answered from their precomputed summary
+            summarized = None
+            if refined is None and self.summary_store is not None:
+                summarized = self.summary_store.lookup(generation["sql_query"])
+                if summarized is not None and 0 < self.max_rows < len(summarized[0]):
+                    summarized = None
             
-            # Execute query
-            results, columns = await self.db_manager.execute_query(sql_query)
+            if refined is not None:
+                results, columns = refined
+                data_source = "session"
+            elif summarized is not None:
+                results, columns = summarized
+                data_source = "summary"
+            else:
+                # Read before executing, so writes made while the query runs invalidate its summary
+                versions = None
+                if self.summary_store is not None:
+                    versions = await self.summary_store.versions_before(generation["sql_query"])
+                
+                # Execute query, repairing SQL that fails
+                generation, (results, columns) = await self._execute_with_repair(
+                    request.question,
+                    schema,
+                    sql_dialect,
+                    generation,
+                    lambda generation: self.db_manager.execute_query(generation["sql_query"]),
+                    timings,
+                    deadline,
+                    history,
+                    self.max_rows
+                )
+                data_source = "database"
+                self._observe(generation)
+                if self.summary_store is not None and not (generation.get("limit_applied") and len(results) >= self.max_rows):
+                    await self.summary_store.observe(
+                        generation.get("unlimited_sql", generation["sql_query"]), columns, results, versions
+                    )
+            sql_query = generation["sql_query"]
+            limit_applied = generation.get("limit_applied", False)
+            annotate(row_count=len(results), data_source=data_source)
+            self._record_slow(request.question, generation, timings, len(results))
+            
+            # Queries that returned rows become few-shot examples; follow-ups depend on their context
+            if results and not history:
+                self.llm_service.record_success(request.question, sql_query, sql_dialect)
+            if session_id is not None:
+                self.session_store.record(
+                    session_id, request.question, self._complete_sql(generation, len(results)), columns, results
+                )
             
             # Calculate execution time
             execution_time_ms = (time.time() - start_time) * 1000
@@ -44,11 +161,290 @@ class QueryService:
                 results=results,
                 columns=columns,
                 row_count=len(results),
-                execution_time_ms=round(execution_time_ms, 2)
+                execution_time_ms=round(execution_time_ms, 2),
+                sql_source=generation["source"],
+                prompt_tokens=generation["prompt_tokens"],
+                repair_attempts=generation.get("repair_attempts", 0),
+                session_id=session_id,
+                data_source=data_source,
+                limit_applied=limit_applied and len(results) >= self.max_rows
+            )
+            
+        except Exception as e:
+            self._record_slow(request.question, generation, timings, error=str(e))
+            raise Exception(f"Query processing error: {str(e)}")
+    
+    async def process_query_arrow(self, request: QueryRequest) -> Tuple[Dict[str, Any], AsyncIterator[bytes]]:
+        """Process a query and stream its results as an Arrow IPC stream.
+        
+        The first record batch is read before returning, so SQL errors are
+        raised here rather than in the middle of the response body.
+        """
+        deadline = time.monotonic() + self.repair_deadline_seconds
+        timings: Dict[str, float] = {}
+        generation = None
+        session_id, history = self._open_session(request.session_id, request.start_session)
+        
+        async def open_batches(generation: Dict[str, Any]):
+            batches = self.db_manager.stream_record_batches(
+                generation["sql_query"],
+                metadata={"sql_query": generation["sql_query"], "sql_source": generation["source"]}
             )
+            try:
+                return batches, await batches.__anext__()
+            except BaseException:
+                await batches.aclose()
+                raise
+        
+        try:
+            schema = request.schema
+            if not schema:
+                with timed_stage("schema", timings):
+                    schema = await self.db_manager.get_schema()
+            
+            sql_dialect = self.db_manager.get_sql_dialect()
+            with timed_stage("generate_sql", timings):
+                generation = await self.llm_service.generate_sql_with_details(
+                    request.question,
+                    schema,
+                    sql_dialect,
+                    history=history
+                )
+            self._annotate_generation(generation)
             
+            generation, (batches, first_batch) = await self._execute_with_repair(
+                request.question, schema, sql_dialect, generation, open_batches, timings, deadline, history,
+                self.max_rows
+            )
+            sql_query = generation["sql_query"]
+            self._observe(generation)
         except Exception as e:
+            self._record_slow(request.question, generation, timings, error=str(e))
             raise Exception(f"Query processing error: {str(e)}")
+        
+        # Only the first batch has been read; later batches are timed by the access log
+        self._record_slow(request.question, generation, timings, first_batch.num_rows)
+        
+        if first_batch.num_rows and not history:
+            self.llm_service.record_success(request.question, sql_query, sql_dialect)
+        # Streamed rows are not kept, so the next follow-up is sent to the database
+        if session_id is not None:
+            self.session_store.record(session_id, request.question, sql_query)
+        
+        async def all_batches():
+            try:
+                yield first_batch
+                async for batch in batches:
+                    yield batch
+            finally:
+                await batches.aclose()
+        
+        return {**generation, "session_id": session_id}, ipc_stream(all_batches())
+    
+    async def process_paged_query(self, request: PagedQueryRequest) -> ResultPage:
+        """Generate SQL for a question, keep it server-side and return the first page."""
+        start_time = time.time()
+        deadline = time.monotonic() + self.repair_deadline_seconds
+        timings: Dict[str, float] = {}
+        generation = None
+        session_id, history = self._open_session(request.session_id, request.start_session)
+        
+        async def first_page(generation: Dict[str, Any]) -> Dict[str, Any]:
+            handle = await self.result_service.create(generation["sql_query"], schema)
+            return await self.result_service.fetch_page(handle["id"], page_size=request.page_size)
+        
+        try:
+            schema = request.schema
+            if not schema:
+                with timed_stage("schema", timings):
+                    schema = await self.db_manager.get_schema()
+            
+            sql_dialect = self.db_manager.get_sql_dialect()
+            with timed_stage("generate_sql", timings):
+                generation = await self.llm_service.generate_sql_with_details(
+                    request.question,
+                    schema,
+                    sql_dialect,
+                    history=history
+                )
+            self._annotate_generation(generation)
+            
+            generation, page = await self._execute_with_repair(
+                request.question, schema, sql_dialect, generation, first_page, timings, deadline, history
+            )
+            annotate(row_count=page["row_count"])
+            self._record_slow(request.question, generation, timings, page["row_count"])
+            self._observe(generation)
+            
+            if page["results"] and not history:
+                self.llm_service.record_success(request.question, generation["sql_query"], sql_dialect)
+            # Only a page of the result is held here, so it is not kept for refining
+            if session_id is not None:
+                self.session_store.record(session_id, request.question, generation["sql_query"])
+            
+            return ResultPage(
+                **page,
+                execution_time_ms=round((time.time() - start_time) * 1000, 2),
+                sql_source=generation["source"],
+                prompt_tokens=generation["prompt_tokens"],
+                repair_attempts=generation.get("repair_attempts", 0),
+                session_id=session_id
+            )
+            
+        except Exception as e:
+            self._record_slow(request.question, generation, timings, error=str(e))
+            raise Exception(f"Query processing error: {str(e)}")
+    
+    async def get_result_page(
+        self,
+        result_id: str,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> ResultPage:
+        """Fetch another page of a paginated result."""
+        start_time = time.time()
+        try:
+            with timed_stage("execute"):
+                page = await self.result_service.fetch_page(result_id, cursor, page_size)
+        except (ResultNotFoundError, InvalidCursorError):
+            raise
+        except Exception as e:
+            raise Exception(f"Query execution error: {str(e)}")
+        annotate(sql_fingerprint=sql_fingerprint(page["sql_query"]), row_count=page["row_count"])
+        return ResultPage(**page, execution_time_ms=round((time.time() - start_time) * 1000, 2))
+    
+    async def _execute_with_repair(
+        self,
+        question: str,
+        schema: str,
+        sql_dialect: str,
+        generation: Dict[str, Any],
+        execute: Callable[[Dict[str, Any]], Awaitable[Any]],
+        timings: Dict[str, float],
+        deadline: float,
+        history: Optional[List[Tuple[str, str]]] = None,
+        row_limit: int = 0
+    ) -> Tuple[Dict[str, Any], Any]:
+        """Run generated SQL, asking the LLM to repair it while it fails.
+        
+        Returns the generation that finally ran, with its number of repair
+        attempts, and the result of ``execute``. With a ``row_limit`` the SQL
+        is rewritten to return at most that many rows; the generation then
+        has ``limit_applied`` set and the SQL as generated in
+        ``unlimited_sql``. When the SQL cannot be repaired, the last
+        execution error is raised.
+        """
+        attempts = 0
+        while True:
+            unlimited_sql = generation["sql_query"]
+            if row_limit > 0:
+                limited_sql, limited = limit_rows(unlimited_sql, sql_dialect, row_limit)
+                if limited:
+                    generation = {**generation, "sql_query": limited_sql, "limit_applied": True}
+            try:
+                with timed_stage("execute", timings):
+                    result = await execute(generation)
+                break
+            except Exception as e:
+                remaining = deadline - time.monotonic()
+                if attempts >= self.repair_attempts or remaining <= 0 or self.db_manager.is_connection_error(e):
+                    if attempts:
+                        self.llm_service.record_repair(succeeded=False)
+                    raise
+                error = e
+            
+            attempts += 1
+            try:
+                with timed_stage("repair_sql", timings):
+                    generation = await asyncio.wait_for(
+                        self.llm_service.repair_sql(
+                            question, schema, sql_dialect, unlimited_sql, str(error), history
+                        ),
+                        timeout=remaining
+                    )
+            except Exception as repair_error:
+                logger.warning("SQL repair failed: %s", str(repair_error) or type(repair_error).__name__)
+                self.llm_service.record_repair(succeeded=False)
+                raise error
+            self._annotate_generation(generation)
+        
+        if attempts:
+            self.llm_service.record_repair(succeeded=True)
+            await self.llm_service.cache_repair(question, schema, sql_dialect, unlimited_sql, history)
+            annotate(repair_attempts=attempts)
+        if generation.get("limit_applied"):
+            annotate(limit_applied=True)
+        return {**generation, "repair_attempts": attempts, "unlimited_sql": unlimited_sql}, result
+    
+    def _open_session(
+        self,
+        session_id: Optional[str],
+        start_session: bool = False
+    ) -> Tuple[Optional[str], Optional[List[Tuple[str, str]]]]:
+        """Resume or start the request's session and get the turns to show the LLM.
+        
+        Only requests that carry a session ID or ask to start a session get
+        one, so stateless clients leave nothing behind.
+        """
+        if self.session_store is None or not (session_id or start_session):
+            return None, None
+        session_id = self.session_store.resume(session_id)
+        history = self.session_store.history(session_id)[-self.history_turns:] if self.history_turns > 0 else []
+        return session_id, history or None
+    
+    def _observe(self, generation: Dict[str, Any]):
+        """Count the SQL sent to the database for index advice."""
+        if self.index_advisor is not None:
+            self.index_advisor.observe(generation.get("unlimited_sql", generation["sql_query"]))
+    
+    def _complete_sql(self, generation: Dict[str, Any], row_count: int) -> str:
+        """SQL whose full result is the rows returned: the generated SQL unless the row limit cut it short."""
+        if generation.get("limit_applied") and row_count < self.max_rows:
+            return generation["unlimited_sql"]
+        return generation["sql_query"]
+    
+    async def _refine(
+        self,
+        session_id: str,
+        sql_query: str,
+        sql_dialect: str
+    ) -> Optional[Tuple[List[Dict[str, Any]], List[str]]]:
+        """Rows and columns of a follow-up computed from the session's previous result, if possible."""
+        previous = self.session_store.last_result(session_id)
+        if previous is None or self.result_refiner is None:
+            return None
+        return await self.result_refiner.refine(
+            previous["sql_query"], previous["columns"], previous["rows"], sql_query, sql_dialect
+        )
+    
+    @staticmethod
+    def _annotate_generation(generation: Dict[str, Any]):
+        """Attach the generated SQL's fingerprint and origin to the request log."""
+        annotate(
+            sql_fingerprint=sql_fingerprint(generation["sql_query"]),
+            sql_source=generation["source"],
+            prompt_tokens=generation["prompt_tokens"]
+        )
+    
+    def _record_slow(
+        self,
+        question: str,
+        generation: Optional[Dict[str, Any]],
+        timings: Dict[str, float],
+        row_count: Optional[int] = None,
+        error: Optional[str] = None
+    ):
+        """Add the request to the slow-query log if a stage was over its threshold."""
+        if self.slow_query_log is None:
+            return
+        self.slow_query_log.observe(
+            question,
+            generation["sql_query"] if generation else None,
+            timings,
+            row_count=row_count,
+            sql_source=generation["source"] if generation else None,
+            error=error
+        )
     
     async def get_database_schema(self) -> str:
         """Get the current database schema."""
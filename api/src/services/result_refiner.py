@@ -0,0 +1,815 @@
+"""
+Local refinement of cached query results for follow-up questions.
+"""
+import asyncio
+import sqlite3
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ..utils.logging import get_logger
+from ..utils.sql import (
+    Token, has_aggregate, same_tokens, source_text, split_clauses, split_conjuncts, split_top_level, tokenize_sql
+)
+
+logger = get_logger(__name__)
+
+# Words a condition may use besides column references
+_CONDITION_WORDS = {"AND", "OR", "NOT", "IN", "BETWEEN", "IS", "NULL", "TRUE", "FALSE"}
+_CONDITION_OPS = {"=", "<>", "!=", "<", ">", "<=", ">=", "(", ")", ",", "-"}
+_ORDERING_OPS = {"<", ">", "<=", ">="}
+
+# Words that end an expression rather than alias it ("CASE ... END")
+_NOT_ALIASES = _CONDITION_WORDS | {"END", "ASC", "DESC"}
+
+# Aggregates that can be computed over cached rows
+_LOCAL_AGGREGATES = {"COUNT", "SUM", "AVG", "MIN", "MAX"}
+
+_DIALECTS = {"SQLite", "PostgreSQL", "MySQL"}
+
+_VALUE_TYPES = (str, int, float, bool, type(None))
+
+# NULLS FIRST/LAST needs SQLite 3.30
+_NULLS_ORDERING = sqlite3.sqlite_version_info >= (3, 30, 0)
+
+
+def _unquote(token: Token) -> str:
+    """Identifier text without its quotes."""
+    if token.kind == "quoted":
+        return token.text[1:-1]
+    return token.text
+
+
+def _unwrap(tokens: List[Token]) -> List[Token]:
+    """Strip parentheses that enclose a whole condition."""
+    while (
+        len(tokens) >= 2
+        and tokens[0].text == "("
+        and tokens[-1].text == ")"
+        and all(token.depth > tokens[0].depth for token in tokens[1:-1])
+    ):
+        tokens = tokens[1:-1]
+    return tokens
+
+
+def _closing(tokens: List[Token], index: int) -> int:
+    """Index of the parenthesis closing the one at ``index``, or -1."""
+    for position in range(index + 1, len(tokens)):
+        if tokens[position].text == ")" and tokens[position].depth == tokens[index].depth:
+            return position
+    return -1
+
+
+def _strip_distinct(select: List[Token]) -> Tuple[List[Token], bool]:
+    """A SELECT list without its DISTINCT/ALL keyword, and whether it was DISTINCT."""
+    if select and select[0].is_word("DISTINCT", "ALL"):
+        return select[1:], select[0].is_word("DISTINCT")
+    return select, False
+
+
+def _is_star(item: List[Token]) -> bool:
+    return len(item) == 1 and item[0].text == "*" or len(item) == 3 and item[2].text == "*"
+
+
+def _split_alias(item: List[Token]) -> Tuple[List[Token], Optional[Token]]:
+    """A SELECT item's expression and its alias token, if it has one."""
+    if len(item) >= 2 and item[-1].kind in ("word", "quoted") and not item[-1].is_word(*_NOT_ALIASES):
+        if item[-2].is_word("AS"):
+            return item[:-2], item[-1]
+        if item[-2].kind in ("word", "quoted") or item[-2].text == ")":
+            return item[:-1], item[-1]
+    return item, None
+
+
+def _column_ref(expression: List[Token]) -> Optional[Tuple[Optional[str], Token]]:
+    """(lower-cased qualifier, name token) of a column or table.column reference."""
+    if len(expression) == 1 and expression[0].kind in ("word", "quoted") and not expression[0].is_word(*_NOT_ALIASES):
+        return None, expression[0]
+    if (
+        len(expression) == 3
+        and expression[0].kind in ("word", "quoted")
+        and expression[1].text == "."
+        and expression[2].kind in ("word", "quoted")
+    ):
+        return _unquote(expression[0]).lower(), expression[2]
+    return None
+
+
+def _family(kind: str) -> str:
+    """Comparison family of a value kind: text or number."""
+    return "string" if kind == "string" else "number"
+
+
+class _Scope:
+    """Column references a follow-up query can make to a cached result.
+
+    Resolves column names and expressions of the previous SELECT list to
+    result columns, and translates conditions, ordering terms and
+    aggregates into SQL over the local ``result`` table, rejecting anything
+    whose result could differ from the source database's.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], sql_dialect: str, single_table: bool):
+        self.rows = rows
+        self.sql_dialect = sql_dialect
+        self.single_table = single_table
+
+        # Source column name -> (qualifier, result column) of plain references
+        self.refs: Dict[str, List[Tuple[Optional[str], str]]] = {}
+        # Other SELECT expressions (aggregates, function calls) and their result column
+        self.expressions: List[Tuple[List[Token], str]] = []
+        # Output alias -> result column
+        self.aliases: Dict[str, str] = {}
+
+        # Result column -> local table column, in load order
+        self.local: Dict[str, str] = {}
+        self._kinds: Dict[str, Optional[Set[str]]] = {}
+
+    def add_ref(self, qualifier: Optional[str], name: str, column: str):
+        self.refs.setdefault(name, []).append((qualifier, column))
+
+    def resolve(self, qualifier: Optional[str], name: str, allowed: Optional[Set[str]] = None) -> Optional[str]:
+        """Result column a (qualified) column name refers to, if unambiguous and allowed."""
+        candidates = self.refs.get(name, [])
+        if qualifier is not None:
+            matching = {column for ref_qualifier, column in candidates if ref_qualifier == qualifier}
+            # Any qualifier names the only table; with joins it must match the SELECT list's
+            if not matching and self.single_table:
+                matching = {column for _, column in candidates}
+        else:
+            matching = {column for _, column in candidates}
+        if len(matching) != 1:
+            return None
+        column = matching.pop()
+        return column if allowed is None or column in allowed else None
+
+    def match_expression(self, tokens: List[Token], index: int, allowed: Optional[Set[str]] = None) -> Optional[Tuple[int, str]]:
+        """(length, result column) of a previous SELECT expression starting at ``index``."""
+        for expression, column in self.expressions:
+            if allowed is not None and column not in allowed:
+                continue
+            if same_tokens(tokens[index:index + len(expression)], expression):
+                return len(expression), column
+        return None
+
+    def kinds(self, column: str) -> Optional[Set[str]]:
+        """Kinds of a result column's values, or None if they cannot be loaded locally."""
+        if column not in self._kinds:
+            kinds: Optional[Set[str]] = set()
+            for row in self.rows:
+                value = row.get(column)
+                if not isinstance(value, _VALUE_TYPES):
+                    kinds = None
+                    break
+                if isinstance(value, bool):
+                    kinds.add("bool")
+                elif isinstance(value, str):
+                    kinds.add("string")
+                elif isinstance(value, int):
+                    kinds.add("integer")
+                elif value is not None:
+                    kinds.add("float")
+            self._kinds[column] = kinds
+        return self._kinds[column]
+
+    def use(self, column: str) -> Optional[Tuple[str, Set[str]]]:
+        """Local column name and value kinds of a result column, loading it into the local table."""
+        kinds = self.kinds(column)
+        if kinds is None:
+            return None
+        if column not in self.local:
+            self.local[column] = f"c{len(self.local)}"
+        return self.local[column], kinds
+
+    def target(self, target: Any) -> Optional[Tuple[str, Set[str]]]:
+        """Local SQL and kinds of a result column name or an already rendered (SQL, kinds) pair."""
+        return self.use(target) if isinstance(target, str) else target
+
+    def translate(
+        self,
+        tokens: List[Token],
+        allowed: Optional[Set[str]] = None,
+        aliases: Optional[Dict[str, Any]] = None,
+        aggregates: bool = False
+    ) -> Optional[Tuple[str, Set[str]]]:
+        """Render an expression or condition for the local table, with the kinds of values it involves.
+
+        ``allowed`` limits which result columns may be referenced outside
+        aggregates, ``aliases`` maps output names to result columns or
+        rendered SQL, and ``aggregates`` allows aggregate calls over the
+        cached rows. Returns None when the expression cannot be evaluated
+        locally with the same result.
+        """
+        parts: List[str] = []
+        # Comparisons split on AND/OR outside BETWEEN, each with its value kinds
+        segments: List[Dict[str, Any]] = [{"kinds": set(), "ordering": False, "text_literals": 0, "text_columns": 0}]
+        in_between = False
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            segment = segments[-1]
+
+            matched = self.match_expression(tokens, index, allowed)
+            if matched is not None:
+                length, column = matched
+                used = self.use(column)
+                if used is None:
+                    return None
+                parts.append(used[0])
+                segment["kinds"] |= used[1]
+                segment["text_columns"] += int("string" in used[1])
+                index += length
+                continue
+
+            if token.kind == "word" and token.upper in _LOCAL_AGGREGATES and index + 1 < len(tokens) and tokens[index + 1].text == "(":
+                end = _closing(tokens, index + 1)
+                rendered = self._aggregate(token.upper, tokens[index + 2:end]) if aggregates and end > 0 else None
+                if rendered is None:
+                    return None
+                parts.append(rendered[0])
+                segment["kinds"] |= rendered[1]
+                index = end + 1
+                continue
+
+            if token.kind in ("word", "quoted") and not (token.kind == "word" and token.upper in _CONDITION_WORDS):
+                qualifier = None
+                if index + 2 < len(tokens) and tokens[index + 1].text == ".":
+                    qualifier = _unquote(token).lower()
+                    index += 2
+                    token = tokens[index]
+                if index + 1 < len(tokens) and tokens[index + 1].text == "(":
+                    return None
+                name = _unquote(token).lower()
+                if qualifier is None and aliases and name in aliases:
+                    used = self.target(aliases[name])
+                else:
+                    column = self.resolve(qualifier, name, allowed)
+                    used = self.use(column) if column is not None else None
+                if used is None:
+                    return None
+                parts.append(used[0])
+                segment["kinds"] |= used[1]
+                segment["text_columns"] += int("string" in used[1])
+            elif token.kind == "word":
+                if token.upper == "BETWEEN":
+                    in_between = True
+                    segment["ordering"] = True
+                elif token.upper == "AND" and in_between:
+                    in_between = False
+                elif token.upper in ("AND", "OR"):
+                    segments.append({"kinds": set(), "ordering": False, "text_literals": 0, "text_columns": 0})
+                parts.append(token.upper)
+            elif token.kind in ("string", "number"):
+                segment["kinds"].add("string" if token.kind == "string" else "integer")
+                segment["text_literals"] += int(token.kind == "string")
+                parts.append(token.text)
+            elif token.kind == "op" and token.text in _CONDITION_OPS:
+                segment["ordering"] |= token.text in _ORDERING_OPS
+                parts.append(token.text)
+            else:
+                return None
+            index += 1
+
+        kinds: Set[str] = set()
+        for segment in segments:
+            families = {_family(kind) for kind in segment["kinds"]}
+            # SQLite orders numbers before text instead of converting between them
+            if len(families) > 1:
+                return None
+            if "string" in families and self.sql_dialect != "SQLite":
+                # Text ordering depends on the collation; MySQL also compares text case-insensitively
+                if segment["ordering"]:
+                    return None
+                if self.sql_dialect == "MySQL" and (segment["text_literals"] or segment["text_columns"] > 1):
+                    return None
+            kinds |= segment["kinds"]
+        return " ".join(parts), kinds
+
+    def _aggregate(self, function: str, arguments: List[Token]) -> Optional[Tuple[str, Set[str]]]:
+        """Render an aggregate call over one result column, if it matches the source database's result."""
+        distinct = bool(arguments) and arguments[0].is_word("DISTINCT")
+        if distinct:
+            arguments = arguments[1:]
+        if function == "COUNT" and not distinct and len(arguments) == 1 and arguments[0].text == "*":
+            return "COUNT(*)", {"integer"}
+
+        ref = _column_ref(arguments)
+        column = self.resolve(ref[0], _unquote(ref[1]).lower()) if ref is not None else None
+        used = self.use(column) if column is not None else None
+        if used is None:
+            return None
+        local, kinds = used
+
+        if function == "COUNT":
+            if distinct and "string" in kinds and self.sql_dialect == "MySQL":
+                return None
+            return f"COUNT({'DISTINCT ' if distinct else ''}{local})", {"integer"}
+        if distinct or "bool" in kinds:
+            return None
+        if function in ("SUM", "AVG"):
+            # MySQL returns DECIMAL, and PostgreSQL sums bigint columns as numeric
+            if "string" in kinds or self.sql_dialect == "MySQL":
+                return None
+            if function == "SUM" and self.sql_dialect == "PostgreSQL" and "integer" in kinds:
+                return None
+            return f"{function}({local})", {"integer"} if function == "SUM" and kinds <= {"integer"} else {"float"}
+        if "string" in kinds and self.sql_dialect != "SQLite":
+            return None
+        return f"{function}({local})", set(kinds)
+
+
+class ResultRefiner:
+    """Answers a follow-up query from the cached rows of the previous result.
+
+    A follow-up qualifies when its SQL provably operates on the previous
+    result only: the same FROM clause, the previous WHERE conditions plus
+    new top-level AND conditions, and a previous query that returned every
+    matching row (no LIMIT). On top of that it may choose and rename
+    columns, sort, limit, remove duplicates, or group and aggregate with
+    COUNT, SUM, AVG, MIN and MAX. Follow-ups on a grouped result may only
+    filter on its grouping columns or add HAVING conditions on its columns.
+
+    The follow-up is rewritten against an in-memory SQLite table holding
+    the result columns it uses. Operations whose semantics differ between
+    SQLite and the source database (text collations, mixed types, MySQL
+    DECIMAL sums) are not refined. Rows that are not aggregated are
+    returned as the cached row objects, so values keep their types.
+    """
+
+    def __init__(self):
+        self.refined = 0
+        self.fallbacks = 0
+
+    async def refine(
+        self,
+        prior_sql: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+        sql_query: str,
+        sql_dialect: str
+    ) -> Optional[Tuple[List[Dict[str, Any]], List[str]]]:
+        """Rows and columns of ``sql_query`` computed from the previous result, or None."""
+        plan = self.plan(prior_sql, columns, rows, sql_query, sql_dialect)
+        if plan is None:
+            return None
+        try:
+            result = await asyncio.to_thread(self._run, plan, rows)
+        except sqlite3.Error as e:
+            self.fallbacks += 1
+            logger.info("Could not refine cached result locally: %s", e)
+            return None
+        self.refined += 1
+        return result
+
+    def plan(
+        self,
+        prior_sql: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+        sql_query: str,
+        sql_dialect: str
+    ) -> Optional[Dict[str, Any]]:
+        """Local SQL and output mapping answering ``sql_query`` from the previous result, or None."""
+        if sql_dialect not in _DIALECTS:
+            return None
+        prior = split_clauses(tokenize_sql(prior_sql))
+        new = split_clauses(tokenize_sql(sql_query))
+        if prior is None or new is None or "FROM" not in prior or "FROM" not in new:
+            return None
+        if any(clause in prior for clause in ("LIMIT", "OFFSET", "FETCH")) or "FETCH" in new:
+            return None
+        if not same_tokens(prior["FROM"], new["FROM"]):
+            return None
+        # Window functions see the whole result, so filtering changes their values
+        if any(token.is_word("OVER") for clauses in (prior, new) for tokens in clauses.values() for token in tokens):
+            return None
+
+        prior_grouped = "GROUP BY" in prior
+        if not prior_grouped and ("HAVING" in prior or has_aggregate(prior["SELECT"])):
+            return None
+        if prior_grouped and not same_tokens(prior["GROUP BY"], new.get("GROUP BY", [])):
+            return None
+
+        single_table = not any(token.depth == 0 and (token.is_word("JOIN") or token.text == ",") for token in prior["FROM"])
+        scope = _Scope(rows, sql_dialect, single_table)
+        prior_select, prior_distinct = _strip_distinct(prior["SELECT"])
+        entries = self._read_select(prior_select, columns, scope)
+        if entries is None:
+            return None
+
+        # Grouped results can only be filtered on their grouping columns
+        keys = self._group_keys(prior["GROUP BY"], scope, entries) if prior_grouped else None
+
+        where_extra = self._extra_conditions(prior.get("WHERE", []), new.get("WHERE", []))
+        if where_extra is None:
+            return None
+        conditions = []
+        for condition in where_extra:
+            translated = scope.translate(condition, allowed=keys)
+            if translated is None:
+                return None
+            conditions.append(f"({translated[0]})")
+
+        new_select, new_distinct = _strip_distinct(new["SELECT"])
+
+        if not prior_grouped and ("GROUP BY" in new or has_aggregate(new_select)):
+            if prior_distinct:
+                return None
+            return self._plan_aggregate(new, new_select, new_distinct, scope, conditions, sql_query)
+
+        if prior_grouped:
+            having_extra = self._extra_conditions(prior.get("HAVING", []), new.get("HAVING", []))
+            if having_extra is None:
+                return None
+            for condition in having_extra:
+                # PostgreSQL does not resolve output names in HAVING
+                translated = scope.translate(condition, aliases={} if sql_dialect == "PostgreSQL" else scope.aliases)
+                if translated is None:
+                    return None
+                conditions.append(f"({translated[0]})")
+        elif "HAVING" in new:
+            return None
+
+        if same_tokens(new["SELECT"], prior["SELECT"]):
+            output = [{"name": column, "column": column} for column in columns]
+            aliases = dict(scope.aliases)
+            distinct = False
+        else:
+            if prior_distinct:
+                return None
+            output = self._project(new_select, scope, entries, sql_query)
+            if output is None:
+                return None
+            aliases = {entry["alias"]: entry["column"] for entry in output if entry["alias"]}
+            distinct = new_distinct
+        output_columns = [entry["column"] for entry in output]
+
+        order = ["rowid"]
+        ordering = new.get("ORDER BY")
+        # Filtering keeps the previous order, so the same ORDER BY needs no sorting
+        reuse_order = (
+            ordering is not None
+            and not distinct
+            and same_tokens(prior.get("ORDER BY", []), ordering)
+            and not any(len(item) == 1 and item[0].kind == "number" for item in split_top_level(ordering, ","))
+        )
+        if ordering is not None and not reuse_order:
+            terms = self._order_by(
+                ordering,
+                scope,
+                output_columns,
+                allowed=set(output_columns) if distinct else None,
+                aliases=aliases
+            )
+            if terms is None:
+                return None
+            order = terms + order
+
+        limit = self._limit(new)
+        if limit is None:
+            return None
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        if distinct:
+            keys_used = [scope.use(column) for column in output_columns]
+            if any(used is None for used in keys_used):
+                return None
+            if sql_dialect == "MySQL" and any("string" in used[1] for used in keys_used):
+                return None
+            group = ", ".join(used[0] for used in keys_used)
+            order = ["MIN(rowid)" if term == "rowid" else term for term in order]
+            sql = f"SELECT MIN(rowid) FROM result{where} GROUP BY {group} ORDER BY {', '.join(order)}{limit}"
+        else:
+            sql = f"SELECT rowid FROM result{where} ORDER BY {', '.join(order)}{limit}"
+
+        return {
+            "sql": sql,
+            "load": [(local, column) for column, local in scope.local.items()],
+            "output": [{"name": entry["name"], "column": entry["column"], "value": None} for entry in output],
+            "identity": [entry["name"] for entry in output] == columns and output_columns == columns
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"refined": self.refined, "fallbacks": self.fallbacks}
+
+    def _plan_aggregate(
+        self,
+        new: Dict[str, List[Token]],
+        select: List[Token],
+        distinct: bool,
+        scope: _Scope,
+        conditions: List[str],
+        sql_query: str
+    ) -> Optional[Dict[str, Any]]:
+        """Plan a follow-up that groups and aggregates the previous result's rows."""
+        items = split_top_level(select, ",")
+        keys: List[str] = []
+        for item in split_top_level(new.get("GROUP BY", []), ","):
+            if len(item) == 1 and item[0].kind == "number" and item[0].text.isdigit():
+                position = int(item[0].text)
+                if not 1 <= position <= len(items):
+                    return None
+                item = _split_alias(items[position - 1])[0]
+            ref = _column_ref(item)
+            column = scope.resolve(ref[0], _unquote(ref[1]).lower()) if ref is not None else None
+            used = scope.use(column) if column is not None else None
+            if used is None or scope.sql_dialect == "MySQL" and "string" in used[1]:
+                return None
+            keys.append(column)
+
+        output: List[Dict[str, Any]] = []
+        values: List[str] = []
+        for item in items:
+            if _is_star(item):
+                return None
+            expression, alias = _split_alias(item)
+            if has_aggregate(expression):
+                translated = scope.translate(expression, allowed=set(keys), aggregates=True)
+                if translated is None:
+                    return None
+                values.append(translated[0])
+                output.append({
+                    "name": _unquote(alias) if alias else self._default_name(expression, sql_query, scope.sql_dialect),
+                    "column": None,
+                    "value": len(values),
+                    "used": translated
+                })
+                continue
+            ref = _column_ref(expression)
+            column = scope.resolve(ref[0], _unquote(ref[1]).lower(), set(keys)) if ref is not None else None
+            if column is None:
+                return None
+            output.append({
+                "name": _unquote(alias) if alias else self._default_name(expression, sql_query, scope.sql_dialect),
+                "column": column,
+                "value": None,
+                "used": scope.use(column)
+            })
+        if distinct or len({entry["name"].lower() for entry in output}) != len(output):
+            return None
+
+        aliases = {}
+        for item, entry in zip(items, output):
+            alias = _split_alias(item)[1]
+            if alias is not None:
+                aliases[_unquote(alias).lower()] = entry["used"]
+        having = ""
+        if "HAVING" in new:
+            translated = scope.translate(
+                new["HAVING"],
+                allowed=set(keys),
+                aliases={} if scope.sql_dialect == "PostgreSQL" else aliases,
+                aggregates=True
+            )
+            if translated is None:
+                return None
+            having = f" HAVING {translated[0]}"
+
+        order = ["MIN(rowid)"]
+        if "ORDER BY" in new:
+            terms = self._order_by(
+                new["ORDER BY"], scope, [entry["used"] for entry in output], allowed=set(keys), aliases=aliases,
+                aggregates=True
+            )
+            if terms is None:
+                return None
+            order = terms + order
+
+        limit = self._limit(new)
+        if limit is None:
+            return None
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        group = f" GROUP BY {', '.join(scope.local[column] for column in keys)}" if keys else ""
+        selected = ", ".join(["MIN(rowid)"] + values)
+        return {
+            "sql": f"SELECT {selected} FROM result{where}{group}{having} ORDER BY {', '.join(order)}{limit}",
+            "load": [(local, column) for column, local in scope.local.items()],
+            "output": [{"name": entry["name"], "column": entry["column"], "value": entry["value"]} for entry in output],
+            "identity": False
+        }
+
+    @staticmethod
+    def _read_select(select: List[Token], columns: List[str], scope: _Scope) -> Optional[List[Dict[str, Any]]]:
+        """Map the previous SELECT list's items to result columns and register them in the scope."""
+        lowered = [column.lower() for column in columns]
+        if len(set(lowered)) != len(lowered):
+            return None
+        by_name = dict(zip(lowered, columns))
+
+        items = split_top_level(select, ",")
+        stars = any(_is_star(item) for item in items)
+        # Without "*" the items are the result columns in order
+        if not stars and len(items) != len(columns):
+            return None
+
+        entries = []
+        for index, item in enumerate(items):
+            if _is_star(item):
+                for column in columns:
+                    scope.add_ref(None, column.lower(), column)
+                continue
+            expression, alias = _split_alias(item)
+            ref = _column_ref(expression)
+            if stars:
+                named = alias if alias is not None else (ref[1] if ref is not None else None)
+                column = by_name.get(_unquote(named).lower()) if named is not None else None
+                if column is None:
+                    continue
+            else:
+                column = columns[index]
+            if ref is not None:
+                scope.add_ref(ref[0], _unquote(ref[1]).lower(), column)
+            else:
+                scope.expressions.append((expression, column))
+            if alias is not None:
+                scope.aliases[_unquote(alias).lower()] = column
+            entries.append({"expression": expression, "alias": alias, "ref": ref, "column": column})
+
+        # Longest expressions first, so "SUM(a) / COUNT(*)" is not read as "COUNT(*)"
+        scope.expressions.sort(key=lambda entry: -len(entry[0]))
+        return entries
+
+    @staticmethod
+    def _group_keys(group_by: List[Token], scope: _Scope, entries: List[Dict[str, Any]]) -> Set[str]:
+        """Result columns holding the previous query's grouping values."""
+        keys = set()
+        for item in split_top_level(group_by, ","):
+            if len(item) == 1 and item[0].kind == "number" and item[0].text.isdigit():
+                position = int(item[0].text)
+                if 1 <= position <= len(entries):
+                    keys.add(entries[position - 1]["column"])
+                continue
+            ref = _column_ref(item)
+            if ref is not None:
+                column = scope.resolve(ref[0], _unquote(ref[1]).lower())
+            else:
+                matched = scope.match_expression(item, 0)
+                column = matched[1] if matched is not None and matched[0] == len(item) else None
+            if column is not None:
+                keys.add(column)
+        return keys
+
+    def _project(
+        self,
+        select: List[Token],
+        scope: _Scope,
+        entries: List[Dict[str, Any]],
+        sql_query: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Output columns of a follow-up that picks or renames columns of the previous result."""
+        items = split_top_level(select, ",")
+        unaliased = {entry["column"] for entry in entries if entry["alias"] is None}
+        output = []
+        for item in items:
+            if _is_star(item):
+                return None
+            expression, alias = _split_alias(item)
+            ref = _column_ref(expression)
+            if ref is not None:
+                column = scope.resolve(ref[0], _unquote(ref[1]).lower())
+            else:
+                matched = scope.match_expression(expression, 0)
+                column = matched[1] if matched is not None and matched[0] == len(expression) else None
+            if column is None:
+                return None
+            if alias is not None:
+                name = _unquote(alias)
+            elif column in unaliased:
+                name = column
+            else:
+                name = self._default_name(expression, sql_query, scope.sql_dialect)
+            output.append({"name": name, "column": column, "alias": _unquote(alias).lower() if alias else None})
+        if len({entry["name"].lower() for entry in output}) != len(output):
+            return None
+        return output
+
+    def _order_by(
+        self,
+        ordering: List[Token],
+        scope: _Scope,
+        positions: List[Any],
+        allowed: Optional[Set[str]] = None,
+        aliases: Optional[Dict[str, Any]] = None,
+        aggregates: bool = False
+    ) -> Optional[List[str]]:
+        """Local ORDER BY terms with the source database's NULL ordering, or None."""
+        terms = []
+        for item in split_top_level(ordering, ","):
+            nulls = None
+            if len(item) >= 2 and item[-2].is_word("NULLS") and item[-1].is_word("FIRST", "LAST"):
+                nulls = item[-1].upper
+                item = item[:-2]
+            descending = bool(item) and item[-1].is_word("DESC")
+            if item and item[-1].is_word("ASC", "DESC"):
+                item = item[:-1]
+
+            if len(item) == 1 and item[0].kind == "number":
+                position = int(item[0].text) if item[0].text.isdigit() else 0
+                used = scope.target(positions[position - 1]) if 1 <= position <= len(positions) else None
+            else:
+                used = scope.translate(item, allowed=allowed, aliases=aliases, aggregates=aggregates)
+            if used is None:
+                return None
+            # Text ordering follows the source database's collation
+            if "string" in used[1] and scope.sql_dialect != "SQLite":
+                return None
+            # PostgreSQL sorts NULLs as larger than any value; SQLite and MySQL as smaller
+            if nulls is None and scope.sql_dialect == "PostgreSQL":
+                nulls = "FIRST" if descending else "LAST"
+            if nulls is not None and not _NULLS_ORDERING:
+                return None
+            terms.append(used[0] + (" DESC" if descending else "") + (f" NULLS {nulls}" if nulls else ""))
+        return terms
+
+    @staticmethod
+    def _limit(clauses: Dict[str, List[Token]]) -> Optional[str]:
+        """Local LIMIT/OFFSET clause for a follow-up, "" without one, or None if unsupported."""
+        count = skip = None
+        limit = clauses.get("LIMIT")
+        if limit is not None:
+            if len(limit) == 1 and limit[0].text.isdigit():
+                count = int(limit[0].text)
+            elif len(limit) == 3 and limit[1].text == "," and limit[0].text.isdigit() and limit[2].text.isdigit():
+                # MySQL and SQLite "LIMIT offset, count"
+                skip, count = int(limit[0].text), int(limit[2].text)
+            else:
+                return None
+        offset = clauses.get("OFFSET")
+        if offset is not None:
+            if skip is not None or not offset or not offset[0].text.isdigit():
+                return None
+            if len(offset) > 2 or len(offset) == 2 and not offset[1].is_word("ROW", "ROWS"):
+                return None
+            skip = int(offset[0].text)
+
+        sql = ""
+        if count is not None:
+            sql += f" LIMIT {count}"
+        elif skip is not None:
+            sql += " LIMIT -1"
+        if skip:
+            sql += f" OFFSET {skip}"
+        return sql
+
+    @staticmethod
+    def _default_name(expression: List[Token], sql_query: str, sql_dialect: str) -> str:
+        """Column name the source database gives an unaliased SELECT expression."""
+        ref = _column_ref(expression)
+        if sql_dialect == "PostgreSQL":
+            if ref is not None:
+                return _unquote(ref[1]) if ref[1].kind == "quoted" else ref[1].text.lower()
+            if len(expression) >= 2 and expression[0].kind == "word" and expression[1].text == "(":
+                return expression[0].text.lower()
+            return "?column?"
+        if ref is not None:
+            return _unquote(ref[1])
+        return source_text(sql_query, expression)
+
+    @staticmethod
+    def _extra_conditions(prior_where: List[Token], new_where: List[Token]) -> Optional[List[List[Token]]]:
+        """New top-level AND conditions, if the new WHERE keeps every previous one."""
+        prior = split_conjuncts(prior_where)
+        new = split_conjuncts(new_where)
+        for condition in prior + new:
+            # A top-level OR would bind looser than the AND joining the conditions
+            if not condition or any(token.depth == condition[0].depth and token.is_word("OR") for token in condition):
+                return None
+        prior = [_unwrap(condition) for condition in prior]
+        new = [_unwrap(condition) for condition in new]
+
+        remaining = list(new)
+        for condition in prior:
+            match = next((index for index, other in enumerate(remaining) if same_tokens(condition, other)), None)
+            if match is None:
+                return None
+            remaining.pop(match)
+        return remaining
+
+    @staticmethod
+    def _run(plan: Dict[str, Any], rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Run a plan's local SQL over rows in an in-memory SQLite table.
+
+        Only the result columns the plan uses are loaded. Column values are
+        taken from the cached rows; only aggregates come from SQLite.
+        """
+        load = plan["load"] or [("unused", None)]
+        connection = sqlite3.connect(":memory:")
+        try:
+            connection.execute(f"CREATE TABLE result ({', '.join(local for local, _ in load)})")
+            connection.executemany(
+                f"INSERT INTO result VALUES ({', '.join('?' * len(load))})",
+                ([row[column] if column is not None else None for _, column in load] for row in rows)
+            )
+            records = connection.execute(plan["sql"]).fetchall()
+        finally:
+            connection.close()
+
+        columns = [entry["name"] for entry in plan["output"]]
+        if plan["identity"]:
+            return [rows[record[0] - 1] for record in records], columns
+        results = []
+        for record in records:
+            source = rows[record[0] - 1] if record[0] is not None else {}
+            results.append({
+                entry["name"]: source.get(entry["column"]) if entry["value"] is None else record[entry["value"]]
+                for entry in plan["output"]
+            })
+        return results, columns
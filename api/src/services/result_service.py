@@ -0,0 +1,348 @@
+"""
+Server-side result handles for paginated query results.
+"""
+import base64
+import binascii
+import json
+import re
+import secrets
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+from ..database.manager import DatabaseManager
+from .example_store import referenced_tables
+from ..utils.exceptions import InvalidCursorError, ResultNotFoundError
+from ..utils.sql import Token, tokenize_sql
+
+_ORDER_BY_RE = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+
+
+def primary_keys(schema: str) -> Dict[str, List[str]]:
+    """Primary key columns per table, read from a schema description."""
+    keys: Dict[str, List[str]] = {}
+    table = None
+    for line in schema.split("\n"):
+        if line.startswith("Table: "):
+            table = line[len("Table: "):].strip().lower()
+        elif table and line.strip().startswith("- ") and "(PRIMARY KEY)" in line:
+            column = line.strip()[2:].split(":", 1)[0].strip()
+            keys.setdefault(table, []).append(column)
+    return keys
+
+
+def _row_bounds(tokens: List[Token]) -> Optional[Tuple[Optional[int], int]]:
+    """Row count (None for all) and offset of a LIMIT/OFFSET/FETCH tail, if its bounds are literals."""
+    words = [token.text.upper() for token in tokens]
+    count: Optional[str] = None
+    offset = "0"
+    index = 0
+    while index < len(words):
+        following = words[index + 1:]
+        if words[index] == "LIMIT" and following:
+            if following[0] == "ALL":
+                count, index = None, index + 2
+            elif len(following) >= 3 and following[1] == ",":
+                # MySQL and SQLite "LIMIT offset, count"
+                offset, count, index = following[0], following[2], index + 4
+            else:
+                count, index = following[0], index + 2
+        elif words[index] == "OFFSET" and following:
+            offset, index = following[0], index + 2
+            if index < len(words) and words[index] in ("ROW", "ROWS"):
+                index += 1
+        elif words[index] == "FETCH" and following and following[0] in ("FIRST", "NEXT"):
+            index += 2
+            count = "1"
+            if index < len(words) and words[index] not in ("ROW", "ROWS"):
+                count, index = words[index], index + 1
+            if words[index:index + 2] not in (["ROW", "ONLY"], ["ROWS", "ONLY"]):
+                return None
+            index += 2
+        else:
+            return None
+    if not offset.isdigit() or count is not None and not count.isdigit():
+        return None
+    return (int(count) if count is not None else None), int(offset)
+
+
+def page_sql(sql_query: str, count: int, offset: int, order_columns: int = 0) -> str:
+    """SQL reading ``count`` rows of a query's result after skipping ``offset``.
+
+    The bounds go on the statement itself rather than on a subquery, so its
+    ORDER BY stays in force and MySQL accepts results with repeated column
+    names; an existing LIMIT/OFFSET/FETCH is narrowed to the page. Without
+    a top-level ORDER BY the rows are ordered by their first
+    ``order_columns`` columns, so consecutive pages neither overlap nor skip
+    rows.
+    """
+    tokens = tokenize_sql(sql_query)
+    if tokens:
+        # A trailing line comment would swallow the appended clauses
+        sql_query = sql_query[:tokens[-1].start + len(tokens[-1].text)]
+    top = [index for index, token in enumerate(tokens) if token.depth == 0]
+    ordered = any(
+        tokens[index].is_word("ORDER") and index + 1 < len(tokens) and tokens[index + 1].is_word("BY") for index in top
+    )
+    order = ""
+    if not ordered and order_columns:
+        order = " ORDER BY " + ", ".join(str(position) for position in range(1, order_columns + 1))
+
+    start = next((index for index in top if tokens[index].is_word("LIMIT", "OFFSET", "FETCH")), None)
+    if start is None:
+        return f"{sql_query}{order} LIMIT {count} OFFSET {offset}"
+    bounds = _row_bounds(tokens[start:])
+    if bounds is None:
+        return f"SELECT * FROM ({sql_query}) AS paged{order} LIMIT {count} OFFSET {offset}"
+    limit, skip = bounds
+    if limit is not None:
+        count = max(0, min(count, limit - offset))
+    return f"{sql_query[:tokens[start].start].rstrip()}{order} LIMIT {count} OFFSET {skip + offset}"
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Encode a page position as an opaque URL-safe token."""
+    data = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _cursor_key(value: Any) -> Any:
+    """A key value as stored in a cursor, tagging Decimals so they come back exact."""
+    if isinstance(value, Decimal):
+        return {"d": str(value)}
+    return value
+
+
+def _bound_key(value: Any) -> Any:
+    """A key value from a cursor as bound to the seek query."""
+    if isinstance(value, dict):
+        try:
+            return Decimal(value["d"])
+        except (KeyError, TypeError, InvalidOperation):
+            raise InvalidCursorError("Invalid cursor")
+    return value
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor token produced by ``encode_cursor``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(payload, dict) or "r" not in payload:
+        raise InvalidCursorError("Invalid cursor")
+    return payload
+
+
+class ResultService:
+    """Keeps generated SQL server-side and serves its results one page at a time.
+
+    A result handle stores the SQL, its columns and how to page through it.
+    When the SQL reads a single table, has no ORDER BY of its own and returns
+    that table's primary key, pages are fetched by keyset (seek) pagination:
+    each page is ``WHERE key > last key ORDER BY key LIMIT n``, so deep pages
+    cost the same as the first. Otherwise LIMIT/OFFSET is applied to the
+    original query itself (see ``page_sql``), which keeps its ORDER BY or,
+    lacking one, orders by all result columns. Only one page (plus one row
+    to detect the end) is read per request.
+
+    Handles live in the memory of the process that created them: with
+    several workers, page requests must be routed back to that process
+    (sticky sessions), or they get 404 like an expired handle. Idle handles
+    expire after the TTL and the least recently used are dropped beyond
+    ``max_handles``.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        ttl_seconds: float = 600,
+        max_handles: int = 1000,
+        default_page_size: int = 100,
+        max_page_size: int = 1000
+    ):
+        self.db_manager = db_manager
+        self.ttl_seconds = ttl_seconds
+        self.max_handles = max_handles
+        # A page size of 0 would return empty pages with a cursor that never advances
+        self.max_page_size = max_page_size if max_page_size > 0 else 1000
+        self.default_page_size = min(default_page_size if default_page_size > 0 else 100, self.max_page_size)
+
+        self._handles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.pages_served = 0
+        self.expired = 0
+
+    async def create(self, sql_query: str, schema: str) -> Dict[str, Any]:
+        """Register SQL as a result handle and choose its pagination strategy."""
+        sql_query = sql_query.strip().rstrip(";").strip()
+        if not sql_query.upper().startswith("SELECT"):
+            raise ValueError("Only SELECT queries are allowed")
+
+        self.evict_expired()
+
+        # Zero-row probe for column names without reading any data
+        _, columns = await self.db_manager.execute_query(page_sql(sql_query, 0, 0))
+        key = self._detect_key(sql_query, schema, columns)
+
+        now = time.monotonic()
+        handle = {
+            "id": secrets.token_urlsafe(16),
+            "sql_query": sql_query,
+            "columns": columns,
+            "key": key,
+            "pagination": "keyset" if key else "offset",
+            "created_at": now,
+            "last_access": now
+        }
+        self._handles[handle["id"]] = handle
+        while len(self._handles) > self.max_handles:
+            self._handles.popitem(last=False)
+        return handle
+
+    async def fetch_page(
+        self,
+        result_id: str,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Fetch the page starting at the cursor (or the first page)."""
+        handle = self.get(result_id)
+        page_size = min(page_size or self.default_page_size, self.max_page_size)
+
+        position: Dict[str, Any] = {}
+        if cursor:
+            position = decode_cursor(cursor)
+            if position["r"] != result_id:
+                raise InvalidCursorError("Cursor does not belong to this result")
+
+        offset = position.get("o", 0)
+        if handle["key"]:
+            query, params = self._keyset_query(handle, position.get("k"), page_size)
+        else:
+            query, params = self._offset_query(handle, offset, page_size)
+
+        rows, columns = await self.db_manager.execute_query(query, params)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        next_cursor = None
+        if has_more:
+            if handle["key"]:
+                last = rows[-1]
+                next_cursor = encode_cursor({"r": result_id, "k": [_cursor_key(last[column]) for column in handle["key"]]})
+            else:
+                next_cursor = encode_cursor({"r": result_id, "o": offset + page_size})
+
+        self.pages_served += 1
+        return {
+            "result_id": result_id,
+            "sql_query": handle["sql_query"],
+            "columns": columns or handle["columns"],
+            "results": rows,
+            "row_count": len(rows),
+            "page_size": page_size,
+            "pagination": handle["pagination"],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+            "expires_in_seconds": self.ttl_seconds
+        }
+
+    def get(self, result_id: str) -> Dict[str, Any]:
+        """Look up a live handle and refresh its idle timer."""
+        self.evict_expired()
+        handle = self._handles.get(result_id)
+        if handle is None:
+            raise ResultNotFoundError(f"Result {result_id} not found or expired")
+        handle["last_access"] = time.monotonic()
+        self._handles.move_to_end(result_id)
+        return handle
+
+    def release(self, result_id: str) -> bool:
+        """Drop a handle before it expires."""
+        return self._handles.pop(result_id, None) is not None
+
+    def evict_expired(self) -> int:
+        """Drop handles idle for longer than the TTL."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Handles are kept in access order, so expired ones are at the front
+        evicted = 0
+        while self._handles:
+            result_id, handle = next(iter(self._handles.items()))
+            if handle["last_access"] >= cutoff:
+                break
+            del self._handles[result_id]
+            evicted += 1
+        self.expired += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """Get result handle statistics."""
+        return {
+            "handles": len(self._handles),
+            "max_handles": self.max_handles,
+            "ttl_seconds": self.ttl_seconds,
+            "pages_served": self.pages_served,
+            "expired": self.expired
+        }
+
+    def _detect_key(self, sql_query: str, schema: str, columns: List[str]) -> Optional[List[str]]:
+        """Primary key columns usable as a keyset ordering key, if any."""
+        if _ORDER_BY_RE.search(sql_query):
+            return None
+        if len({column.lower() for column in columns}) != len(columns):
+            # The seek query selects from a subquery, which needs unique column names
+            return None
+        tables = referenced_tables(sql_query)
+        if len(tables) != 1:
+            return None
+        key = primary_keys(schema).get(next(iter(tables)))
+        if not key:
+            return None
+
+        # Match the key to the result's column names; each must appear exactly once
+        by_name = {}
+        for column in columns:
+            by_name.setdefault(column.lower(), []).append(column)
+        matched = []
+        for column in key:
+            names = by_name.get(column.lower(), [])
+            if len(names) != 1:
+                return None
+            matched.append(names[0])
+        return matched
+
+    def _keyset_query(self, handle: Dict[str, Any], after: Optional[List[Any]], page_size: int) -> Tuple[str, List[Any]]:
+        """Build a seek query returning rows after the given key values."""
+        adapter = self.db_manager.adapter
+        key_columns = [adapter.quote_identifier(column) for column in handle["key"]]
+        sql_query = handle["sql_query"]
+
+        where = ""
+        params: List[Any] = []
+        if after is not None:
+            if not isinstance(after, list) or len(after) != len(key_columns):
+                raise InvalidCursorError("Invalid cursor")
+            params = [_bound_key(value) for value in after]
+            markers = [adapter.placeholder(index + 1) for index in range(len(params))]
+            if len(key_columns) == 1:
+                where = f" WHERE {key_columns[0]} > {markers[0]}"
+            else:
+                where = f" WHERE ({', '.join(key_columns)}) > ({', '.join(markers)})"
+            if adapter.paramstyle == "format":
+                # Literal percent signs must be doubled once parameters are bound
+                sql_query = sql_query.replace("%", "%%")
+
+        query = (
+            f"SELECT * FROM ({sql_query}) AS paged{where} "
+            f"ORDER BY {', '.join(key_columns)} LIMIT {int(page_size) + 1}"
+        )
+        return query, params
+
+    def _offset_query(self, handle: Dict[str, Any], offset: int, page_size: int) -> Tuple[str, List[Any]]:
+        """Build a LIMIT/OFFSET query over the original SQL."""
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidCursorError("Invalid cursor")
+        query = page_sql(handle["sql_query"], int(page_size) + 1, int(offset), len(handle["columns"]))
+        return query, []
@@ -0,0 +1,150 @@
+"""
+Conversation sessions for follow-up questions.
+"""
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SessionStore:
+    """Keeps the recent turns of each conversation in memory.
+
+    A turn is a question with the SQL that answered it. Only the last
+    ``max_turns`` turns are kept, and only the latest turn keeps its result
+    rows (when there are at most ``max_result_rows``), so follow-ups that
+    filter it can be answered without the database. Across all sessions at
+    most ``max_cached_rows`` rows are kept; beyond that the rows of the
+    least recently used sessions are dropped. Sessions live in this
+    process; idle sessions expire after the TTL and the least recently used
+    are dropped beyond ``max_sessions``.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 1800,
+        max_sessions: int = 1000,
+        max_turns: int = 5,
+        max_result_rows: int = 1000,
+        max_sql_chars: int = 400,
+        max_cached_rows: int = 100000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_result_rows = max_result_rows
+        self.max_sql_chars = max_sql_chars
+        self.max_cached_rows = max_cached_rows
+
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cached_rows = 0
+
+        self.created = 0
+        self.expired = 0
+
+    def create(self) -> str:
+        """Start a new session and return its ID."""
+        self.evict_expired()
+        session_id = secrets.token_urlsafe(16)
+        self._sessions[session_id] = {"turns": deque(maxlen=self.max_turns), "last_used": time.monotonic()}
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._drop_rows(self._sessions.popitem(last=False)[1])
+        return session_id
+
+    def resume(self, session_id: Optional[str]) -> str:
+        """ID of a live session, or of a new session if it is unknown or expired."""
+        self.evict_expired()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            return self.create()
+        session["last_used"] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session_id
+
+    def history(self, session_id: str) -> List[Tuple[str, str]]:
+        """(question, compacted SQL) of the session's recent turns, oldest first."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        return [(turn["question"], turn["sql_query"]) for turn in session["turns"]]
+
+    def last_result(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """SQL, columns and rows of the latest turn, if its rows were kept."""
+        session = self._sessions.get(session_id)
+        if session is None or not session["turns"]:
+            return None
+        turn = session["turns"][-1]
+        if turn["rows"] is None:
+            return None
+        return {"sql_query": turn["full_sql"], "columns": turn["columns"], "rows": turn["rows"]}
+
+    def record(
+        self,
+        session_id: str,
+        question: str,
+        sql_query: str,
+        columns: Optional[List[str]] = None,
+        rows: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Append a turn; its rows are kept only while it is the latest turn."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+        self._drop_rows(session)
+        compact = " ".join(sql_query.split()).rstrip(";")
+        if len(compact) > self.max_sql_chars:
+            compact = compact[:self.max_sql_chars] + " ..."
+        keep_rows = rows is not None and len(rows) <= min(self.max_result_rows, self.max_cached_rows)
+        session["turns"].append({
+            "question": question,
+            "sql_query": compact,
+            "full_sql": sql_query,
+            "columns": columns if keep_rows else None,
+            "rows": rows if keep_rows else None
+        })
+        session["last_used"] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        if keep_rows:
+            self._cached_rows += len(rows)
+            for other in self._sessions.values():
+                if self._cached_rows <= self.max_cached_rows:
+                    break
+                self._drop_rows(other)
+
+    def delete(self, session_id: str) -> bool:
+        """End a session."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._drop_rows(session)
+        return True
+
+    def evict_expired(self):
+        """Drop sessions idle for longer than the TTL."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["last_used"] >= cutoff:
+                break
+            del self._sessions[session_id]
+            self._drop_rows(session)
+            self.expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get session store statistics."""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "expired": self.expired,
+            "ttl_seconds": self.ttl_seconds,
+            "cached_rows": self._cached_rows,
+            "max_cached_rows": self.max_cached_rows
+        }
+
+    def _drop_rows(self, session: Dict[str, Any]):
+        """Forget the rows kept for a session's latest turn."""
+        if session["turns"] and session["turns"][-1]["rows"] is not None:
+            self._cached_rows -= len(session["turns"][-1]["rows"])
+            session["turns"][-1]["rows"] = None
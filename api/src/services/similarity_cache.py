@@ -0,0 +1,278 @@
+"""
+Near-duplicate question cache for reusing SQL across paraphrased questions.
+"""
+import hashlib
+import random
+import re
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Filler words that do not change what a question asks for
+STOP_WORDS = frozenset({
+    "a", "an", "the", "me", "my", "our", "we", "i", "you", "please",
+    "show", "list", "get", "give", "display", "find", "fetch", "return",
+    "tell", "see", "view", "want", "need", "would", "like", "can", "could",
+    "what", "which", "who", "are", "is", "was", "were", "be", "there",
+    "all", "every", "any", "some", "of", "in", "from", "for", "with",
+    "to", "on", "at", "by", "and", "that", "those", "these", "this", "their",
+    "its", "have", "has", "do", "does"
+})
+
+# Words that change the meaning of a query; they must match exactly
+GUARD_WORDS = frozenset({
+    "not", "no", "without", "except", "excluding", "never", "only",
+    "more", "less", "greater", "fewer", "most", "least", "highest", "lowest",
+    "top", "bottom", "first", "last", "before", "after", "above", "below",
+    "between", "max", "maximum", "min", "minimum", "average", "avg", "sum",
+    "total", "count", "many", "much", "distinct", "unique", "asc", "ascending",
+    "desc", "descending", "cheapest", "expensive", "latest", "earliest",
+    "oldest", "newest", "per", "group", "each"
+})
+
+
+def _stem(token: str) -> str:
+    """Light suffix stripping so plural and tense variants compare equal."""
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 4:
+        return token[:-2]
+    return token
+
+
+def normalize_question(question: str) -> Tuple[List[str], FrozenSet[str]]:
+    """Tokenize, stem and drop filler words; return content tokens and guard tokens."""
+    tokens = [_stem(token) for token in _TOKEN_RE.findall(question.lower())]
+    guards = frozenset(
+        token for token in tokens if token in GUARD_WORDS or token.isdigit()
+    )
+    content = [token for token in tokens if token not in STOP_WORDS]
+    return content, guards
+
+
+def _near(left: str, right: str) -> bool:
+    """Whether two words of five or more letters differ by one edit (a typo)."""
+    if min(len(left), len(right)) < 5 or abs(len(left) - len(right)) > 1 or left.isdigit() or right.isdigit():
+        return False
+    if len(left) > len(right):
+        left, right = right, left
+    for i in range(len(left)):
+        if left[i] != right[i]:
+            # Substitution, or a letter inserted in the longer word
+            return left[i + 1:] == right[i + 1:] or left[i:] == right[i + 1:]
+    return True
+
+
+def same_terms(left: FrozenSet[str], right: FrozenSet[str]) -> bool:
+    """Whether two questions use the same content words, allowing one-letter typos.
+
+    Adding, dropping or swapping an entity ("UK" for "US") never matches.
+    """
+    left_only, right_only = sorted(left - right), list(right - left)
+    if len(left_only) != len(right_only):
+        return False
+    for token in left_only:
+        match = next((other for other in right_only if _near(token, other)), None)
+        if match is None:
+            return False
+        right_only.remove(match)
+    return True
+
+
+def shingles(tokens: List[str], size: int = 3) -> FrozenSet[str]:
+    """Character n-grams of each token, padded so short tokens still count."""
+    result: Set[str] = set()
+    for token in tokens:
+        padded = f"#{token}#"
+        if len(padded) <= size:
+            result.add(padded)
+            continue
+        for i in range(len(padded) - size + 1):
+            result.add(padded[i:i + size])
+    return frozenset(result)
+
+
+class MinHasher:
+    """Deterministic MinHash signatures, identical across processes."""
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, features: FrozenSet[str]) -> Tuple[int, ...]:
+        """Compute the MinHash signature of a feature set."""
+        if not features:
+            return tuple([self._PRIME] * self.num_perm)
+        values = [
+            int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            for feature in features
+        ]
+        return tuple(
+            min((a * value + b) % self._PRIME for value in values)
+            for a, b in self._params
+        )
+
+
+class SimilarityCache:
+    """In-process cache returning SQL generated for a sufficiently similar question.
+
+    Questions are reduced to character n-gram shingles of their stemmed
+    content words. MinHash signatures split into LSH bands find candidates
+    without scanning every entry; candidates are then scored by exact
+    Jaccard similarity. Entries only match within the same dialect and
+    schema hash, and numbers and meaning-changing words (negations,
+    comparatives, aggregates) must be identical. The content words must be
+    the same too, up to one-letter typos, so a question about another
+    entity never reuses SQL; the similarity covers word order, filler
+    words and inflection.
+    """
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 1000, bands: int = 16, rows: int = 4):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = rows
+        self._hasher = MinHasher(num_perm=bands * rows)
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple, Set[int]] = {}
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, question: str, sql_dialect: str, schema_hash: str) -> Optional[Dict[str, Any]]:
+        """Find SQL for the most similar cached question above the threshold."""
+        if not self.enabled:
+            return None
+
+        scope = (sql_dialect, schema_hash)
+        tokens, guards = normalize_question(question)
+        features = shingles(tokens)
+        terms = frozenset(tokens)
+        if not features:
+            self.misses += 1
+            return None
+
+        best_id = None
+        best_score = 0.0
+        for entry_id in self._candidates(scope, self._hasher.signature(features)):
+            entry = self._entries[entry_id]
+            if entry["guards"] != guards or not same_terms(terms, entry["terms"]):
+                continue
+            score = len(features & entry["features"]) / len(features | entry["features"])
+            if score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        entry = self._entries[best_id]
+        return {
+            "sql_query": entry["sql_query"],
+            "similarity": round(best_score, 4),
+            "matched_question": entry["question"]
+        }
+
+    def add(self, question: str, sql_dialect: str, schema_hash: str, sql_query: str):
+        """Remember the SQL generated for a question."""
+        if not self.enabled:
+            return
+
+        scope = (sql_dialect, schema_hash)
+        tokens, guards = normalize_question(question)
+        features = shingles(tokens)
+        if not features:
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        band_keys = self._band_keys(scope, self._hasher.signature(features))
+        self._entries[entry_id] = {
+            "question": question,
+            "scope": scope,
+            "features": features,
+            "terms": frozenset(tokens),
+            "guards": guards,
+            "sql_query": sql_query,
+            "band_keys": band_keys
+        }
+        for key in band_keys:
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def discard(self, sql_dialect: str, schema_hash: str, sql_query: str) -> int:
+        """Remove entries with the given SQL, e.g. after it failed to execute."""
+        scope = (sql_dialect, schema_hash)
+        matching = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry["sql_query"] == sql_query and entry["scope"] == scope
+        ]
+        for entry_id in matching:
+            self._evict(entry_id)
+        return len(matching)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+        self._buckets.clear()
+
+    def _band_keys(self, scope: Tuple[str, str], signature: Tuple[int, ...]) -> List[Tuple]:
+        """Split a signature into LSH band bucket keys."""
+        return [
+            (scope, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _candidates(self, scope: Tuple[str, str], signature: Tuple[int, ...]) -> Set[int]:
+        """Entries sharing at least one LSH band with the signature."""
+        candidates: Set[int] = set()
+        for key in self._band_keys(scope, signature):
+            candidates.update(self._buckets.get(key, ()))
+        return candidates
+
+    def _evict(self, entry_id: int):
+        """Drop an entry and its bucket references."""
+        entry = self._entries.pop(entry_id)
+        for key in entry["band_keys"]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
@@ -0,0 +1,158 @@
+"""
+Slow-query and slow-generation log.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from ..database.manager import DatabaseManager
+from ..utils.logging import get_logger, log_event, request_context, sql_fingerprint
+
+logger = get_logger(__name__)
+
+
+class SlowQueryLog:
+    """Keeps the most recent slow requests in a bounded ring buffer.
+
+    A request is slow when SQL generation or query execution takes longer
+    than its threshold. Each entry holds the question, SQL, fingerprint, row
+    count and stage timings. For slow executions the query plan is captured
+    with EXPLAIN in the background, so the response is never delayed by it.
+    Entries can also be appended to a JSON lines file once complete.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        generation_threshold_ms: float = 2000,
+        execution_threshold_ms: float = 500,
+        max_entries: int = 200,
+        file_path: Optional[str] = None,
+        capture_plans: bool = True,
+        plan_timeout_seconds: float = 5.0
+    ):
+        self.db_manager = db_manager
+        self.generation_threshold_ms = generation_threshold_ms
+        self.execution_threshold_ms = execution_threshold_ms
+        self.file_path = file_path or None
+        self.capture_plans = capture_plans
+        self.plan_timeout_seconds = plan_timeout_seconds
+
+        self._entries: deque = deque(maxlen=max_entries)
+        self._tasks: set = set()
+
+        self.recorded = 0
+        self.plans_captured = 0
+
+    def observe(
+        self,
+        question: str,
+        sql_query: Optional[str],
+        timings: Dict[str, float],
+        row_count: Optional[int] = None,
+        sql_source: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Record a request if one of its stages exceeded its threshold."""
+        slow_generation = timings.get("generate_sql", 0.0) >= self.generation_threshold_ms
+        slow_execution = timings.get("execute", 0.0) >= self.execution_threshold_ms
+        if not slow_generation and not slow_execution:
+            return None
+
+        context = request_context()
+        entry = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "request_id": context["request_id"] if context else None,
+            "question": question,
+            "sql_query": sql_query,
+            "sql_fingerprint": sql_fingerprint(sql_query) if sql_query else None,
+            "sql_source": sql_source,
+            "row_count": row_count,
+            "timings": dict(timings),
+            "slow_stages": [
+                stage for stage, slow in (("generate_sql", slow_generation), ("execute", slow_execution)) if slow
+            ],
+            "error": error,
+            "plan": None
+        }
+        self._entries.append(entry)
+        self.recorded += 1
+        log_event(
+            logger,
+            "slow_query",
+            level=logging.WARNING,
+            slow_stages=entry["slow_stages"],
+            sql_fingerprint=entry["sql_fingerprint"],
+            timings=entry["timings"]
+        )
+
+        if slow_execution and sql_query and self.capture_plans:
+            self._spawn(self._capture_plan(entry))
+        elif self.file_path:
+            self._spawn(self._persist(entry))
+        return entry
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recorded entries, newest first."""
+        entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> int:
+        """Remove all entries from the buffer."""
+        count = len(self._entries)
+        self._entries.clear()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Get slow-query log statistics."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._entries.maxlen,
+            "recorded": self.recorded,
+            "plans_captured": self.plans_captured,
+            "generation_threshold_ms": self.generation_threshold_ms,
+            "execution_threshold_ms": self.execution_threshold_ms,
+            "file_path": self.file_path
+        }
+
+    async def close(self):
+        """Wait for pending plan captures and file writes."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, coroutine):
+        """Run a coroutine in the background, keeping a reference until it finishes."""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _capture_plan(self, entry: Dict[str, Any]):
+        """Attach the EXPLAIN plan of a slow query to its entry."""
+        try:
+            entry["plan"] = await asyncio.wait_for(
+                self.db_manager.explain(entry["sql_query"]),
+                timeout=self.plan_timeout_seconds
+            )
+            self.plans_captured += 1
+        except Exception as e:
+            entry["plan_error"] = str(e) or type(e).__name__
+        if self.file_path:
+            await self._persist(entry)
+
+    async def _persist(self, entry: Dict[str, Any]):
+        """Append an entry to the log file."""
+        line = json.dumps(entry, default=str) + "\n"
+        try:
+            await asyncio.to_thread(self._append, line)
+        except OSError as e:
+            logger.warning("Could not write slow-query log %s: %s", self.file_path, e)
+
+    def _append(self, line: str):
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.file_path, "a", encoding="utf-8") as log_file:
+            log_file.write(line)
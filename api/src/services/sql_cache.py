@@ -0,0 +1,276 @@
+"""
+Cache backends for generated SQL.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SQLCache(ABC):
+    """Base class for generated-SQL caches.
+
+    Entries are keyed by question and dialect and remember the schema hash
+    they were generated against; a lookup with a different schema hash is a
+    miss and drops the stale entry.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    async def get(self, key: str, schema_hash: str) -> Optional[str]:
+        """Look up SQL for a key generated against the given schema."""
+        if not self.enabled:
+            return None
+        try:
+            sql_query = await self._get(key, schema_hash)
+        except Exception as e:
+            # A broken cache must never fail the request
+            self.errors += 1
+            logger.warning("SQL cache lookup failed: %s", e)
+            sql_query = None
+        if sql_query is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return sql_query
+
+    async def put(self, key: str, schema_hash: str, sql_query: str):
+        """Store SQL for a key, evicting old entries beyond the size bound."""
+        if not self.enabled:
+            return
+        try:
+            await self._put(key, schema_hash, sql_query)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("SQL cache store failed: %s", e)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": await self._size(),
+            "max_size": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    @property
+    @abstractmethod
+    def backend(self) -> str:
+        """Backend name for statistics."""
+        pass
+
+    @abstractmethod
+    async def _get(self, key: str, schema_hash: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def _put(self, key: str, schema_hash: str, sql_query: str):
+        pass
+
+    @abstractmethod
+    async def _size(self) -> int:
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        """Remove all entries."""
+        pass
+
+    async def close(self):
+        """Release backend resources."""
+        pass
+
+
+class MemorySQLCache(SQLCache):
+    """In-process LRU cache."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 256):
+        super().__init__(max_entries)
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+    async def _get(self, key: str, schema_hash: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != schema_hash:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def _put(self, key: str, schema_hash: str, sql_query: str):
+        self._entries[key] = (schema_hash, sql_query)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _size(self) -> int:
+        return len(self._entries)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class SQLiteSQLCache(SQLCache):
+    """Persistent cache in a local SQLite file, shared by all workers on a host.
+
+    WAL mode lets readers in other processes proceed while one writes, and
+    a busy timeout serializes concurrent writers. Calls run in a worker
+    thread so a locked file never blocks the event loop.
+    """
+
+    backend = "sqlite"
+
+    # Only refresh last_used_at on hits when it is older than this
+    TOUCH_INTERVAL_SECONDS = 60
+
+    def __init__(self, path: str, max_entries: int = 10000, busy_timeout_ms: int = 5000):
+        super().__init__(max_entries)
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the cache file and create the table on first use."""
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sql_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    schema_hash TEXT NOT NULL,
+                    sql_query TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_sql_cache_last_used ON sql_cache (last_used_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func, *args):
+        """Run a blocking cache operation in a worker thread."""
+        def call():
+            with self._lock:
+                return func(self._connect(), *args)
+        return await asyncio.to_thread(call)
+
+    async def _get(self, key: str, schema_hash: str) -> Optional[str]:
+        return await self._run(self._get_sync, key, schema_hash)
+
+    async def _put(self, key: str, schema_hash: str, sql_query: str):
+        await self._run(self._put_sync, key, schema_hash, sql_query)
+
+    async def _size(self) -> int:
+        return await self._run(lambda connection: connection.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0])
+
+    async def clear(self):
+        await self._run(lambda connection: connection.execute("DELETE FROM sql_cache"))
+
+    async def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _get_sync(self, connection: sqlite3.Connection, key: str, schema_hash: str) -> Optional[str]:
+        row = connection.execute(
+            "SELECT schema_hash, sql_query, last_used_at FROM sql_cache WHERE cache_key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        stored_hash, sql_query, last_used_at = row
+        if stored_hash != schema_hash:
+            connection.execute(
+                "DELETE FROM sql_cache WHERE cache_key = ? AND schema_hash = ?",
+                (key, stored_hash)
+            )
+            return None
+
+        now = time.time()
+        if now - last_used_at > self.TOUCH_INTERVAL_SECONDS:
+            connection.execute(
+                "UPDATE sql_cache SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+                (now, key)
+            )
+        return sql_query
+
+    def _put_sync(self, connection: sqlite3.Connection, key: str, schema_hash: str, sql_query: str):
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                """
+                INSERT INTO sql_cache (cache_key, schema_hash, sql_query, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    schema_hash = excluded.schema_hash,
+                    sql_query = excluded.sql_query,
+                    created_at = excluded.created_at,
+                    last_used_at = excluded.last_used_at
+                """,
+                (key, schema_hash, sql_query, now, now)
+            )
+            overflow = connection.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                connection.execute(
+                    """
+                    DELETE FROM sql_cache WHERE cache_key IN (
+                        SELECT cache_key FROM sql_cache ORDER BY last_used_at LIMIT ?
+                    )
+                    """,
+                    (overflow,)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+
+def create_sql_cache(backend: str = "memory", max_entries: int = 256, path: Optional[str] = None) -> SQLCache:
+    """Create a SQL cache backend by name."""
+    backend = backend.lower()
+    if backend == "memory":
+        return MemorySQLCache(max_entries)
+    elif backend == "sqlite":
+        return SQLiteSQLCache(path or "sql_cache.db", max_entries)
+    else:
+        raise ValueError(f"Unsupported SQL cache backend: {backend}")
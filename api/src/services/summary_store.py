@@ -0,0 +1,230 @@
+"""
+Precomputed results of frequently asked aggregate queries.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from ..database.manager import DatabaseManager
+from .example_store import referenced_tables
+from ..utils.logging import get_logger, sql_fingerprint
+from ..utils.sql import tokenize_sql
+
+logger = get_logger(__name__)
+
+# Functions and literals whose value changes between executions of the same SQL
+_VOLATILE_WORDS = {
+    "RANDOM", "RAND", "NOW", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP", "LOCALTIME",
+    "LOCALTIMESTAMP", "SYSDATE", "SYSDATETIME", "GETDATE", "CURDATE", "CURTIME", "UTC_DATE", "UTC_TIME",
+    "UTC_TIMESTAMP", "CLOCK_TIMESTAMP", "STATEMENT_TIMESTAMP", "TRANSACTION_TIMESTAMP", "TIMEOFDAY",
+    "UNIX_TIMESTAMP", "UUID", "NEWID", "GEN_RANDOM_UUID"
+}
+
+
+def summary_key(sql_query: str) -> Optional[str]:
+    """Comparable text of a deterministic GROUP BY query, or None for other SQL.
+
+    Whitespace and comments are ignored, so the key matches the same SQL
+    however it is formatted.
+    """
+    tokens = tokenize_sql(sql_query)
+    while tokens and tokens[-1].text == ";":
+        tokens = tokens[:-1]
+    grouped = any(
+        token.depth == 0 and token.is_word("GROUP") and index + 1 < len(tokens) and tokens[index + 1].is_word("BY")
+        for index, token in enumerate(tokens)
+    )
+    if not grouped or not tokens[0].is_word("SELECT", "WITH"):
+        return None
+    if any(token.is_word(*_VOLATILE_WORDS) or token.kind == "string" and token.text.lower() == "'now'" for token in tokens):
+        return None
+    return " ".join(token.text for token in tokens)
+
+
+class SummaryStore:
+    """Serves the results of frequent GROUP BY queries from memory.
+
+    Aggregate queries that ran ``min_executions`` times with at most
+    ``max_rows`` result rows become summaries: their last result is kept
+    and later requests generating the same SQL are answered from it. The
+    background task re-runs a summary when the data version of one of its
+    tables changes (checked every ``check_interval_seconds``) or when it is
+    ``refresh_seconds`` old. Summaries older than twice that are not
+    served, so a stalled refresh never serves arbitrarily old data. Where
+    the database reports no data version, the schedule alone refreshes
+    them. The least recently used summaries are dropped beyond
+    ``max_summaries``.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        min_executions: int = 3,
+        max_summaries: int = 50,
+        max_rows: int = 1000,
+        refresh_seconds: float = 300,
+        check_interval_seconds: float = 30,
+        max_candidates: int = 1000
+    ):
+        self.db_manager = db_manager
+        self.min_executions = min_executions
+        self.max_summaries = max_summaries
+        self.max_rows = max_rows
+        self.refresh_seconds = refresh_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.max_candidates = max_candidates
+
+        self._executions: "OrderedDict[str, int]" = OrderedDict()
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def lookup(self, sql_query: str) -> Optional[Tuple[List[Dict[str, Any]], List[str]]]:
+        """Rows and columns of a current summary for the SQL, if there is one."""
+        key = summary_key(sql_query)
+        summary = self._summaries.get(key) if key else None
+        if summary is None or summary["stale"] or time.monotonic() - summary["refreshed_at"] > self.refresh_seconds * 2:
+            return None
+        self._summaries.move_to_end(key)
+        summary["hits"] += 1
+        self.hits += 1
+        return summary["rows"], summary["columns"]
+
+    async def versions_before(self, sql_query: str) -> Optional[Dict[str, str]]:
+        """Data versions of the tables a query reads, to be taken before it runs.
+
+        Only read for queries ``observe`` would store (None for others), so
+        a write that lands while the query runs invalidates its result
+        rather than being recorded as already included.
+        """
+        key = summary_key(sql_query)
+        if key is None or key not in self._summaries and self._executions.get(key, 0) + 1 < self.min_executions:
+            return None
+        return await self._versions(sorted(referenced_tables(sql_query)))
+
+    async def observe(
+        self,
+        sql_query: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+        versions: Optional[Dict[str, str]] = None
+    ):
+        """Count an execution of a query, keeping its result as a summary once it is frequent.
+
+        ``versions`` are the data versions read by ``versions_before``
+        ahead of the execution; without them the result is not stored.
+        """
+        key = summary_key(sql_query)
+        if key is None:
+            return
+        count = self._executions.pop(key, 0) + 1
+        self._executions[key] = count
+        while len(self._executions) > self.max_candidates:
+            self._executions.popitem(last=False)
+        if versions is None:
+            return
+
+        summary = self._summaries.get(key)
+        if summary is not None:
+            # Ran against the database anyway (e.g. while stale): keep the fresher result
+            tables = summary["tables"]
+            current = {table: versions[table] for table in tables if table in versions}
+            self._store(key, sql_query, columns, rows, tables, current, summary["hits"])
+            return
+        if count < self.min_executions or len(rows) > self.max_rows:
+            return
+        tables = sorted(referenced_tables(sql_query))
+        self._store(key, sql_query, columns, rows, tables, {table: versions[table] for table in tables if table in versions})
+        logger.info("Summarized aggregate query %s (%d rows)", sql_fingerprint(sql_query), len(rows))
+
+    async def run(self):
+        """Keep summaries current forever on the configured interval."""
+        while True:
+            await asyncio.sleep(self.check_interval_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Summary refresh failed: %s", str(e) or type(e).__name__)
+
+    async def refresh(self) -> int:
+        """Re-run summaries whose data changed or that are due, and return how many ran."""
+        if not self._summaries:
+            return 0
+        tables = sorted({table for summary in self._summaries.values() for table in summary["tables"]})
+        versions = await self._versions(tables)
+        refreshed = 0
+        for key, summary in list(self._summaries.items()):
+            current = {table: versions[table] for table in summary["tables"] if table in versions}
+            changed = current != summary["versions"]
+            if changed and not summary["stale"]:
+                summary["stale"] = True
+                self.invalidations += 1
+            if not summary["stale"] and time.monotonic() - summary["refreshed_at"] < self.refresh_seconds:
+                continue
+            try:
+                rows, columns = await self.db_manager.execute_query(summary["sql_query"])
+            except Exception as e:
+                logger.warning("Could not refresh summary %s: %s", sql_fingerprint(summary["sql_query"]), e)
+                continue
+            if key not in self._summaries:
+                continue
+            if len(rows) > self.max_rows:
+                del self._summaries[key]
+                continue
+            self._store(key, summary["sql_query"], columns, rows, summary["tables"], current, summary["hits"])
+            self.refreshes += 1
+            refreshed += 1
+        return refreshed
+
+    def clear(self) -> int:
+        """Drop all summaries and execution counts."""
+        count = len(self._summaries)
+        self._summaries.clear()
+        self._executions.clear()
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        """Get summary store statistics."""
+        return {
+            "summaries": len(self._summaries),
+            "max_summaries": self.max_summaries,
+            "stale": sum(1 for summary in self._summaries.values() if summary["stale"]),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "refresh_seconds": self.refresh_seconds
+        }
+
+    def _store(
+        self,
+        key: str,
+        sql_query: str,
+        columns: List[str],
+        rows: List[Dict[str, Any]],
+        tables: List[str],
+        versions: Dict[str, str],
+        hits: int = 0
+    ):
+        self._summaries.pop(key, None)
+        self._summaries[key] = {
+            "sql_query": sql_query,
+            "columns": columns,
+            "rows": rows,
+            "tables": tables,
+            "versions": versions,
+            "refreshed_at": time.monotonic(),
+            "stale": False,
+            "hits": hits
+        }
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    async def _versions(self, tables: List[str]) -> Dict[str, str]:
+        """Data versions of tables; empty when they cannot be read."""
+        try:
+            return await self.db_manager.data_versions(tables)
+        except Exception as e:
+            logger.warning("Could not read data versions: %s", str(e) or type(e).__name__)
+            return {}
@@ -0,0 +1,146 @@
+"""
+Startup warm-up service.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from ..database.manager import DatabaseManager
+from .llm_service import LLMService
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmupService:
+    """Runs the startup warm-up steps and tracks application readiness."""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        llm_service: LLMService,
+        questions: Optional[List[str]] = None,
+        timeout_seconds: float = 60,
+        enabled: bool = True
+    ):
+        self.db_manager = db_manager
+        self.llm_service = llm_service
+        self.questions = questions or []
+        self.timeout_seconds = timeout_seconds
+        self.enabled = enabled
+
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether warm-up has finished and traffic can be routed here."""
+        return self.status == "ready"
+
+    async def run(self):
+        """Run all warm-up steps, bounded by the configured timeout."""
+        self.started_at = datetime.utcnow().isoformat() + "Z"
+
+        if not self.enabled:
+            self.status = "ready"
+            self.finished_at = self.started_at
+            return
+
+        self.status = "running"
+        try:
+            await asyncio.wait_for(self._run_steps(), timeout=self.timeout_seconds)
+            self.status = "ready"
+        except asyncio.TimeoutError:
+            self.status = "failed"
+            self.error = f"Warm-up timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = datetime.utcnow().isoformat() + "Z"
+
+        if self.error:
+            logger.warning("Warm-up failed: %s", self.error)
+        else:
+            logger.info("Warm-up finished: %s", {name: step["status"] for name, step in self.steps.items()})
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get warm-up status for readiness reporting."""
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "steps": self.steps
+        }
+
+    async def _run_steps(self):
+        """Run the warm-up steps in order."""
+        await self._step("open_pools", self._open_pools)
+        await self._step("schema", self._load_schema)
+        await self._step("llm_client", self._create_llm_client, required=False)
+        await self._step("pregenerate_sql", self._pregenerate_sql, required=False)
+        await self._step("ping_connections", self._ping_connections)
+
+    async def _step(self, name: str, func: Callable[[], Awaitable[Any]], required: bool = True):
+        """Run one step and record its outcome and duration."""
+        start = time.perf_counter()
+        self.steps[name] = {"status": "running"}
+        try:
+            detail = await func()
+            self.steps[name] = {"status": "ok", "detail": detail}
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "error": str(e)}
+            if required:
+                raise
+        finally:
+            self.steps[name]["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _open_pools(self) -> Dict[str, Any]:
+        """Open the database pool to its minimum size."""
+        await self.db_manager.connect()
+        return self.db_manager.get_pool_stats()
+
+    async def _load_schema(self) -> Dict[str, Any]:
+        """Fetch and cache the database schema."""
+        schema = await self.db_manager.get_schema(refresh=True)
+        return {
+            "schema_hash": self.db_manager.schema_hash,
+            "size": len(schema),
+            "tables": self.db_manager.schema_stats()["tables"]
+        }
+
+    async def _create_llm_client(self) -> Dict[str, Any]:
+        """Construct the LLM client off the event loop."""
+        await asyncio.to_thread(lambda: self.llm_service.client)
+        return {"created": True}
+
+    async def _pregenerate_sql(self) -> Dict[str, Any]:
+        """Generate and cache SQL for the configured frequent questions."""
+        if not self.questions:
+            return {"skipped": "no questions configured"}
+
+        schema = await self.db_manager.get_schema()
+        sql_dialect = self.db_manager.get_sql_dialect()
+        generated = 0
+        failed = 0
+        for question in self.questions:
+            try:
+                await self.llm_service.generate_sql(question, schema, sql_dialect)
+                generated += 1
+            except Exception as e:
+                failed += 1
+                logger.warning("Warm-up SQL generation failed for %r: %s", question, e)
+
+        return {"generated": generated, "failed": failed}
+
+    async def _ping_connections(self) -> Dict[str, int]:
+        """Run SELECT 1 on every pooled connection."""
+        result = await self.db_manager.ping_pool()
+        if result["checked"] and not result["healthy"] and not result["replaced"]:
+            raise RuntimeError("No healthy pooled connections")
+        return result
@@ -1,7 +1,16 @@
 """
 Utility functions and classes.
 """
-from .logging import setup_logging, get_logger, logger
+from .logging import (
+    setup_logging,
+    shutdown_logging,
+    get_logger,
+    logger,
+    log_event,
+    annotate,
+    timed_stage,
+    sql_fingerprint
+)
 from .exceptions import (
     NLSQLException,
     DatabaseConnectionError,
@@ -9,18 +18,27 @@ from .exceptions import (
     QueryExecutionError,
     UnsupportedDatabaseError,
     InvalidQueryError,
-    ConfigurationError
+    ConfigurationError,
+    ResultNotFoundError,
+    InvalidCursorError
 )
 
 __all__ = [
     "setup_logging",
+    "shutdown_logging",
     "get_logger", 
     "logger",
+    "log_event",
+    "annotate",
+    "timed_stage",
+    "sql_fingerprint",
     "NLSQLException",
     "DatabaseConnectionError",
     "QueryGenerationError",
     "QueryExecutionError",
     "UnsupportedDatabaseError",
     "InvalidQueryError",
-    "ConfigurationError"
+    "ConfigurationError",
+    "ResultNotFoundError",
+    "InvalidCursorError"
 ]
\ No newline at end of file
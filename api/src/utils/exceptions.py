@@ -35,4 +35,14 @@ class InvalidQueryError(NLSQLException):
 
 class ConfigurationError(NLSQLException):
     """Raised when application configuration is invalid."""
+    pass
+
+
+class ResultNotFoundError(NLSQLException):
+    """Raised when a paginated result handle or export job is unknown or has expired."""
+    pass
+
+
+class InvalidCursorError(NLSQLException):
+    """Raised when a pagination cursor is malformed or for another result."""
     pass
\ No newline at end of file
@@ -1,10 +1,183 @@
 """
 Logging configuration and utilities.
 """
+import atexit
+import contextlib
+import copy
+import hashlib
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import re
 import sys
-from typing import Optional
-from ..core.settings import settings
+import time
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+
+# Per-request fields (request ID, stage timings, SQL details) shared by every log record of a request
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("nlsql_request_context", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\?(?:,\?)*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+_OPERATOR_SPACING_RE = re.compile(r"\s*([=<>!,()+*/-])\s*")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["QueueLogHandler"] = None
+
+
+def normalize_sql(sql: str) -> str:
+    """Replace literals with placeholders so queries differing only in values compare equal."""
+    normalized = _STRING_LITERAL_RE.sub("?", sql)
+    normalized = _NUMBER_RE.sub("?", normalized)
+    normalized = _OPERATOR_SPACING_RE.sub(r"\1", _WHITESPACE_RE.sub(" ", normalized))
+    normalized = _IN_LIST_RE.sub("(?)", normalized)
+    return normalized.strip().rstrip(";").strip().lower()
+
+
+def sql_fingerprint(sql: str) -> str:
+    """Short stable hash of a query's normalized shape."""
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+
+def start_request(request_id: str, **fields) -> Dict[str, Any]:
+    """Start the logging context of a request."""
+    context = {"request_id": request_id, "stages": {}, **fields}
+    _request_context.set(context)
+    return context
+
+
+def request_context() -> Optional[Dict[str, Any]]:
+    """Logging context of the current request, if any."""
+    return _request_context.get()
+
+
+def annotate(**fields):
+    """Attach fields to the current request's log records."""
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+@contextlib.contextmanager
+def timed_stage(name: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Record how long a stage of the current request took, in milliseconds.
+    
+    The duration is also added to ``timings`` when given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        context = _request_context.get()
+        for stages in (context["stages"] if context is not None else None, timings):
+            if stages is not None:
+                stages[name] = round(stages.get(name, 0.0) + elapsed_ms, 2)
+
+
+def log_event(
+    logger: logging.Logger,
+    event: str,
+    level: int = logging.INFO,
+    sampled: bool = False,
+    **fields
+):
+    """Log a structured event.
+    
+    Events marked ``sampled`` are high-volume and only kept for the
+    configured fraction of requests.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"event": event, "fields": fields, "sampled": sampled})
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records marked as sampled.
+    
+    The decision is made per request ID, so a request keeps either all or
+    none of its sampled records. Warnings and errors are always kept.
+    """
+    
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        context = _request_context.get()
+        if context is not None:
+            return zlib.crc32(context["request_id"].encode("utf-8")) / 0xFFFFFFFF < self.rate
+        return random.random() < self.rate
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without blocking the event loop.
+    
+    Only the message arguments are merged here, together with the request
+    context; formatting (including tracebacks) and writing happen on the
+    listener thread. When the queue is full, records are dropped and counted.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        context = _request_context.get()
+        if context is not None:
+            record.request_id = context["request_id"]
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in ("fields", "sampled"):
+                entry[key] = value
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the request ID and event fields appended."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = []
+        if getattr(record, "request_id", None):
+            extras.append(f"request_id={record.request_id}")
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            extras.append(f"{key}={json.dumps(value, default=str) if isinstance(value, (dict, list)) else value}")
+        return f"{line} [{' '.join(extras)}]" if extras else line
 
 
 def setup_logging(
@@ -14,13 +187,21 @@ def setup_logging(
     """
     Set up application logging configuration.
     
+    Records are put on a bounded queue by the root handler and written to
+    stdout by a background listener thread.
+    
     Args:
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        format_string: Custom log format string
+        format_string: Custom log format string (text format only)
     
     Returns:
         Configured logger instance
     """
+    global _listener, _queue_handler
+    
+    # Imported here so that importing utils does not build the settings
+    from ..core.settings import settings
+    
     log_level = level or settings.log_level
     
     # Default format
@@ -28,13 +209,26 @@ def setup_logging(
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
     
+    if settings.logging.format.lower() == "json":
+        formatter: logging.Formatter = JSONFormatter()
+    else:
+        formatter = TextFormatter(format_string or default_format)
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    
+    # Replace any listener from a previous call, flushing what it still holds
+    shutdown_logging()
+    _queue_handler = QueueLogHandler(queue.Queue(settings.logging.queue_size))
+    _queue_handler.addFilter(SamplingFilter(settings.logging.sample_rate))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    
     # Configure logging
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format=format_string or default_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
+        handlers=[_queue_handler],
+        force=True
     )
     
     # Create logger
@@ -51,6 +245,21 @@ def setup_logging(
     return logger
 
 
+def shutdown_logging():
+    """Stop the listener thread after it has written every queued record."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Get log queue statistics."""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance for a specific module.
@@ -64,5 +273,7 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(f"nlsql.{name}")
 
 
-# Default logger instance
-logger = setup_logging()
\ No newline at end of file
+atexit.register(shutdown_logging)
+
+# Default logger instance (configured by setup_logging at app creation)
+logger = logging.getLogger("nlsql")
@@ -0,0 +1,132 @@
+"""
+Low-overhead profilers producing collapsed stacks for flame graphs.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+
+def _frame_label(filename: str, name: str) -> str:
+    """Short ``module:function`` label for a stack frame."""
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return f"{module}:{name}".replace(";", ":").replace(" ", "_")
+
+
+def format_collapsed(counts: Counter) -> str:
+    """Format stack counts as collapsed stacks (``root;...;leaf count``), heaviest first."""
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval from a background thread.
+
+    Nothing is hooked into the profiled code, so the overhead is one stack
+    walk per interval whatever the call rate. Profiling the event loop
+    thread includes every coroutine that ran on it meanwhile, and time spent
+    waiting on I/O shows up under the selector.
+    """
+
+    def __init__(self, interval_seconds: float = 0.005, thread_id: Optional[int] = None):
+        self.interval_seconds = interval_seconds
+        self.thread_id = thread_id
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.duration_ms = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+
+    def start(self):
+        """Start sampling the given thread, or the calling thread."""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="nlsql-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration_ms = round((time.perf_counter() - self._started_at) * 1000, 2)
+
+    def collapsed(self) -> str:
+        """Sampled stacks in collapsed format, weighted by sample count."""
+        return format_collapsed(self.counts)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"samples": self.samples, "interval_ms": self.interval_seconds * 1000}
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_frame_label(code.co_filename, getattr(code, "co_qualname", code.co_name)))
+                frame = frame.f_back
+            del frame
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class AllocationProfiler:
+    """Measures memory allocated between start and stop with tracemalloc.
+
+    Stacks are weighted by the bytes still allocated at stop, so memory that
+    was freed again (e.g. temporary row copies) does not show up. Tracing
+    slows allocations down noticeably while it runs.
+    """
+
+    def __init__(self, frames: int = 16):
+        self.frames = frames
+        self.counts: Counter = Counter()
+        self.allocated_bytes = 0
+        self.peak_bytes = 0
+        self.duration_ms = 0.0
+        self._owns_tracing = False
+        self._before = None
+        self._started_at = 0.0
+
+    def start(self):
+        """Start tracing allocations (or reuse tracing that is already on)."""
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        self._before = tracemalloc.take_snapshot()
+        self._started_at = time.perf_counter()
+
+    def stop(self):
+        """Compare allocations against the start snapshot and stop tracing."""
+        self.duration_ms = round((time.perf_counter() - self._started_at) * 1000, 2)
+        after = tracemalloc.take_snapshot()
+        _, self.peak_bytes = tracemalloc.get_traced_memory()
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        differences = after.filter_traces(ignore).compare_to(self._before.filter_traces(ignore), "traceback")
+        self._before = None
+        for difference in differences:
+            if difference.size_diff <= 0:
+                continue
+            # Tracebacks are ordered from the oldest frame to the most recent
+            stack = ";".join(f"{_frame_label(frame.filename, str(frame.lineno))}" for frame in difference.traceback)
+            self.counts[stack] += difference.size_diff
+            self.allocated_bytes += difference.size_diff
+
+    def collapsed(self) -> str:
+        """Allocation stacks in collapsed format, weighted by bytes."""
+        return format_collapsed(self.counts)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"allocated_bytes": self.allocated_bytes, "peak_bytes": self.peak_bytes}
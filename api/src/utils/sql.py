@@ -0,0 +1,327 @@
+"""
+Lightweight SQL tokenizer and clause splitter for generated SELECT queries.
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+_TOKEN_RE = re.compile(
+    r"""
+      (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+    | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    | (?P<word>[^\W\d][\w$]*)
+    | (?P<param>\$\d+|\?|%s)
+    | (?P<op><>|!=|<=|>=|::|\|\||[-+*/%=<>.,;()])
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL
+)
+
+# Keywords that start a top-level clause of a SELECT statement
+CLAUSE_KEYWORDS = ("SELECT", "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT", "OFFSET", "FETCH")
+
+# Keywords that make a statement more than a single SELECT
+COMPOUND_KEYWORDS = {"WITH", "UNION", "INTERSECT", "EXCEPT", "MINUS", "INTO", "FOR", "WINDOW"}
+
+# Keywords followed by a space before "(" (function names are not)
+_SPACED_BEFORE_PAREN = {
+    "AND", "OR", "NOT", "IN", "EXISTS", "FROM", "JOIN", "ON", "WHERE", "AS", "SELECT", "OVER",
+    "HAVING", "BY", "WITH", "UNION", "ALL", "DISTINCT", "WHEN", "THEN", "ELSE", "CASE"
+}
+
+AGGREGATE_FUNCTIONS = {
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "GROUP_CONCAT", "STRING_AGG", "ARRAY_AGG",
+    "STDDEV", "STDDEV_POP", "STDDEV_SAMP", "VARIANCE", "VAR_POP", "VAR_SAMP", "TOTAL"
+}
+
+
+class Token(NamedTuple):
+    """A SQL token with its nesting depth in parentheses and offset in the statement."""
+
+    kind: str
+    text: str
+    depth: int
+    start: int = 0
+
+    @property
+    def upper(self) -> str:
+        """Keyword-comparable text (words upper-cased, everything else as is)."""
+        return self.text.upper() if self.kind == "word" else self.text
+
+    def is_word(self, *words: str) -> bool:
+        return self.kind == "word" and self.text.upper() in words
+
+
+def tokenize_sql(sql: str) -> List[Token]:
+    """Split SQL into tokens, dropping whitespace and comments."""
+    tokens: List[Token] = []
+    depth = 0
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        text = match.group()
+        if text == ")":
+            depth -= 1
+        tokens.append(Token(kind, text, depth, match.start()))
+        if text == "(":
+            depth += 1
+    return tokens
+
+
+def render_tokens(tokens: List[Token]) -> str:
+    """Join tokens back into SQL text."""
+    text = ""
+    previous: Optional[Token] = None
+    for token in tokens:
+        if previous is not None and not (
+            token.text in (")", ",", ".", ";", "::")
+            or previous.text in ("(", ".", "::")
+            or (token.text == "(" and previous.kind == "word" and previous.upper not in _SPACED_BEFORE_PAREN)
+        ):
+            text += " "
+        text += token.text
+        previous = token
+    return text
+
+
+def source_text(sql: str, tokens: List[Token]) -> str:
+    """The statement text spanned by tokens of that statement, as written."""
+    if not tokens:
+        return ""
+    return sql[tokens[0].start:tokens[-1].start + len(tokens[-1].text)]
+
+
+def split_clauses(tokens: List[Token]) -> Optional[Dict[str, List[Token]]]:
+    """Split a single SELECT statement into its top-level clauses.
+
+    Returns a mapping from clause keyword ("SELECT", "FROM", "WHERE",
+    "GROUP BY", ...) to the tokens that follow it, or None when the
+    statement is not a plain SELECT (CTEs, set operations, SELECT INTO,
+    several statements).
+    """
+    while tokens and tokens[-1].text == ";":
+        tokens = tokens[:-1]
+    if not tokens or not tokens[0].is_word("SELECT"):
+        return None
+
+    clauses: Dict[str, List[Token]] = {}
+    current = None
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.depth == 0 and token.kind == "word":
+            word = token.upper
+            if word in COMPOUND_KEYWORDS:
+                return None
+            keyword = word
+            if word in ("GROUP", "ORDER") and index + 1 < len(tokens) and tokens[index + 1].is_word("BY"):
+                keyword = f"{word} BY"
+            if keyword in CLAUSE_KEYWORDS:
+                if keyword in clauses:
+                    return None
+                current = keyword
+                clauses[current] = []
+                index += 2 if " " in keyword else 1
+                continue
+        elif token.depth == 0 and token.text == ";":
+            return None
+        clauses[current].append(token)
+        index += 1
+    return clauses
+
+
+def split_top_level(tokens: List[Token], separator: str) -> List[List[Token]]:
+    """Split tokens on a top-level separator keyword or symbol (e.g. AND or ",")."""
+    if not tokens:
+        return []
+    depth = tokens[0].depth
+    parts: List[List[Token]] = [[]]
+    for token in tokens:
+        if token.depth == depth and token.upper == separator:
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return parts
+
+
+def split_conjuncts(tokens: List[Token]) -> List[List[Token]]:
+    """Split a condition on its top-level ANDs, keeping BETWEEN ... AND ... together."""
+    if not tokens:
+        return []
+    depth = tokens[0].depth
+    parts: List[List[Token]] = [[]]
+    in_between = False
+    for token in tokens:
+        if token.depth == depth and token.is_word("BETWEEN"):
+            in_between = True
+        elif token.depth == depth and token.is_word("AND"):
+            if in_between:
+                in_between = False
+            else:
+                parts.append([])
+                continue
+        parts[-1].append(token)
+    return parts
+
+
+def same_tokens(left: List[Token], right: List[Token]) -> bool:
+    """Whether two token lists are the same SQL, ignoring case of keywords and spacing."""
+    return len(left) == len(right) and all(a.kind == b.kind and a.upper == b.upper for a, b in zip(left, right))
+
+
+def has_aggregate(tokens: List[Token]) -> bool:
+    """Whether tokens call an aggregate or window function."""
+    for index, token in enumerate(tokens):
+        if token.is_word("OVER"):
+            return True
+        if (
+            token.kind == "word"
+            and token.upper in AGGREGATE_FUNCTIONS
+            and index + 1 < len(tokens)
+            and tokens[index + 1].text == "("
+        ):
+            return True
+    return False
+
+
+def _replace(sql: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply (start, end, text) replacements to SQL text."""
+    for start, end, text in sorted(edits, reverse=True):
+        sql = sql[:start] + text + sql[end:]
+    return sql
+
+
+def _end(token: Token) -> int:
+    return token.start + len(token.text)
+
+
+def _cap_count(token: Token, max_rows: int) -> Optional[List[Tuple[int, int, str]]]:
+    """Edits lowering a literal row count to ``max_rows``: [] if already within it, None if not a literal."""
+    if token.kind != "number" or not token.text.isdigit():
+        return None
+    if int(token.text) <= max_rows:
+        return []
+    return [(token.start, _end(token), str(max_rows))]
+
+
+def _fetch_count(tokens: List[Token], top: List[int]) -> Optional[Token]:
+    """Row count token of a top-level FETCH FIRST|NEXT n ROWS ONLY clause."""
+    for index in top:
+        if tokens[index].is_word("FETCH") and index + 2 < len(tokens) and tokens[index + 1].is_word("FIRST", "NEXT"):
+            return tokens[index + 2]
+    return None
+
+
+def limit_rows(sql: str, sql_dialect: str, max_rows: int) -> Tuple[str, bool]:
+    """Rewrite a SELECT statement to return at most ``max_rows`` rows.
+
+    Adds or lowers the dialect's row limit on the outermost query: LIMIT
+    for SQLite, PostgreSQL and MySQL, TOP for SQL Server (FETCH NEXT after
+    an existing OFFSET, OFFSET ... FETCH after a compound query's ORDER
+    BY, and TOP over a derived table for other compound queries, after any
+    CTE list), and FETCH FIRST for Oracle, where an existing ROWNUM bound
+    is lowered instead. The limit applies after ORDER BY, grouping and set
+    operations, and CTE bodies are left alone. Queries returning a single
+    row (aggregates without GROUP BY, SELECT without FROM) are not
+    changed. Returns the SQL and whether it was rewritten.
+    """
+    tokens = tokenize_sql(sql)
+    while tokens and tokens[-1].text == ";":
+        tokens = tokens[:-1]
+    if not tokens or not (tokens[0].is_word("SELECT", "WITH") or tokens[0].text == "("):
+        return sql, False
+    top = [index for index, token in enumerate(tokens) if token.depth == 0]
+    if any(tokens[index].text == ";" or tokens[index].is_word("INTO", "FOR") for index in top):
+        return sql, False
+
+    clauses = split_clauses(tokens)
+    if clauses is not None and "GROUP BY" not in clauses and "LIMIT" not in clauses and "FETCH" not in clauses:
+        select = clauses["SELECT"]
+        if "FROM" not in clauses or (has_aggregate(select) and not any(token.is_word("OVER") for token in select)):
+            return sql, False
+
+    body = sql[:_end(tokens[-1])]
+    rest = sql[_end(tokens[-1]):]
+    compound = any(tokens[index].is_word("UNION", "INTERSECT", "EXCEPT", "MINUS") for index in top)
+    ordered = any(
+        tokens[index].is_word("ORDER") and index + 1 < len(tokens) and tokens[index + 1].is_word("BY") for index in top
+    )
+    edits: Optional[List[Tuple[int, int, str]]]
+
+    if sql_dialect == "SQL Server":
+        fetch = _fetch_count(tokens, top)
+        select_index = next((index for index in top if tokens[index].is_word("SELECT")), None)
+        if fetch is not None:
+            edits = _cap_count(fetch, max_rows)
+        elif any(tokens[index].is_word("OFFSET") for index in top):
+            # TOP cannot be combined with OFFSET
+            edits = [(len(body), len(body), f" FETCH NEXT {max_rows} ROWS ONLY")]
+        elif not compound and select_index is not None and select_index + 1 < len(tokens):
+            position = select_index + 1
+            if position < len(tokens) and tokens[position].is_word("DISTINCT", "ALL"):
+                position += 1
+            if position < len(tokens) and tokens[position].is_word("TOP"):
+                count = tokens[position + 1] if position + 1 < len(tokens) else None
+                if count is not None and count.text == "(" and position + 2 < len(tokens):
+                    count = tokens[position + 2]
+                percent = any(token.is_word("PERCENT") for token in tokens[position + 1:position + 5])
+                edits = None if count is None or percent else _cap_count(count, max_rows)
+            else:
+                edits = [(tokens[position].start, tokens[position].start, f"TOP {max_rows} ")]
+        elif compound and ordered:
+            edits = [(len(body), len(body), f" OFFSET 0 ROWS FETCH NEXT {max_rows} ROWS ONLY")]
+        elif compound and not tokens[0].is_word("WITH"):
+            return f"SELECT TOP {max_rows} * FROM ({body}) AS limited{rest}", True
+        elif compound and select_index is not None:
+            # Wrap the statement after the CTE list, which must stay first
+            start = tokens[select_index].start
+            return f"{sql[:start]}SELECT TOP {max_rows} * FROM ({body[start:]}) AS limited{rest}", True
+        else:
+            edits = None
+    elif sql_dialect == "Oracle":
+        fetch = _fetch_count(tokens, top)
+        rownum = next(
+            (
+                index for index in top
+                if tokens[index].is_word("ROWNUM") and index + 2 < len(tokens) and tokens[index + 1].text in ("<", "<=")
+            ),
+            None
+        )
+        if fetch is not None:
+            edits = _cap_count(fetch, max_rows)
+        elif rownum is not None and not compound and tokens[rownum + 2].text.isdigit():
+            bound = int(tokens[rownum + 2].text) - (1 if tokens[rownum + 1].text == "<" else 0)
+            edits = [] if bound <= max_rows else [(tokens[rownum + 1].start, _end(tokens[rownum + 2]), f"<= {max_rows}")]
+        else:
+            edits = [(len(body), len(body), f" FETCH FIRST {max_rows} ROWS ONLY")]
+    else:
+        limit = next((index for index in top if tokens[index].is_word("LIMIT")), None)
+        fetch = _fetch_count(tokens, top)
+        if limit is not None:
+            arguments = [tokens[index] for index in top if index > limit]
+            arguments = arguments[:next((i for i, token in enumerate(arguments) if token.is_word("OFFSET")), len(arguments))]
+            if len(arguments) == 1 and arguments[0].is_word("ALL"):
+                edits = [(arguments[0].start, _end(arguments[0]), str(max_rows))]
+            elif len(arguments) == 1:
+                edits = _cap_count(arguments[0], max_rows)
+            elif len(arguments) == 3 and arguments[1].text == ",":
+                # MySQL and SQLite "LIMIT offset, count"
+                edits = _cap_count(arguments[2], max_rows)
+            else:
+                edits = None
+        elif fetch is not None:
+            edits = _cap_count(fetch, max_rows)
+        else:
+            offset = next((index for index in top if tokens[index].is_word("OFFSET")), None)
+            position = tokens[offset].start if offset is not None else len(body)
+            edits = [(position, position, f"LIMIT {max_rows} " if offset is not None else f" LIMIT {max_rows}")]
+        if edits is None:
+            # Row counts given as expressions or parameters: limit the whole result
+            return f"SELECT * FROM ({body}) AS limited LIMIT {max_rows}{rest}", True
+
+    if not edits:
+        return sql, False
+    return _replace(body, edits) + rest, True
@@ -15,6 +15,9 @@ class ApiService {
       },
     });
 
+    // Conversation session, so follow-up questions see the previous ones
+    this.sessionId = null;
+
     // Request interceptor
     this.client.interceptors.request.use(
       (config) => {
@@ -51,13 +54,74 @@ class ApiService {
       const response = await this.client.post('/query', {
         question,
         schema,
+        session_id: this.sessionId,
+        start_session: true,
+      });
+      this.sessionId = response.data.session_id || null;
+      return response.data;
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || 'Failed to execute query');
+    }
+  }
+
+  /**
+   * Execute a natural language query and get the first page of results
+   * @param {string} question - Natural language question
+   * @param {number} pageSize - Rows per page
+   * @param {string} schema - Optional database schema override
+   * @returns {Promise<Object>} First result page with result_id and next_cursor
+   */
+  async executePagedQuery(question, pageSize = 100, schema = null) {
+    try {
+      const response = await this.client.post('/query/paged', {
+        question,
+        schema,
+        session_id: this.sessionId,
+        start_session: true,
+        page_size: pageSize,
       });
+      this.sessionId = response.data.session_id || null;
       return response.data;
     } catch (error) {
       throw new Error(error.response?.data?.detail || 'Failed to execute query');
     }
   }
 
+  /**
+   * Get the next page of a paginated result
+   * @param {string} resultId - Result handle from executePagedQuery
+   * @param {string} cursor - next_cursor from the previous page
+   * @param {number} pageSize - Rows per page
+   * @returns {Promise<Object>} Result page
+   */
+  async getResultPage(resultId, cursor = null, pageSize = 100) {
+    try {
+      const response = await this.client.get(`/results/${encodeURIComponent(resultId)}`, {
+        params: { cursor, page_size: pageSize },
+      });
+      return response.data;
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || 'Failed to get result page');
+    }
+  }
+
+  /**
+   * End the conversation so the next question starts a new one
+   * @returns {Promise<void>}
+   */
+  async resetSession() {
+    const sessionId = this.sessionId;
+    this.sessionId = null;
+    if (!sessionId) {
+      return;
+    }
+    try {
+      await this.client.delete(`/sessions/${encodeURIComponent(sessionId)}`);
+    } catch (error) {
+      // The session may already have expired
+    }
+  }
+
   /**
    * Get database schema information
    * @returns {Promise<Object>} Schema information